@@ -0,0 +1,64 @@
+"""Benchmark config option changes.
+
+Measures Config.set_option() throughput with the config file rewritten
+on every change, and with changes journaled and the rewrite coalesced.
+
+Usage:
+    python benchmarks/bench_config.py [--size BYTES] [-n CHANGES]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hashmal_lib.core.my_config import Config
+
+def make_options(size):
+    """Make plugin options that serialize to about size bytes."""
+    options = {}
+    i = 0
+    while len(str(options)) < size:
+        options['Plugin%d' % (i // 20)] = options.get('Plugin%d' % (i // 20), {})
+        options['Plugin%d' % (i // 20)]['option%d' % i] = 'value %d' % i
+        i += 1
+    return options
+
+def run(directory, options, changes, save_delay):
+    filename = os.path.join(directory, 'hashmal.conf')
+    if os.path.exists(filename):
+        os.remove(filename)
+    config = Config()
+    config.save_delay = save_delay
+    config.load(filename)
+    for k, v in options.items():
+        config.set_option(k, v, do_save=False)
+    config.flush()
+
+    start = time.time()
+    for i in range(changes):
+        config.set_option('cache_size', i)
+    config.flush()
+    return time.time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark config option changes.')
+    parser.add_argument('--size', type=int, default=50000, help='Approximate size of the config file in bytes.')
+    parser.add_argument('-n', '--changes', type=int, default=200, help='Number of option changes.')
+    args = parser.parse_args()
+
+    options = make_options(args.size)
+    directory = tempfile.mkdtemp()
+    try:
+        for name, save_delay in [('every change:', None), ('coalesced:', 2.0)]:
+            elapsed = run(directory, options, args.changes, save_delay)
+            print('%-14s %10.1f changes/s  (%d changes, %.3f s including final flush)' % (
+                name, args.changes / elapsed, args.changes, elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
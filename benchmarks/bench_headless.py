@@ -0,0 +1,88 @@
+"""Benchmark worker process startup.
+
+Measures how long a fresh interpreter takes to import what a worker
+needs to verify inputs headlessly, compared with importing the GUI.
+Also measures verify_inputs() in this process, with a pool that is
+started for each call, and with a pool that is reused across calls,
+for several numbers of inputs.
+
+Usage:
+    python benchmarks/bench_headless.py [-n STARTS] [--inputs INPUTS...] [-j PROCESSES]
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+from bitcoin.core import COutPoint, CTxIn, CTxOut
+from bitcoin.core.script import CScript, OP_1, OP_DROP, OP_SHA256
+
+from hashmal_lib.core import Transaction
+from hashmal_lib.core.verify import verify_inputs
+
+imports = [
+    ('headless', 'import hashmal_lib.core.verify'),
+    ('GUI', 'import hashmal_lib.main_window'),
+]
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def time_import(statement, starts):
+    """Get the median time that fresh interpreters take to run statement, or None if it fails."""
+    times = []
+    for _ in range(starts):
+        start = time.time()
+        with open(os.devnull, 'w') as devnull:
+            if subprocess.call([sys.executable, '-c', statement], cwd=root, stderr=devnull) != 0:
+                return None
+        times.append(time.time() - start)
+    return median(times)
+
+def make_tx(inputs):
+    """Make a transaction whose inputs all spend a script that does some hashing."""
+    vin = [CTxIn(COutPoint('\x01' * 32, i), CScript([OP_1] * 2)) for i in range(inputs)]
+    tx = Transaction(vin, [CTxOut(0, CScript([OP_1]))])
+    prev_script = CScript([OP_SHA256] * 100 + [OP_DROP])
+    return tx, [prev_script] * inputs
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark worker process startup.')
+    parser.add_argument('-n', '--starts', type=int, default=5, help='Number of interpreters to start per import.')
+    parser.add_argument('--inputs', type=int, nargs='+', default=[100, 1000, 5000, 20000],
+                        help='Numbers of inputs to verify.')
+    parser.add_argument('-j', '--processes', type=int, default=4, help='Number of worker processes.')
+    args = parser.parse_args()
+
+    for name, statement in imports:
+        elapsed = time_import(statement, args.starts)
+        if elapsed is None:
+            print('%-10s unavailable' % name)
+        else:
+            print('%-10s %8.1f ms to start and import' % (name, elapsed * 1000))
+
+    pool = multiprocessing.Pool(args.processes)
+    try:
+        # Start the workers before timing.
+        verify_inputs(*make_tx(1), processes=args.processes, pool=pool)
+        print('%8s %12s %12s %12s' % ('inputs', '1 process', 'new pool', 'reused pool'))
+        for inputs in args.inputs:
+            tx, prev_scripts = make_tx(inputs)
+            times = []
+            for kwargs in [{}, {'processes': args.processes}, {'processes': args.processes, 'pool': pool}]:
+                start = time.time()
+                results = verify_inputs(tx, prev_scripts, **kwargs)
+                times.append(time.time() - start)
+                assert not any(results), results[0]
+            print('%8d %9.1f ms %9.1f ms %9.1f ms' % tuple([inputs] + [i * 1000 for i in times]))
+    finally:
+        pool.terminate()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Benchmark blockchain data retrieval against a local block explorer.
+
+Starts hashmal_lib.explorer_server on a free port and retrieves
+transactions and block headers through the "local" explorer that the
+Blockchain plugin uses, measuring requests/sec and latency.
+
+The "direct" and "coalesced" cases call the explorer from threads.
+The "controller" case goes through the same path as the GUI: each request
+is made with download_blockchain_data_async(), which coalesces it in
+InFlightRequests and runs it in a DownloadController thread. It requires PyQt4.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--fixtures DIR] [--blk FILE] [-n REQUESTS] [-c CONCURRENCY]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hashmal_lib.core import chainparams
+from hashmal_lib.core.explorers import local_explorer
+from hashmal_lib.core.inflight import InFlightRequests
+from hashmal_lib.explorer_server import ExplorerData, ExplorerServer
+
+# Bitcoin genesis block.
+genesis_block = '0100000000000000000000000000000000000000000000000000000000000000000000003ba3edfd7a7b12b27ac72c3e67768f617fc81bc3888a51323a9fb8aa4b1e5e4a29ab5f49ffff001d1dac2b7c0101000000010000000000000000000000000000000000000000000000000000000000000000ffffffff4d04ffff001d0104455468652054696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e64206261696c6f757420666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000'
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+def run(explorer, requests_list, concurrency, coalesce):
+    """Retrieve every (data_type, identifier) in requests_list.
+
+    Returns:
+        A 2-tuple of (elapsed seconds, list of per-request latencies).
+    """
+    in_flight = InFlightRequests()
+    latencies = []
+    lock = threading.Lock()
+    queue = list(requests_list)
+
+    def worker():
+        while 1:
+            with lock:
+                if not queue:
+                    return
+                data_type, identifier = queue.pop()
+            start = time.time()
+            if coalesce:
+                in_flight.fetch((data_type, identifier), lambda: explorer.get_data(data_type, identifier))
+            else:
+                explorer.get_data(data_type, identifier)
+            elapsed = time.time() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.time() - start, latencies
+
+class ExplorerRetriever(object):
+    """Stand-in for the Blockchain plugin that retrieves data from an explorer."""
+    name = 'Blockchain'
+    def __init__(self, explorer):
+        self.explorer = explorer
+        self.ui = self
+
+    def retrieve_blockchain_data(self, data_type, identifier):
+        return self.explorer.get_data(data_type, identifier)
+
+def run_controller(explorer, requests_list, concurrency):
+    """Retrieve every (data_type, identifier) in requests_list through a DownloadController.
+
+    Like run(), at most concurrency requests are outstanding at a time.
+
+    Returns:
+        A 2-tuple of (elapsed seconds, list of per-request latencies),
+        or None if PyQt4 is unavailable.
+    """
+    try:
+        from PyQt4.QtCore import QCoreApplication
+        from hashmal_lib.downloader import DownloadController
+        from hashmal_lib.plugin_handler import download_blockchain_data_async
+    except ImportError:
+        return None
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    controller = DownloadController(max_threads=concurrency)
+    in_flight = InFlightRequests()
+    plugin = ExplorerRetriever(explorer)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    queue = list(requests_list)
+
+    def request_next():
+        with lock:
+            if not queue:
+                return
+            data_type, identifier = queue.pop()
+        download_blockchain_data_async(in_flight, controller, plugin, data_type, identifier, partial(on_data, time.time()))
+
+    def on_data(start, data_type, identifier, result, error):
+        with lock:
+            latencies.append(time.time() - start)
+            if error:
+                errors.append(error)
+        request_next()
+
+    start = time.time()
+    for _ in range(concurrency):
+        request_next()
+    while len(latencies) < len(requests_list):
+        app.processEvents()
+        time.sleep(0.0005)
+    elapsed = time.time() - start
+    if errors:
+        raise Exception('%d requests failed: %s' % (len(errors), errors[0]))
+    return elapsed, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark blockchain data retrieval.')
+    parser.add_argument('--fixtures', help='Directory of files containing hex-encoded blocks or transactions.')
+    parser.add_argument('--blk', action='append', default=[], help='blk*.dat file to load blocks from.')
+    parser.add_argument('--chainparams', default='Bitcoin')
+    parser.add_argument('-n', '--requests', type=int, default=1000, help='Number of requests.')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='Number of concurrent requests.')
+    args = parser.parse_args()
+
+    chainparams.set_to_preset(args.chainparams)
+    data = ExplorerData()
+    data.add_block(genesis_block.decode('hex'))
+    if args.fixtures:
+        data.load_fixtures(args.fixtures)
+    for filename in args.blk:
+        data.load_blk_file(filename)
+
+    server = ExplorerServer(data, port=0)
+    server.start()
+    explorer = local_explorer(domain=server.url())
+
+    identifiers = [('raw_tx', i) for i in data.txs.keys()] + [('raw_header', i) for i in data.blocks.keys()]
+    requests_list = [identifiers[i % len(identifiers)] for i in range(args.requests)]
+
+    print('%d blocks, %d transactions, %d requests, concurrency %d' % (len(data.blocks), len(data.txs), args.requests, args.concurrency))
+    results = [('direct:', run(explorer, requests_list, args.concurrency, False)),
+               ('coalesced:', run(explorer, requests_list, args.concurrency, True)),
+               ('controller:', run_controller(explorer, requests_list, args.concurrency))]
+    for label, result in results:
+        if result is None:
+            print('%-12s unavailable (PyQt4 is not installed)' % label)
+            continue
+        elapsed, latencies = result
+        print('%-12s %8.1f req/s  latency p50 %6.2f ms  p90 %6.2f ms  p99 %6.2f ms' % (
+            label,
+            len(latencies) / elapsed,
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 90) * 1000,
+            percentile(latencies, 99) * 1000))
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
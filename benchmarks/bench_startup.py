@@ -0,0 +1,102 @@
+"""Benchmark cold start.
+
+Starts Hashmal in fresh interpreters with a fresh home directory, and
+measures the time until the main window is shown. Each start is traced,
+and the median time of each startup phase is reported.
+
+Qt runs on the offscreen platform (QT_QPA_PLATFORM=offscreen). Qt builds
+without that platform need a display; use a virtual one such as xvfb-run.
+
+Usage:
+    python benchmarks/bench_startup.py [-n STARTS] [--max-ms MS] [--trace FILE]
+
+With --max-ms, exits with status 1 if the median start takes longer than
+MS milliseconds, so that regressions can be caught.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+def start_once(trace_file):
+    """Start Hashmal, quit once the main window is shown, and print the traced phases as JSON."""
+    start = time.time()
+    import __builtin__
+    __builtin__.use_local_modules = True
+    from hashmal_lib import tracer
+    active = tracer.start(trace_file)
+
+    import hashmal_lib
+    from PyQt4.QtCore import QTimer
+    gui = hashmal_lib.HashmalGui()
+    gui.create_main_window()
+    # Quit once the event loop starts.
+    QTimer.singleShot(0, gui.app.quit)
+    gui.app.exec_()
+    elapsed = time.time() - start
+    # Write pending config changes, as closing the main window would.
+    gui.main_window.config.flush()
+    tracer.finish()
+
+    phases = {}
+    for name, _, _, duration in active.phases:
+        phases[name] = phases.get(name, 0.0) + duration
+    print(json.dumps({'total': elapsed, 'phases': phases, 'imports': len(active.imports)}))
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+def run(starts, trace_file):
+    """Start Hashmal starts times in subprocesses.
+
+    Returns:
+        A list of results from start_once().
+    """
+    results = []
+    for i in range(starts):
+        home = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(home, '.config'))
+            env = dict(os.environ, HOME=home, QT_QPA_PLATFORM='offscreen')
+            trace = trace_file or os.path.join(home, 'trace.txt')
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', trace], env=env, cwd=root)
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        finally:
+            shutil.rmtree(home)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Hashmal cold start.')
+    parser.add_argument('-n', '--starts', type=int, default=5, help='Number of starts.')
+    parser.add_argument('--max-ms', type=float, help='Fail if the median start takes longer than this.')
+    parser.add_argument('--trace', metavar='FILE', help='Keep the trace of the last start in FILE.')
+    parser.add_argument('--child', metavar='TRACE_FILE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        start_once(args.child)
+        return
+
+    results = run(args.starts, args.trace)
+    total = median([r['total'] for r in results]) * 1000
+    print('%d starts, median %.1f ms, %d modules imported' % (len(results), total, results[-1]['imports']))
+    for name in sorted(results[-1]['phases'], key=lambda i: -results[-1]['phases'][i]):
+        print('  %-24s %8.1f ms' % (name, median([r['phases'].get(name, 0.0) for r in results]) * 1000))
+
+    if args.max_ms is not None and total > args.max_ms:
+        print('Median start took %.1f ms; maximum is %.1f ms' % (total, args.max_ms))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark transforming human-readable script input.
+
+Measures transform_human() and Script.from_human() over a
+generated script of about 10KB, as ScriptEdit does on each keystroke.
+
+Usage:
+    python benchmarks/bench_transform_human.py [--size BYTES] [-n ITERATIONS]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hashmal_lib.core import chainparams
+from hashmal_lib.core.script import Script, transform_human
+
+# Words that the generated script is made of.
+words = ['DUP', 'HASH160', '0x14', '$pubkeyhash', 'EQUALVERIFY', 'CHECKSIG', '"Hello World"',
+         '5', 'ADD', 'OP_IF', '0x89abcdef', 'ELSE', 'ENDIF', 'OP_DROP', 'abc']
+
+variables = {'pubkeyhash': '0x1111111111111111111111111111111111111111'}
+
+def make_script(size):
+    s = []
+    length = 0
+    i = 0
+    while length < size:
+        word = words[i % len(words)]
+        s.append(word)
+        length += len(word) + 1
+        i += 1
+    return ' '.join(s)
+
+def measure(func, iterations):
+    """Return the mean time of func() in milliseconds."""
+    start = time.time()
+    for _ in range(iterations):
+        func()
+    return (time.time() - start) * 1000 / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark transforming human-readable script input.')
+    parser.add_argument('--size', type=int, default=10240, help='Size of the script in bytes.')
+    parser.add_argument('-n', '--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    chainparams.set_to_preset('Bitcoin')
+    text = make_script(args.size)
+    txt, _ = transform_human(text, variables)
+
+    print('%d bytes, %d words, %d iterations' % (len(text), len(text.split()), args.iterations))
+    print('%-18s %8.2f ms' % ('transform_human:', measure(lambda: transform_human(text, variables), args.iterations)))
+    print('%-18s %8.2f ms' % ('Script.from_human:', measure(lambda: Script.from_human(txt), args.iterations)))
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,28 @@
 import sys
 
-from PyQt4.QtGui import QApplication
-
-from main_window import HashmalMain
+import tracer
 
 
 class HashmalGui(object):
     def __init__(self):
         super(HashmalGui, self).__init__()
-        self.app = QApplication(sys.argv)
+        # The GUI is imported here so that startup tracing can time its imports.
+        with tracer.phase('QApplication'):
+            from PyQt4.QtGui import QApplication
+            self.app = QApplication(sys.argv)
+
+    def create_main_window(self):
+        """Create and show the main window."""
+        with tracer.phase('import main window'):
+            from main_window import HashmalMain
+        with tracer.phase('main window'):
+            self.main_window = HashmalMain(self.app)
+        with tracer.phase('show'):
+            self.main_window.show()
 
     def main(self):
-        self.main_window = HashmalMain(self.app)
-        self.main_window.show()
+        from PyQt4.QtCore import QTimer
+        self.create_main_window()
+        # Finish tracing once the event loop starts.
+        QTimer.singleShot(0, tracer.finish)
         sys.exit(self.app.exec_())
-
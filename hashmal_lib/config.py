@@ -35,3 +35,7 @@ class Config(QtCore.QObject):
     def set_option(self, key, value, do_save=True):
         self.conf.set_option(key, value, do_save)
         self.optionChanged.emit(key)
+
+    def flush(self):
+        """Write pending changes to the config file."""
+        self.conf.flush()
@@ -6,6 +6,10 @@ import block
 import transaction
 import utils
 import opcodes
+import prevouts
+import analysis
+import symbolic
+import verify
 
 from script import Script
 from stack import Stack
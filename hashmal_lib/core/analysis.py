@@ -0,0 +1,208 @@
+"""Static script analysis.
+
+Analyzes a script without executing it, so that scripts
+that cannot pass can be rejected before evaluation.
+"""
+import hashlib
+from collections import namedtuple
+
+from bitcoin.core.script import *
+from bitcoin.core.scripteval import MAX_STACK_ITEMS
+
+import opcodes
+
+ScriptAnalysis = namedtuple('ScriptAnalysis', ('op_count', 'max_depth', 'required_items', 'if_balanced',
+                                               'disabled_opcodes', 'errors', 'warnings'))
+"""Result of analyzing a script.
+
+Attributes:
+    op_count (int): Maximum number of opcodes that count toward MAX_SCRIPT_OPCODES.
+        The keys of a CHECKMULTISIG in a branch only count if the branch is executed.
+    max_depth (int): Maximum number of stack items during execution,
+        starting with required_items items.
+    required_items (int): Number of stack items that must be present
+        before execution so that no operation lacks arguments.
+    if_balanced (bool): Whether every IF/NOTIF has a matching ENDIF.
+    disabled_opcodes (list): Names of disabled opcodes in the script.
+    errors (list): Reasons that the script will fail regardless of
+        the initial stack. The script can pass only if this is empty.
+    warnings (list): Reasons that the script may fail, depending on
+        the initial stack or on which branches are executed.
+"""
+
+# Stack effects of opcodes: (items popped, minimum items pushed, maximum items pushed).
+# Opcodes that are not listed have no effect on the stack.
+stack_effects = {
+    OP_1NEGATE: (0, 1, 1),
+    OP_IF: (1, 0, 0), OP_NOTIF: (1, 0, 0), OP_VERIFY: (1, 0, 0),
+    OP_TOALTSTACK: (1, 0, 0), OP_FROMALTSTACK: (0, 1, 1),
+    OP_2DROP: (2, 0, 0), OP_2DUP: (2, 4, 4), OP_3DUP: (3, 6, 6),
+    OP_2OVER: (4, 6, 6), OP_2ROT: (6, 6, 6), OP_2SWAP: (4, 4, 4),
+    OP_IFDUP: (1, 1, 2), OP_DEPTH: (0, 1, 1), OP_DROP: (1, 0, 0),
+    OP_DUP: (1, 2, 2), OP_NIP: (2, 1, 1), OP_OVER: (2, 3, 3),
+    OP_PICK: (2, 2, 2), OP_ROLL: (2, 1, 1), OP_ROT: (3, 3, 3),
+    OP_SWAP: (2, 2, 2), OP_TUCK: (2, 3, 3),
+    OP_SIZE: (1, 2, 2), OP_EQUAL: (2, 1, 1), OP_EQUALVERIFY: (2, 0, 0),
+    OP_NUMEQUALVERIFY: (2, 0, 0), OP_WITHIN: (3, 1, 1),
+    OP_CHECKSIG: (2, 1, 1), OP_CHECKSIGVERIFY: (2, 0, 0),
+}
+for i in range(OP_1, OP_16 + 1):
+    stack_effects[CScriptOp(i)] = (0, 1, 1)
+for i in [OP_1ADD, OP_1SUB, OP_NEGATE, OP_ABS, OP_NOT, OP_0NOTEQUAL,
+          OP_RIPEMD160, OP_SHA1, OP_SHA256, OP_HASH160, OP_HASH256]:
+    stack_effects[i] = (1, 1, 1)
+for i in [OP_ADD, OP_SUB, OP_BOOLAND, OP_BOOLOR, OP_NUMEQUAL, OP_NUMNOTEQUAL,
+          OP_LESSTHAN, OP_GREATERTHAN, OP_LESSTHANOREQUAL, OP_GREATERTHANOREQUAL, OP_MIN, OP_MAX]:
+    stack_effects[i] = (2, 1, 1)
+
+def small_int(op):
+    """Get the value of OP_1 through OP_16, or None."""
+    if op is not None and OP_1 <= op <= OP_16:
+        return op - OP_1 + 1
+    return None
+
+def multisig_effect(op, previous_ops):
+    """Get the stack effect of a CHECKMULTISIG(VERIFY) op.
+
+    The numbers of keys and signatures are known if they are
+    pushed by the preceding operations. Otherwise they are
+    assumed to be zero.
+
+    Returns:
+        A 3-tuple of (stack effect, number of keys, whether the numbers are known).
+    """
+    n = small_int(previous_ops[-1]) if previous_ops else None
+    m = None
+    if n is not None and len(previous_ops) >= n + 2:
+        m = small_int(previous_ops[-(n + 2)])
+    is_known = n is not None and m is not None
+    n = n or 0
+    m = m or 0
+    # Number of keys, keys, number of signatures, signatures, and an extra item.
+    pops = 1 + n + 1 + m + 1
+    pushes = 1 if op == OP_CHECKMULTISIG else 0
+    return (pops, pushes, pushes), n, is_known
+
+def _analyze_script(script):
+    errors = []
+    warnings = []
+    disabled = []
+    op_count = 0
+    # Keys of CHECKMULTISIGs in branches, which only count toward op_count if executed.
+    branch_keys = 0
+    # Minimum and maximum depth relative to the initial stack.
+    lo, hi = 0, 0
+    required = 0
+    max_hi = 0
+    # (lo, hi) at the start of each open IF, and at the end of each of its branches.
+    branches = []
+    if_balanced = True
+    previous_ops = []
+    # Whether max_depth is the depth that every execution reaches.
+    # Branches that may not run and variable stack effects make it an upper bound.
+    depth_is_exact = True
+
+    if len(script) > MAX_SCRIPT_SIZE:
+        errors.append('script too large; got %d bytes; maximum %d bytes' % (len(script), MAX_SCRIPT_SIZE))
+
+    try:
+        for op, data, pc in script.raw_iter():
+            if op in opcodes.disabled_opcodes:
+                name = opcodes.opcode_names.get(op, hex(op))
+                disabled.append(name)
+                errors.append('opcode %s is disabled' % name)
+
+            if op > OP_16:
+                op_count += 1
+
+            if op <= OP_PUSHDATA4:
+                if len(data) > MAX_SCRIPT_ELEMENT_SIZE:
+                    errors.append('PUSHDATA of length %d; maximum allowed is %d' % (len(data), MAX_SCRIPT_ELEMENT_SIZE))
+                effect = (0, 1, 1)
+            elif op in [OP_CHECKMULTISIG, OP_CHECKMULTISIGVERIFY]:
+                effect, keys, is_known = multisig_effect(op, previous_ops)
+                if branches:
+                    branch_keys += keys
+                else:
+                    op_count += keys
+                if not is_known:
+                    depth_is_exact = False
+            else:
+                effect = stack_effects.get(op, (0, 0, 0))
+
+            pops, min_pushes, max_pushes = effect
+            if min_pushes != max_pushes:
+                depth_is_exact = False
+            required = max(required, pops - lo)
+            lo += min_pushes - pops
+            hi += max_pushes - pops
+
+            if op in [OP_IF, OP_NOTIF]:
+                depth_is_exact = False
+                branches.append(((lo, hi), []))
+            elif op == OP_ELSE:
+                if not branches:
+                    if_balanced = False
+                    errors.append('ELSE found without prior IF')
+                else:
+                    start, ends = branches[-1]
+                    ends.append((lo, hi))
+                    lo, hi = start
+            elif op == OP_ENDIF:
+                if not branches:
+                    if_balanced = False
+                    errors.append('ENDIF found without prior IF')
+                else:
+                    start, ends = branches.pop()
+                    ends.append((lo, hi))
+                    # An IF without an ELSE may skip its only branch.
+                    if len(ends) == 1:
+                        ends.append(start)
+                    lo = min(i[0] for i in ends)
+                    hi = max(i[1] for i in ends)
+
+            max_hi = max(max_hi, hi)
+            previous_ops.append(op)
+    except CScriptInvalidError as e:
+        errors.append('script could not be parsed: %s' % e)
+
+    if branches:
+        if_balanced = False
+        errors.append('Unterminated IF/ELSE block')
+    if op_count > MAX_SCRIPT_OPCODES:
+        errors.append('max opcode count exceeded')
+    elif op_count + branch_keys > MAX_SCRIPT_OPCODES:
+        warnings.append('max opcode count may be exceeded')
+    op_count += branch_keys
+    max_depth = required + max_hi
+    if max_depth > MAX_STACK_ITEMS:
+        if depth_is_exact:
+            errors.append('max stack items limit reached')
+        else:
+            warnings.append('max stack items limit may be reached')
+
+    return ScriptAnalysis(op_count, max_depth, required, if_balanced, disabled, errors, warnings)
+
+# Results of analyze_script(), by (opcodes revision, script hash).
+_analysis_cache = {}
+max_cache_size = 10000
+
+def analyze_script(script):
+    """Analyze script without executing it.
+
+    Results are cached by script hash.
+
+    Args:
+        script (CScript): Script to analyze.
+
+    Returns:
+        A ScriptAnalysis.
+    """
+    key = (opcodes.revision, hashlib.sha256(script).digest())
+    analysis = _analysis_cache.get(key)
+    if analysis is None:
+        analysis = _analyze_script(CScript(script))
+        if len(_analysis_cache) >= max_cache_size:
+            _analysis_cache.clear()
+        _analysis_cache[key] = analysis
+    return analysis
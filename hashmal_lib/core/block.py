@@ -1,9 +1,10 @@
 import struct
 
 import bitcoin
-from bitcoin.core import __make_mutable, b2x, b2lx, CBlockHeader
+from bitcoin.core import __make_mutable, b2x, b2lx, CBlockHeader, CBlock
 from bitcoin.core.serialize import ser_read, Hash, BytesSerializer, VectorSerializer
 
+from script import classify_script
 from transaction import Transaction
 
 block_header_fields = [
@@ -24,6 +25,32 @@ block_fields = [
     ('vtx', 'vectortx', None, None)
 ]
 
+def iter_blk_file(filename):
+    """Iterate over the raw blocks in a blk*.dat file, as written by a full node."""
+    with open(filename, 'rb') as f:
+        while 1:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            magic, size = struct.unpack(b'<4sI', header)
+            # Nodes preallocate blk files with zeroes.
+            if magic == b'\x00' * 4:
+                break
+            yield f.read(size)
+
+def classify_outputs(blk):
+    """Classify the output scripts of every transaction in a block.
+
+    Returns:
+        A dict of {script type: [(tx index, output index), ...]}
+        for each script type present in blk. See script.script_types.
+    """
+    classified = {}
+    for i, tx in enumerate(blk.vtx):
+        for n, o in enumerate(tx.vout):
+            classified.setdefault(classify_script(o.scriptPubKey), []).append((i, n))
+    return classified
+
 @__make_mutable
 class BlockHeader(CBlockHeader):
     """Cryptocurrency block header.
@@ -0,0 +1,63 @@
+"""Block explorers.
+
+Retrieve blockchain data from block explorer APIs. Nothing here
+imports Qt, so data can be retrieved without the GUI.
+"""
+import requests
+from bitcoin.core import lx
+
+from block import BlockHeader
+
+class BlockExplorer(object):
+    """Blockchain API base class.
+
+    Attributes:
+        name (str): Identifying name.
+        domain (str): Base URL.
+        routes (dict): URL routes for data (e.g. {'raw_tx': '/tx/'}).
+        parsers (dict): Lambdas for parsing request responses.
+
+    """
+    name = ''
+    domain = ''
+    routes = None
+    parsers = None
+
+    def __init__(self, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        if self.routes is None:
+            self.routes = {}
+        if self.parsers is None:
+            self.parsers = {}
+
+    def request(self, url):
+        r = requests.get(url)
+        r.raise_for_status()
+        return r.json()
+
+    def get_data(self, data_type, identifier):
+        if not self.routes.get(data_type) or not self.parsers.get(data_type):
+            return
+        s = [self.domain]
+        s.append(self.routes[data_type])
+        s.append(identifier)
+        s = ''.join(s)
+        res = self.request(s)
+        return self.parsers[data_type](res)
+
+def header_from_insight_block(d):
+    version = int(d['version'])
+    prev_block = lx(d['previousblockhash'])
+    merkle_root = lx(d['merkleroot'])
+    time = int(d['time'])
+    bits = int(d['bits'], 16)
+    nonce = int(d['nonce'])
+    return BlockHeader(version, prev_block, merkle_root, time, bits, nonce).as_hex()
+
+insight_explorer = type('insight_explorer', (BlockExplorer,), dict(name='insight',domain='https://insight.bitpay.com',
+                routes = {'raw_tx':'/api/rawtx/', 'raw_header':'/api/block/'},
+                parsers = {'raw_tx':lambda d: d.get('rawtx'), 'raw_header': header_from_insight_block}))
+# Insight-compatible explorer run locally (see hashmal_lib.explorer_server).
+local_explorer = type('local_explorer', (insight_explorer,), dict(name='local', domain='http://127.0.0.1:3001'))
+known_explorers = {'Bitcoin': [insight_explorer(), local_explorer()]}
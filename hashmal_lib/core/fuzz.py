@@ -0,0 +1,169 @@
+"""Differential testing of the stack interpreter.
+
+Generates random scripts, evaluates them with both Stack and
+python-bitcoinlib's EvalScript, and reports the scripts that
+the two evaluate differently.
+
+Usage:
+    python -m hashmal_lib.core.fuzz [-n CASES] [--seed SEED] [-j PROCESSES]
+"""
+import argparse
+import multiprocessing
+import random
+import time
+from collections import namedtuple
+
+from bitcoin.core._bignum import bn2vch
+from bitcoin.core.script import *
+from bitcoin.core.scripteval import EvalScript
+
+from stack import Stack
+
+Divergence = namedtuple('Divergence', ('script', 'hashmal', 'bitcoinlib'))
+"""A script that the two interpreters evaluate differently.
+
+Attributes:
+    script (CScript): The script.
+    hashmal (tuple): Result of Stack.
+    bitcoinlib (tuple): Result of EvalScript.
+"""
+
+# Signature operations require a transaction, so they are not generated.
+sig_ops = [OP_CHECKSIG, OP_CHECKSIGVERIFY, OP_CHECKMULTISIG, OP_CHECKMULTISIGVERIFY]
+fuzz_ops = [CScriptOp(i) for i in range(OP_1NEGATE, OP_NOP10 + 1) if i not in sig_ops and i != OP_RESERVED]
+flow_ops = [OP_IF, OP_NOTIF, OP_ELSE, OP_ENDIF]
+
+def random_push(rng):
+    """Get random data to push, favoring data that can be cast to a number."""
+    r = rng.random()
+    if r < 0.6:
+        return bn2vch(rng.randint(-300, 300))
+    elif r < 0.9:
+        return ''.join(chr(rng.randint(0, 255)) for _ in range(rng.randint(0, 40)))
+    # Around MAX_SCRIPT_ELEMENT_SIZE.
+    return '\x00' * rng.randint(MAX_SCRIPT_ELEMENT_SIZE - 2, MAX_SCRIPT_ELEMENT_SIZE + 2)
+
+def random_script(rng, max_ops=20):
+    """Generate a random script.
+
+    Args:
+        rng (random.Random): Source of randomness.
+        max_ops (int): Maximum number of operations.
+    """
+    items = []
+    for _ in range(rng.randint(1, max_ops)):
+        r = rng.random()
+        if r < 0.35:
+            items.append(random_push(rng))
+        elif r < 0.5:
+            items.append(CScriptOp(rng.choice([OP_0, OP_1NEGATE] + range(OP_1, OP_16 + 1))))
+        elif r < 0.6:
+            items.append(rng.choice(flow_ops))
+        else:
+            items.append(rng.choice(fuzz_ops))
+    script = CScript(items)
+    # Invalid and truncated scripts.
+    if rng.random() < 0.02:
+        script = CScript(script + chr(rng.randint(0, 255)))
+    return script[:MAX_SCRIPT_SIZE]
+
+def hashmal_result(script):
+    """Evaluate script with Stack.
+
+    Returns:
+        A 2-tuple of (final stack, None) or (None, error).
+    """
+    stack = Stack(CScript(script))
+    try:
+        for _ in stack.step():
+            pass
+    except Exception as e:
+        return (None, e)
+    return (list(stack.init_stack), None)
+
+def bitcoinlib_result(script):
+    """Evaluate script with EvalScript.
+
+    Returns:
+        A 2-tuple of (final stack, None) or (None, error).
+    """
+    stack = []
+    try:
+        EvalScript(stack, CScript(script), None, 0)
+    except Exception as e:
+        return (None, e)
+    return (stack, None)
+
+def compare(script):
+    """Evaluate script with both interpreters.
+
+    Only the final stacks are compared, since the interpreters
+    raise different exceptions for the same failures.
+
+    Returns:
+        A Divergence, or None if the results agree.
+    """
+    ours = hashmal_result(script)
+    theirs = bitcoinlib_result(script)
+    if ours[0] != theirs[0]:
+        return Divergence(script, ours, theirs)
+    return None
+
+def fuzz(seed, cases, max_ops=20):
+    """Compare cases random scripts generated from seed.
+
+    Returns:
+        A list of Divergences.
+    """
+    rng = random.Random(seed)
+    divergences = []
+    for _ in range(cases):
+        d = compare(random_script(rng, max_ops))
+        if d:
+            divergences.append(d)
+    return divergences
+
+def _fuzz_chunk(args):
+    return fuzz(*args)
+
+def format_divergence(d):
+    def fmt(result):
+        stack, error = result
+        if error is not None:
+            return 'error: %s: %s' % (error.__class__.__name__, error)
+        return 'stack: [%s]' % ', '.join(i.encode('hex') for i in stack)
+    return '\n'.join([d.script.encode('hex'), '  hashmal:    %s' % fmt(d.hashmal), '  bitcoinlib: %s' % fmt(d.bitcoinlib)])
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare Stack with python-bitcoinlib on random scripts.')
+    parser.add_argument('-n', '--cases', type=int, default=100000, help='Number of scripts.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-j', '--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk', type=int, default=1000, help='Scripts per task.')
+    parser.add_argument('--max-ops', type=int, default=20, help='Maximum number of operations per script.')
+    parser.add_argument('--show', type=int, default=10, help='Number of divergences to print.')
+    args = parser.parse_args()
+
+    chunks = []
+    remaining = args.cases
+    while remaining > 0:
+        chunks.append((args.seed + len(chunks), min(args.chunk, remaining), args.max_ops))
+        remaining -= args.chunk
+
+    start = time.time()
+    pool = multiprocessing.Pool(args.processes)
+    divergences = []
+    try:
+        for result in pool.imap_unordered(_fuzz_chunk, chunks):
+            divergences.extend(result)
+    finally:
+        pool.terminate()
+    elapsed = time.time() - start
+
+    for d in divergences[:args.show]:
+        print(format_divergence(d))
+    print('%d scripts in %.1f s (%.0f scripts/s), %d divergences' % (
+        args.cases, elapsed, args.cases / elapsed, len(divergences)))
+
+if __name__ == '__main__':
+    main()
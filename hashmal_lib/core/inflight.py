@@ -0,0 +1,107 @@
+"""Coalescing of identical requests.
+
+Nothing here imports Qt, so that retrievers can be used without the GUI.
+"""
+import threading
+
+# Seconds to wait for an identical request before giving up.
+DEFAULT_TIMEOUT = 60.0
+
+class RequestCancelled(Exception):
+    """A request was cancelled before it was fulfilled."""
+    pass
+
+class RequestTimedOut(Exception):
+    """A request was not fulfilled in time."""
+    pass
+
+class InFlightRequest(object):
+    """A request that is being fulfilled.
+
+    Attributes:
+        - key: Request identifier.
+        - result: Result of the request, once done.
+        - error: Exception raised by the request, if any.
+        - callbacks (list): Functions to call with the request once it is done.
+    """
+    def __init__(self, key):
+        self.key = key
+        self.result = None
+        self.error = None
+        self.callbacks = []
+        self.done = threading.Event()
+
+    def wait(self, timeout=DEFAULT_TIMEOUT):
+        """Block until the request is done and return its result.
+
+        Raises:
+            RequestTimedOut: The request was not done within timeout seconds.
+        """
+        if not self.done.wait(timeout):
+            raise RequestTimedOut('Timed out waiting for %s' % (self.key,))
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class InFlightRequests(object):
+    """Registry of in-flight requests.
+
+    Identical requests made while one is in flight are coalesced,
+    so that only one fetch is done and all waiters get its result.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.requests
+
+    def begin(self, key, callback=None):
+        """Register interest in the request key.
+
+        Returns:
+            A 2-tuple of (InFlightRequest, is_new). If is_new is True,
+            the caller must fulfill the request and call finish().
+        """
+        with self.lock:
+            request = self.requests.get(key)
+            is_new = request is None
+            if is_new:
+                request = self.requests[key] = InFlightRequest(key)
+            if callback:
+                request.callbacks.append(callback)
+        return request, is_new
+
+    def finish(self, key, result=None, error=None):
+        """Fulfill the request key and wake up any threads waiting on it.
+
+        Callbacks are not called here, so that the caller can call them
+        in the appropriate thread.
+        """
+        with self.lock:
+            request = self.requests.pop(key)
+        request.result = result
+        request.error = error
+        request.done.set()
+        return request
+
+    def fetch(self, key, func, timeout=DEFAULT_TIMEOUT):
+        """Return func(), unless an identical request is in flight.
+
+        If an identical request is in flight, its result is returned instead.
+        Waiting for it raises RequestTimedOut after timeout seconds.
+        """
+        request, is_new = self.begin(key)
+        if not is_new:
+            return request.wait(timeout)
+
+        result, error = None, None
+        try:
+            result = func()
+        except Exception as e:
+            error = e
+        request = self.finish(key, result, error)
+        for callback in request.callbacks:
+            callback(request)
+        return request.wait()
@@ -1,7 +1,7 @@
 import os
 import sys
 import json
-from copy import deepcopy
+import threading
 
 # From Encompass
 def config_file_path():
@@ -18,11 +18,85 @@ def config_file_path():
         os.mkdir(path)
     return os.path.join(path, 'hashmal.conf')
 
+def data_file_path(name):
+    """Return the filesystem path for a data file stored alongside the config file."""
+    return os.path.join(os.path.dirname(config_file_path()), name)
+
+class FrozenDict(dict):
+    """Read-only dict of option values.
+
+    Use dict() to get a copy that can be modified.
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Config options are read-only; copy them before modifying them')
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+class FrozenList(list):
+    """Read-only list of option values.
+
+    Use list() to get a copy that can be modified.
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Config options are read-only; copy them before modifying them')
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = remove = pop = sort = reverse = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+def freeze(value):
+    """Get a read-only version of an option value."""
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    elif isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return FrozenList(freeze(i) for i in value)
+    return value
+
+def journal_file_path(filename):
+    """Return the path of the change journal for the config file filename."""
+    return filename + '.journal'
+
 class Config(object):
-    """Configuration state."""
+    """Configuration state.
+
+    Option values are stored read-only (see freeze()), so that
+    get_option() can return them without copying them.
+
+    Changes are appended to a journal file as they are made, and the
+    config file itself is rewritten at most once every save_delay
+    seconds. Call flush() to write pending changes immediately.
+    The journal is replayed by load() if Hashmal exits before the
+    config file is rewritten.
+    """
+    # Seconds to wait for more changes before rewriting the config file.
+    # If None, the file is rewritten on every change.
+    save_delay = 2.0
+
     def __init__(self):
         super(Config, self).__init__()
         self.options = {}
+        self.lock = threading.RLock()
+        # Whether there are changes that have not been written to the config file.
+        self.dirty = False
+        self.save_timer = None
+        self.journal = None
+
+    def get_filename(self):
+        filename = self.options.get('filename')
+        if not filename:
+            filename = os.path.abspath('hashmal.conf')
+        return filename
 
     def load(self, filename=None):
         if not filename:
@@ -39,28 +113,97 @@ class Config(object):
             self.options = {}
         if self.options is None:
             self.options = {}
+        self.options = dict((k, freeze(v)) for k, v in self.options.items())
         self.options['filename'] = filename
+        self.replay_journal()
 
-    def save(self):
-        filename = self.options.get('filename')
-        if not filename:
-            filename = os.path.abspath('hashmal.conf')
+    def replay_journal(self):
+        """Apply the changes in the journal that were not written to the config file."""
+        filename = journal_file_path(self.get_filename())
         if not os.path.exists(filename):
-            open(filename, 'w').close()
-        with open(filename, 'w') as f:
+            return
+        replayed = False
+        with open(filename, 'r') as f:
+            for line in f:
+                try:
+                    key, value = byteify(json.loads(line))
+                except Exception:
+                    # The last entry may be incomplete.
+                    break
+                self.options[key] = freeze(value)
+                replayed = True
+        if replayed:
+            self.dirty = True
+            self.flush()
+
+    def write_journal(self, key, value):
+        if self.journal is None:
+            self.journal = open(journal_file_path(self.get_filename()), 'a')
+        self.journal.write(json.dumps([key, value], sort_keys=True) + '\n')
+        self.journal.flush()
+
+    def save(self):
+        """Rewrite the config file now."""
+        with self.lock:
+            self.dirty = True
+            self.flush()
+
+    def flush(self):
+        """Rewrite the config file if there are unwritten changes.
+
+        The file is written atomically, by writing a temporary file
+        and renaming it over the config file.
+        """
+        with self.lock:
+            if self.save_timer:
+                self.save_timer.cancel()
+                self.save_timer = None
+            if not self.dirty:
+                return
+            filename = self.get_filename()
             conf = json.dumps(self.options, indent=4, sort_keys=True)
-            f.write(conf)
+            tmp_filename = filename + '.tmp'
+            with open(tmp_filename, 'w') as f:
+                f.write(conf)
+                f.flush()
+                os.fsync(f.fileno())
+            # os.rename() cannot replace a file on Windows.
+            if os.name == 'nt' and os.path.exists(filename):
+                os.remove(filename)
+            os.rename(tmp_filename, filename)
+            self.dirty = False
+            # The journal's changes are now in the config file.
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            journal_filename = journal_file_path(filename)
+            if os.path.exists(journal_filename):
+                os.remove(journal_filename)
+
+    def schedule_save(self):
+        if self.save_delay is None:
+            self.flush()
+        elif self.save_timer is None:
+            self.save_timer = threading.Timer(self.save_delay, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
 
     def get_option(self, key, default=None):
-        value = self.options.get(key, default)
+        """Get the read-only value of an option."""
+        if key not in self.options:
+            return freeze(default)
+        value = self.options[key]
         if isinstance(value, unicode): value = str(value)
-        # Return a copy
-        return deepcopy(value)
+        return value
 
     def set_option(self, key, value, do_save=True):
-        self.options[key] = value
-        if do_save:
-            self.save()
+        with self.lock:
+            self.options[key] = value = freeze(value)
+            self.dirty = True
+            if do_save:
+                if self.save_delay is not None:
+                    self.write_journal(key, value)
+                self.schedule_save()
 
 # http://stackoverflow.com/questions/956867/how-to-get-string-objects-instead-of-unicode-ones-from-json-in-python
 def byteify(input):
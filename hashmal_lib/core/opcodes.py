@@ -11,6 +11,9 @@ opcodes_by_name = dict(OPCODES_BY_NAME)
 disabled_opcodes = list(DISABLED_OPCODES)
 
 overridden_opcodes = {}
+# Incremented whenever opcode names change, so that
+# anything built from them knows to rebuild.
+revision = 0
 
 def is_overridden(op_value):
     return op_value in overridden_opcodes.keys()
@@ -22,7 +25,8 @@ def override(opcode, stack, txTo, inIdx, flags, execution_data, err_raiser):
     return overridden_opcodes[opcode](stack, txTo, inIdx, flags, execution_data, err_raiser)
 
 def set_overridden_opcodes(ops):
-    global opcode_names, opcodes_by_name, disabled_opcodes, overridden_opcodes
+    global opcode_names, opcodes_by_name, disabled_opcodes, overridden_opcodes, revision
+    revision += 1
     opcode_names = dict(OPCODE_NAMES)
     opcodes_by_name = dict(OPCODES_BY_NAME)
     overridden_opcodes = {}
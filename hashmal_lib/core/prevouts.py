@@ -0,0 +1,124 @@
+"""Index of transaction outputs.
+
+Maps (txid, n) to (scriptPubKey, nValue) so that inputs can be
+verified without retrieving entire previous transactions.
+Spent outputs are kept, since verifying an input of a confirmed
+transaction requires the output that it spent.
+
+The index can be built from the blk*.dat files of a full node:
+
+Usage:
+    python -m hashmal_lib.core.prevouts [--chainparams PRESET] [--db FILE] BLK_FILE...
+"""
+import argparse
+import sqlite3
+import threading
+
+from bitcoin.core import lx
+
+import chainparams
+import my_config
+from block import Block, iter_blk_file
+from script import Script
+from transaction import Transaction
+
+def index_file_path(preset_name):
+    """Get the path of the index for a chainparams preset."""
+    return my_config.data_file_path('prevouts-%s.db' % preset_name.lower())
+
+class PrevoutIndex(object):
+    """On-disk index of transaction outputs.
+
+    Args:
+        filename (str): Path of the SQLite database. Use ':memory:'
+            for an index that is not saved.
+    """
+    def __init__(self, filename=':memory:'):
+        super(PrevoutIndex, self).__init__()
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS prevouts (txid BLOB NOT NULL, n INTEGER NOT NULL, '
+                        'value INTEGER NOT NULL, script BLOB NOT NULL, PRIMARY KEY (txid, n))')
+        self.db.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM prevouts').fetchone()[0]
+
+    def get(self, txid, n):
+        """Get an output.
+
+        Args:
+            txid (str): Transaction ID (hex, as displayed).
+            n (int): Output index.
+
+        Returns:
+            A 2-tuple of (scriptPubKey, nValue), or None if the output is not indexed.
+        """
+        with self.lock:
+            row = self.db.execute('SELECT script, value FROM prevouts WHERE txid = ? AND n = ?',
+                                  (sqlite3.Binary(lx(txid)), n)).fetchone()
+        if row is None:
+            return None
+        return (Script(bytes(row[0])), row[1])
+
+    def _rows(self, tx):
+        txid = sqlite3.Binary(tx.GetHash())
+        return [(txid, n, o.nValue, sqlite3.Binary(o.scriptPubKey)) for n, o in enumerate(tx.vout)]
+
+    def _insert(self, rows):
+        with self.lock:
+            self.db.executemany('INSERT OR REPLACE INTO prevouts VALUES (?, ?, ?, ?)', rows)
+            self.db.commit()
+
+    def add_tx(self, tx):
+        """Index the outputs of a Transaction."""
+        self._insert(self._rows(tx))
+
+    def add_raw_tx(self, raw):
+        """Index the outputs of a raw (binary) transaction."""
+        self.add_tx(Transaction.deserialize(raw))
+
+    def add_block(self, blk):
+        """Index the outputs of every transaction in a Block."""
+        rows = []
+        for tx in blk.vtx:
+            rows.extend(self._rows(tx))
+        self._insert(rows)
+
+    def add_blk_file(self, filename):
+        """Index the outputs of every block in a blk*.dat file.
+
+        Returns:
+            The number of blocks indexed.
+        """
+        count = 0
+        for raw in iter_blk_file(filename):
+            self.add_block(Block.deserialize(raw))
+            count += 1
+        return count
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Index the transaction outputs in blk*.dat files.')
+    parser.add_argument('blk', nargs='+', help='blk*.dat file to index.')
+    parser.add_argument('--chainparams', default='Bitcoin', help='Chainparams preset to deserialize blocks with.')
+    parser.add_argument('--db', help='Index file. Defaults to the index that Hashmal uses for the preset.')
+    args = parser.parse_args(args)
+
+    chainparams.set_to_preset(args.chainparams)
+    index = PrevoutIndex(args.db or index_file_path(args.chainparams))
+    try:
+        for filename in args.blk:
+            count = index.add_blk_file(filename)
+            print('Indexed %d blocks from %s' % (count, filename))
+        print('%d outputs in %s' % (len(index), index.filename))
+    finally:
+        index.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,20 @@
-import pyparsing
-from pyparsing import Word, QuotedString, OneOrMore, Combine
-import shlex
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+import re
 
 import bitcoin
 from bitcoin.base58 import CBase58Data
-from bitcoin.core.script import CScript
+from bitcoin.core.script import CScript, CScriptOp
 
 import opcodes
-from utils import is_hex, push_script, format_hex_string
+from utils import format_hex_string
+
+# Words of human-readable scripts: string literals or runs of non-whitespace.
+_word_re = re.compile(r'"[^"]*"|\S+')
+_hex_re = re.compile(r'[0-9a-fA-F]+$')
+_var_re = re.compile(r'\$([0-9a-zA-Z]+)')
+# Push data that is shown as text rather than hex.
+_printable_re = re.compile(r'[\x20-\x7f]*\Z')
 
 class Script(CScript):
     """Transaction script.
@@ -17,75 +24,55 @@ class Script(CScript):
     """
     @classmethod
     def from_human(cls, data):
-        hex_str = []
-        try:
-            d = shlex.split(data, posix=False)
-        except Exception:
-            d = data.split()
-        while 1:
-            if len(d) == 0:
-                break
-            word = d[0]
-            d = d[1:]
-
+        """Parse a human-readable script, such as one returned by transform_human()."""
+        opcodes_by_name = opcodes.opcodes_by_name
+        script = bytearray()
+        for word in _word_re.findall(data):
             if word.startswith('PUSHDATA'):
                 continue
 
-            opcode = opcodes.opcodes_by_name.get(word)
+            opcode = opcodes_by_name.get(word)
             if opcode is not None:
-                hex_str.append(format_hex_string(hex(opcode), with_prefix=False))
+                script.append(opcode)
                 continue
 
-            # data to be pushed
-            pushdata = word
-
-            # Make sure hex is formatted.
-            if is_hex(pushdata):
-                if pushdata.startswith('0x'):
-                    pushdata = pushdata[2:]
-                if len(pushdata) % 2 != 0:
-                    pushdata = ''.join(['0', pushdata])
-            # Hex-encode text.
+            # Data to be pushed.
+            hex_str = word[2:] if word.startswith('0x') else word
+            if _hex_re.match(hex_str):
+                # Make sure hex is formatted.
+                if len(hex_str) % 2 != 0:
+                    hex_str = ''.join(['0', hex_str])
+                pushdata = hex_str.decode('hex')
             else:
+                # Text, with quotation marks removed.
+                pushdata = word
                 if pushdata.startswith('"') and pushdata.endswith('"'):
                     pushdata = pushdata[1:-1]
-                pushdata = pushdata.encode('hex')
-            hex_str.append(push_script(pushdata))
+            script.extend(CScriptOp.encode_op_pushdata(pushdata))
+
+        return cls(bytes(script))
 
-        hex_str = ''.join(hex_str)
-        return cls(hex_str.decode('hex'))
+    # Memoized rendered forms. Scripts are immutable, so these
+    # only need to be recomputed if opcode names change.
+    _hex = None
+    _human = None
+    _human_revision = None
 
     def get_hex(self):
         """Get the script as a hex-encoded string."""
-        s = []
-        iterator = self.raw_iter()
-        while 1:
-            try:
-                opcode, data, byte_index = next(iterator)
-                hexcode = hex(opcode)[2:]
-                if len(hexcode) % 2 != 0:
-                    hexcode = ''.join(['0', hexcode])
-                s.append(hexcode)
-                if data:
-                    s.append(data.encode('hex'))
-            except StopIteration:
-                break
-            except Exception:
-                s.append('(CANNOT_PARSE)')
-
-        return ''.join(s)
+        if self._hex is None:
+            self._hex = self.encode('hex')
+        return self._hex
 
     def human_iter(self):
+        table = get_opcode_text_table()
         iterator = self.raw_iter()
-        s = ''
         while 1:
             try:
                 opcode, data, byte_index = next(iterator)
-                op_name = opcodes.opcode_names.get(opcode)
-                if op_name and not op_name.startswith('OP_PUSHDATA'):
-                    s = op_name
-                else:
-                    if all(ord(c) < 128 and ord(c) > 31 for c in data):
+                s = table[opcode]
+                if s is None:
+                    if _printable_re.match(data):
                         s = ''.join(['"', data, '"'])
                     else:
                         s = ''.join(['0x', data.encode('hex')])
@@ -97,17 +84,186 @@ class Script(CScript):
 
     def get_human(self):
         """Get the script as a human-readable string."""
-        s = []
-        iterator = self.human_iter()
-        while 1:
-            try:
-                s.append(next(iterator))
-            except StopIteration:
-                break
-            except Exception:
-                break
-        return ' '.join(s)
+        if self._human is None or self._human_revision != opcodes.revision:
+            self._human = ' '.join(self.human_iter())
+            self._human_revision = opcodes.revision
+        return self._human
+
+_opcode_text_table = None
+
+def get_opcode_text_table():
+    """Get the human-readable text of every opcode value.
+
+    Returns:
+        A list of 256 items. Push operations are None, since their
+        text is their data. Opcodes without names are '(CANNOT_PARSE)'.
+    """
+    global _opcode_text_table
+    if _opcode_text_table is None or _opcode_text_table[0] != opcodes.revision:
+        table = []
+        for i in range(256):
+            name = opcodes.opcode_names.get(i)
+            if i <= opcodes.OP_PUSHDATA4 and (not name or name.startswith('OP_PUSHDATA')):
+                name = None
+            elif not name:
+                name = '(CANNOT_PARSE)'
+            table.append(name)
+        _opcode_text_table = (opcodes.revision, table)
+    return _opcode_text_table[1]
+
+# Output script types, named as in Bitcoin Core.
+script_types = ('pubkeyhash', 'scripthash', 'pubkey', 'multisig', 'nulldata', 'nonstandard')
+
+standard_layouts = OrderedDict([
+    ('pubkeyhash', ('OP_DUP OP_HASH160 <recipient> OP_EQUALVERIFY OP_CHECKSIG', (20,))),
+    ('scripthash', ('OP_HASH160 <recipient> OP_EQUAL', (20,))),
+    ('pubkey', ('<pubkey> OP_CHECKSIG', (33, 65))),
+])
+"""Output script types that have fixed layouts.
+
+Each layout is a 2-tuple of (template text, allowed push sizes).
+Template text has one variable in brackets, which is a data push
+of one of the allowed sizes. Script templates are built from these.
+"""
 
+_layout_table = None
+
+def get_layout_table():
+    """Get the raw forms of standard_layouts.
+
+    Returns:
+        A dict of {script length: [(prefix, suffix, script type), ...]}.
+    """
+    global _layout_table
+    if _layout_table is None or _layout_table[0] != opcodes.revision:
+        table = {}
+        for script_type, (text, sizes) in standard_layouts.items():
+            before, after = re.split(r'<\w+>', text)
+            prefix = str(Script.from_human(before))
+            suffix = str(Script.from_human(after))
+            for size in sizes:
+                length = len(prefix) + 1 + size + len(suffix)
+                table.setdefault(length, []).append((prefix + chr(size), suffix, script_type))
+        _layout_table = (opcodes.revision, table)
+    return _layout_table[1]
+
+def classify_script(script):
+    """Get the type of an output script.
+
+    Scripts with standard_layouts are recognized by their
+    length and fixed bytes without being parsed.
+
+    Args:
+        script (str): Raw output script.
+
+    Returns:
+        One of script_types.
+    """
+    for prefix, suffix, script_type in get_layout_table().get(len(script), ()):
+        if script.startswith(prefix) and script.endswith(suffix):
+            return script_type
+    if len(script) == 0:
+        return 'nonstandard'
+
+    script = Script(script)
+    if script[0] == '\x6a':
+        return 'nulldata' if Script(script[1:]).is_push_only() else 'nonstandard'
+    if script[-1] == '\xae' and is_multisig(script):
+        return 'multisig'
+    return 'nonstandard'
+
+def is_multisig(script):
+    """Returns whether script is a bare m-of-n multisig script."""
+    try:
+        ops = list(script.raw_iter())
+    except Exception:
+        return False
+    if len(ops) < 4 or ops[-1][0] != opcodes.OP_CHECKMULTISIG:
+        return False
+    m, n = ops[0][0], ops[-2][0]
+    if not (opcodes.OP_1 <= m <= n <= opcodes.OP_16):
+        return False
+    keys = ops[1:-2]
+    return (len(keys) == n - opcodes.OP_1 + 1
+            and all(data is not None and len(data) in (33, 65) for _, data, _ in keys))
+
+class HumanParser(object):
+    """Parser for human-readable script input.
+
+    Holds the opcode name tables that transform_human() uses,
+    so that they are only built once per set of opcodes.
+    Use get_human_parser() to get the parser for the current opcodes.
+    """
+    def __init__(self, opcodes_by_name):
+        # Explicit opcode names (e.g. 'OP_ADD').
+        self.explicit_ops = frozenset(str(i) for i in opcodes_by_name.keys())
+        # Implicit opcode names (e.g. 'ADD'), mapped to explicit ones.
+        # OP_1, OP_2, ...OP_16 are excluded, since '1' is a number.
+        self.implicit_ops = {}
+        for name in self.explicit_ops:
+            if name.startswith('OP_') and not name[3:].isdigit():
+                self.implicit_ops[name[3:]] = name
+
+    def transform_word(self, word):
+        """Transform a word that is not a string literal or variable.
+
+        Returns:
+            A 2-tuple of (transformed word, match type),
+            or (word, None) if word was not transformed.
+        """
+        if word in self.explicit_ops:
+            return word, 'Opcode'
+        op = self.implicit_ops.get(word)
+        if op:
+            return op, 'Opcode'
+        if _hex_re.match(word) or (word.startswith('0x') and _hex_re.match(word, 2)):
+            return format_hex_string(word), 'Hex'
+        return word, None
+
+    def transform(self, text, variables):
+        """Transform text in one pass. See transform_human()."""
+        strings = []
+        context_tips = []
+        for match in _word_re.finditer(text):
+            word = match.group()
+            start = match.start()
+            # Do not transform strings if they are string literals.
+            if word.startswith('"') and word.endswith('"') and len(word) > 1:
+                context_tips.append( (start, match.end(), word[1:-1], 'String literal') )
+                strings.append(word)
+                continue
+
+            if '$' in word:
+                substituted = self.substitute(word, start, variables, context_tips)
+                if substituted != word:
+                    # Variable values may be more than one word.
+                    strings.extend(self.transform_word(i)[0] if not i.startswith('"') else i
+                                   for i in _word_re.findall(substituted))
+                    continue
+
+            new_word, match_type = self.transform_word(word)
+            if match_type:
+                context_tips.append( (start, match.end(), word, match_type) )
+            strings.append(new_word)
+        return ' '.join(strings), context_tips
+
+    def substitute(self, word, offset, variables, context_tips):
+        """Substitute the values of variables in word."""
+        def replace(match):
+            value = variables.get(match.group(1))
+            context_tips.append( (offset + match.start(), offset + match.end(), match.group(), 'Variable') )
+            return value if value else match.group()
+        return _var_re.sub(replace, word)
+
+_human_parser = None
+
+def get_human_parser():
+    """Get the HumanParser for the current opcodes."""
+    global _human_parser
+    if _human_parser is None or _human_parser.revision != opcodes.revision:
+        _human_parser = HumanParser(opcodes.opcodes_by_name)
+        _human_parser.revision = opcodes.revision
+    return _human_parser
 
 def transform_human(text, variables=None):
     """Transform user input with given context.
@@ -122,84 +278,31 @@ def transform_human(text, variables=None):
     """
     if variables is None:
         variables = {} # No mutable default value.
-    # these are parseActions for pyparsing.
-    def var_name_to_value(s, loc, toks):
-        for i, t in enumerate(toks):
-            val = variables.get(t[1:])
-            if val:
-                toks[i] = val
-        return toks
-    def implicit_opcode_to_explicit(s, loc, toks):
-        """Add "OP_" prefix to an opcode."""
-        for i, t in enumerate(toks):
-            toks[i] = '_'.join(['OP', t])
-        return toks
-    def hex_to_formatted_hex(s, loc, toks):
-        """Add "0x" prefix and ensure even length."""
-        for i, t in enumerate(toks):
-            new_tok = format_hex_string(t)
-            toks[i] = new_tok
-        return toks
-    # ^ parseActions for pyparsing end here.
-    str_literal = QuotedString('"')
-    var_name = Combine(Word('$') + Word(pyparsing.alphas))
-    var_name.setParseAction(var_name_to_value)
-
-    # Here we populate the list of contextual tips.
-
-    # Explicit opcode names
-    op_names = [str(i) for i in opcodes.opcode_names.keys()]
-    op_names_explicit = ' '.join(op_names)
-    def is_small_int(op):
-        """True if op is one of OP_1, OP_2, ...OP_16"""
-        try:
-            i = int(op[3:])
-            return True
-        except ValueError:
-            return False
-    op_names_implicit = ' '.join([i[3:] for i in op_names if not is_small_int(i)])
-
-    # Hex, implicit (e.g. 'a') and explicit (e.g. '0x0a')
-    explicit_hex = Combine(Word('0x') + Word(pyparsing.hexnums) + pyparsing.WordEnd())
-    implicit_hex = Combine(pyparsing.WordStart() + OneOrMore(Word(pyparsing.hexnums)) + pyparsing.WordEnd())
-    explicit_hex.setParseAction(hex_to_formatted_hex)
-    implicit_hex.setParseAction(hex_to_formatted_hex)
-
-    # Opcodes, implicit (e.g. 'ADD') and explicit (e.g. 'OP_ADD')
-    explicit_op = pyparsing.oneOf(op_names_explicit)
-    implicit_op = Combine(pyparsing.WordStart() + pyparsing.oneOf(op_names_implicit))
-    implicit_op.setParseAction(implicit_opcode_to_explicit)
-
-    contexts = pyparsing.Optional(var_name('Variable') |
-                                  str_literal('String literal') |
-                                  explicit_op('Opcode') |
-                                  implicit_op('Opcode') |
-                                  explicit_hex('Hex') |
-                                  implicit_hex('Hex'))
-    matches = [(i[0].asDict(), i[1], i[2]) for i in contexts.scanString(text)]
-    context_tips = []
-    for i in matches:
-        d = i[0]
-        if len(d.items()) == 0: continue
-        match_type, value = d.items()[0]
-        start = i[1]
-        end = i[2]
-        context_tips.append( (start, end, value, match_type) )
-
-    # Now we do the actual transformation.
-    strings = []
-    try:
-        words = shlex.split(text, posix=False)
-    except Exception:
-        words = text.split()
-    for s in words:
-        # Do not transform strings if they are string literals.
-        is_literal = True if pyparsing.Optional(str_literal).parseString(s) else False
-        if not is_literal:
-            s = var_name.transformString(s)
-            s = implicit_op.transformString(s)
-            s = implicit_hex.transformString(s)
-            s = explicit_hex.transformString(s)
-        strings.append(s)
-    return ' '.join(strings), context_tips
+    return get_human_parser().transform(text, variables)
+
+def variable_names(text):
+    """Get the names of the variables that text substitutes."""
+    return set(_var_re.findall(text))
+
+class ContextIndex(object):
+    """Context tips from transform_human(), indexed by position.
+
+    Tips do not overlap, so both their starts and ends are sorted,
+    and the tips in a range of text can be found by bisection.
+    """
+    def __init__(self, context=None):
+        self.context = sorted(context) if context else []
+        self.starts = [i[0] for i in self.context]
+        self.ends = [i[1] for i in self.context]
+
+    def __len__(self):
+        return len(self.context)
+
+    def in_range(self, start, end):
+        """Get the tips that overlap text[start:end]."""
+        return self.context[bisect_right(self.ends, start):bisect_left(self.starts, end)]
 
+    def tip_at(self, index):
+        """Get the tip containing the character at index, or None."""
+        tips = self.in_range(index, index + 1)
+        return tips[0] if tips else None
@@ -11,6 +11,7 @@ from bitcoin.core.scripteval import (
 )
 
 import opcodes
+from analysis import analyze_script
 
 
 def e(*args):
@@ -32,6 +33,8 @@ class ScriptExecution(object):
         self.script_passed = None
         # Whether the script has been verified.
         self.script_verified = False
+        # Static analysis of the script.
+        self.analysis = None
 
     def evaluate(self, tx_script, txTo=None, inIdx=0, flags=None, execution_data=None):
         self.error = None
@@ -41,6 +44,18 @@ class ScriptExecution(object):
         self.script_passed = None
         self.script_verified = False
 
+        # Reject scripts that cannot pass before executing them.
+        scripts = [tx_script]
+        if txTo:
+            scripts.insert(0, txTo.vin[inIdx].scriptSig)
+        for script in scripts:
+            analysis = analyze_script(script)
+            if analysis.errors:
+                self.analysis = analysis
+                self.error = EvalScriptError(analysis.errors[0])
+                return self.steps
+        self.analysis = analysis
+
         stack = Stack(tx_script, txTo, inIdx, flags, execution_data)
         verifying = False
         if stack.txTo:
@@ -456,6 +471,11 @@ class Stack(object):
 
                 elif sop == OP_RIPEMD160:
                     check_args(1)
+                    last1 = stack.pop()
+                    h = hashlib.new('ripemd160')
+                    h.update(last1)
+                    stack.append(h.digest())
+                    last = '%s (RIPEMD160 of %s) was pushed to the stack.' % e(stack[-1], last1)
 
                 elif sop == OP_ROT:
                     check_args(3)
@@ -527,7 +547,7 @@ class Stack(object):
                         stack.append(b"\x01")
                     else:
                         stack.append(b"\x00")
-                    last = '%s (the result of %s <= %s < %s) was pushed to the stack.' % e(stack[-1], bn2, bn1, bn3)
+                    last = '%s (the result of %d <= %d < %d) was pushed to the stack.' % (e(stack[-1]) + (bn2, bn1, bn3))
 
                 else:
                     err_raiser(EvalScriptError, 'unsupported opcode 0x%x' % sop)
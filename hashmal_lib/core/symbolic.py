@@ -0,0 +1,474 @@
+"""Symbolic script execution.
+
+Executes a script with symbolic stack items in place of the
+items that a spending script would provide, and derives the
+conditions that those items must meet for the script to pass.
+"""
+import hashlib
+from collections import namedtuple
+
+import bitcoin
+from bitcoin.core._bignum import bn2vch, vch2bn
+from bitcoin.core.script import *
+from bitcoin.core.scripteval import _CastToBool, MAX_STACK_ITEMS
+from bitcoin.core.serialize import Hash, Hash160
+
+import opcodes
+
+class Symbol(namedtuple('Symbol', ('name',))):
+    """A stack item provided by the spending script.
+
+    input0 is the top item of the initial stack, input1 is below it, etc.
+    """
+    def __str__(self):
+        return self.name
+
+class Expression(namedtuple('Expression', ('op', 'args'))):
+    """The result of an operation on symbolic values."""
+    def __str__(self):
+        return '%s(%s)' % (self.op, ', '.join(format_value(i) for i in self.args))
+
+class Constraint(namedtuple('Constraint', ('kind', 'args'))):
+    """A condition for spending.
+
+    Kinds:
+        - 'signature': A valid signature for the public key args[0].
+        - 'multisig': args[0] valid signatures for the public keys args[1].
+        - 'preimage': args[2] must hash to args[1] with the hash op args[0].
+        - 'locktime': The spending transaction's nLockTime must be at least args[0].
+        - 'sequence': The spending input's nSequence must be at least args[0].
+        - 'equal', 'not equal': args[0] must (not) equal args[1].
+        - 'numequal': args[0] must equal args[1] as numbers.
+        - 'true', 'false': args[0] must be true (false).
+        - 'unsupported': args[0] cannot be executed symbolically.
+    """
+    def __str__(self):
+        args = self.args
+        if self.kind == 'signature':
+            return 'Signature for public key %s' % format_value(args[0])
+        elif self.kind == 'multisig':
+            return '%d signatures for public keys %s' % (args[0], ', '.join(format_value(i) for i in args[1]))
+        elif self.kind == 'preimage':
+            return '%s is a preimage of %s (%s)' % (format_value(args[2]), format_value(args[1]), args[0])
+        elif self.kind in ['locktime', 'sequence']:
+            return '%s of at least %d' % ('Locktime' if self.kind == 'locktime' else 'Sequence', args[0])
+        elif self.kind in ['equal', 'not equal']:
+            return '%s %s %s' % (format_value(args[0]), '==' if self.kind == 'equal' else '!=', format_value(args[1]))
+        elif self.kind == 'numequal':
+            return '%s == %s (as numbers)' % (format_value(args[0]), format_value(args[1]))
+        elif self.kind == 'unsupported':
+            return 'Unsupported operation %s' % args[0]
+        return '%s is %s' % (format_value(args[0]), self.kind)
+
+SpendingPath = namedtuple('SpendingPath', ('inputs', 'constraints'))
+"""A way to spend a script.
+
+Attributes:
+    inputs (int): Number of stack items that the spending script must provide.
+    constraints (tuple): Constraints that the items must meet.
+"""
+
+SymbolicState = namedtuple('SymbolicState', ('stack', 'altstack', 'vf_exec', 'constraints', 'inputs', 'done'))
+
+def format_value(value):
+    if isinstance(value, str):
+        return '0x' + value.encode('hex') if value else '0x'
+    return str(value)
+
+class PathFailed(Exception):
+    """Raised when a path cannot pass."""
+    pass
+
+class Unsupported(Exception):
+    """Raised when an operation cannot be executed symbolically."""
+    pass
+
+hash_ops = {
+    OP_RIPEMD160: ('RIPEMD160', lambda x: hashlib.new('ripemd160', x).digest()),
+    OP_SHA1: ('SHA1', lambda x: hashlib.sha1(x).digest()),
+    OP_SHA256: ('SHA256', lambda x: hashlib.sha256(x).digest()),
+    OP_HASH160: ('HASH160', Hash160),
+    OP_HASH256: ('HASH256', Hash),
+}
+
+unary_ops = {
+    OP_1ADD: lambda a: a + 1,
+    OP_1SUB: lambda a: a - 1,
+    OP_NEGATE: lambda a: -a,
+    OP_ABS: lambda a: abs(a),
+    OP_NOT: lambda a: long(a == 0),
+    OP_0NOTEQUAL: lambda a: long(a != 0),
+}
+
+binary_ops = {
+    OP_ADD: lambda a, b: a + b,
+    OP_SUB: lambda a, b: a - b,
+    OP_BOOLAND: lambda a, b: long(a != 0 and b != 0),
+    OP_BOOLOR: lambda a, b: long(a != 0 or b != 0),
+    OP_NUMEQUAL: lambda a, b: long(a == b),
+    OP_NUMNOTEQUAL: lambda a, b: long(a != b),
+    OP_LESSTHAN: lambda a, b: long(a < b),
+    OP_GREATERTHAN: lambda a, b: long(a > b),
+    OP_LESSTHANOREQUAL: lambda a, b: long(a <= b),
+    OP_GREATERTHANOREQUAL: lambda a, b: long(a >= b),
+    OP_MIN: lambda a, b: min(a, b),
+    OP_MAX: lambda a, b: max(a, b),
+}
+
+def op_name(op):
+    return opcodes.opcode_names.get(op, hex(op))
+
+def small_int(value):
+    """Get the value of a concrete stack item as a number, or None."""
+    if not isinstance(value, str) or len(value) > 4:
+        return None
+    return vch2bn(value)
+
+class SymbolicPath(object):
+    """Mutable execution state of one path."""
+    def __init__(self, state):
+        self.stack = list(state.stack)
+        self.altstack = list(state.altstack)
+        self.vf_exec = list(state.vf_exec)
+        self.constraints = list(state.constraints)
+        self.inputs = state.inputs
+        self.done = state.done
+
+    def state(self):
+        return SymbolicState(tuple(self.stack), tuple(self.altstack), tuple(self.vf_exec),
+                             tuple(self.constraints), self.inputs, self.done)
+
+    def need(self, n):
+        """Make sure that there are n items on the stack by adding input symbols beneath it.
+
+        Raises PathFailed if the stacks would exceed MAX_STACK_ITEMS.
+        """
+        if n + len(self.altstack) > MAX_STACK_ITEMS:
+            raise PathFailed()
+        missing = n - len(self.stack)
+        if missing > 0:
+            new_inputs = [Symbol('input%d' % (self.inputs + i)) for i in range(missing)]
+            self.stack[0:0] = reversed(new_inputs)
+            self.inputs += missing
+
+    def pop(self):
+        self.need(1)
+        return self.stack.pop()
+
+    def add(self, constraint):
+        if constraint not in self.constraints:
+            self.constraints.append(constraint)
+
+    def require_true(self, value):
+        if isinstance(value, str):
+            if not _CastToBool(value):
+                raise PathFailed()
+        elif isinstance(value, Expression) and value.op == 'EQUAL':
+            self.require_equal(*value.args)
+        elif isinstance(value, Expression) and value.op == 'NUMEQUAL':
+            self.add(Constraint('numequal', value.args))
+        elif isinstance(value, Expression) and value.op == 'CHECKSIG':
+            self.add(Constraint('signature', (value.args[1],)))
+        elif isinstance(value, Expression) and value.op == 'CHECKMULTISIG':
+            self.add(Constraint('multisig', (value.args[0], value.args[1])))
+        elif isinstance(value, Expression) and value.op == 'NOT':
+            self.require_false(value.args[0])
+        else:
+            if Constraint('false', (value,)) in self.constraints:
+                raise PathFailed()
+            self.add(Constraint('true', (value,)))
+
+    def require_false(self, value):
+        if isinstance(value, str):
+            if _CastToBool(value):
+                raise PathFailed()
+        elif isinstance(value, Expression) and value.op == 'EQUAL':
+            a, b = value.args
+            if isinstance(a, str) and isinstance(b, str):
+                if a == b:
+                    raise PathFailed()
+            else:
+                self.add(Constraint('not equal', (a, b)))
+        elif isinstance(value, Expression) and value.op == 'NOT':
+            self.require_true(value.args[0])
+        else:
+            if Constraint('true', (value,)) in self.constraints:
+                raise PathFailed()
+            self.add(Constraint('false', (value,)))
+
+    def require_equal(self, a, b):
+        if isinstance(a, str) and isinstance(b, str):
+            if a != b:
+                raise PathFailed()
+            return
+        # Put the concrete value second.
+        if isinstance(a, str):
+            a, b = b, a
+        if isinstance(b, str) and isinstance(a, Expression) and a.op in [i[0] for i in hash_ops.values()]:
+            self.add(Constraint('preimage', (a.op, b, a.args[0])))
+        else:
+            self.add(Constraint('equal', (a, b)))
+
+    def execute(self, op, data):
+        """Execute op. Returns a list of SymbolicPaths, in case op forks this path."""
+        f_exec = all(self.vf_exec)
+        if op in opcodes.disabled_opcodes:
+            raise PathFailed()
+
+        if op <= OP_PUSHDATA4:
+            if f_exec:
+                self.stack.append(data)
+            return [self]
+
+        if op in [OP_IF, OP_NOTIF]:
+            if not f_exec:
+                self.vf_exec.append(False)
+                return [self]
+            cond = self.pop()
+            if op == OP_NOTIF:
+                cond = Expression('NOT', (cond,)) if not isinstance(cond, str) else ('' if _CastToBool(cond) else '\x01')
+            if isinstance(cond, str):
+                self.vf_exec.append(_CastToBool(cond))
+                return [self]
+            paths = []
+            for taken in [True, False]:
+                path = SymbolicPath(self.state())
+                try:
+                    if taken:
+                        path.require_true(cond)
+                    else:
+                        path.require_false(cond)
+                except PathFailed:
+                    continue
+                path.vf_exec.append(taken)
+                paths.append(path)
+            return paths
+        elif op == OP_ELSE:
+            if not self.vf_exec:
+                raise PathFailed()
+            self.vf_exec[-1] = not self.vf_exec[-1]
+            return [self]
+        elif op == OP_ENDIF:
+            if not self.vf_exec:
+                raise PathFailed()
+            self.vf_exec.pop()
+            return [self]
+
+        if not f_exec:
+            return [self]
+
+        stack = self.stack
+        if OP_1 <= op <= OP_16 or op == OP_1NEGATE:
+            stack.append(bn2vch(op - (OP_1 - 1)))
+        elif op in [OP_NOP, OP_CODESEPARATOR] or (OP_NOP1 <= op <= OP_NOP10 and op not in [OP_NOP2, OP_NOP3]):
+            pass
+        elif op in [OP_NOP2, OP_NOP3]:
+            # CHECKLOCKTIMEVERIFY and CHECKSEQUENCEVERIFY.
+            self.need(1)
+            value = small_int(stack[-1])
+            if value is None:
+                raise Unsupported(op_name(op))
+            self.add(Constraint('locktime' if op == OP_NOP2 else 'sequence', (value,)))
+        elif op == OP_RETURN:
+            raise PathFailed()
+        elif op == OP_VERIFY:
+            self.require_true(self.pop())
+        elif op == OP_TOALTSTACK:
+            self.altstack.append(self.pop())
+        elif op == OP_FROMALTSTACK:
+            if not self.altstack:
+                raise PathFailed()
+            stack.append(self.altstack.pop())
+        elif op == OP_DROP:
+            self.pop()
+        elif op == OP_2DROP:
+            self.need(2)
+            del stack[-2:]
+        elif op == OP_DUP:
+            self.need(1)
+            stack.append(stack[-1])
+        elif op == OP_2DUP:
+            self.need(2)
+            stack.extend(stack[-2:])
+        elif op == OP_3DUP:
+            self.need(3)
+            stack.extend(stack[-3:])
+        elif op == OP_OVER:
+            self.need(2)
+            stack.append(stack[-2])
+        elif op == OP_2OVER:
+            self.need(4)
+            stack.extend(stack[-4:-2])
+        elif op == OP_NIP:
+            self.need(2)
+            del stack[-2]
+        elif op == OP_TUCK:
+            self.need(2)
+            stack.insert(len(stack) - 2, stack[-1])
+        elif op == OP_SWAP:
+            self.need(2)
+            stack[-2], stack[-1] = stack[-1], stack[-2]
+        elif op == OP_2SWAP:
+            self.need(4)
+            stack[-4:] = stack[-2:] + stack[-4:-2]
+        elif op == OP_ROT:
+            self.need(3)
+            stack.append(stack.pop(-3))
+        elif op == OP_2ROT:
+            self.need(6)
+            stack.extend([stack.pop(-6), stack.pop(-5)])
+        elif op in [OP_PICK, OP_ROLL]:
+            n = small_int(self.pop())
+            if n is None:
+                raise Unsupported(op_name(op))
+            if n < 0:
+                raise PathFailed()
+            self.need(n + 1)
+            value = stack[-n - 1]
+            if op == OP_ROLL:
+                del stack[-n - 1]
+            stack.append(value)
+        elif op == OP_IFDUP:
+            self.need(1)
+            value = stack[-1]
+            if isinstance(value, str):
+                if _CastToBool(value):
+                    stack.append(value)
+                return [self]
+            paths = []
+            for dup in [True, False]:
+                path = SymbolicPath(self.state())
+                try:
+                    if dup:
+                        path.require_true(value)
+                    else:
+                        path.require_false(value)
+                except PathFailed:
+                    continue
+                if dup:
+                    path.stack.append(value)
+                paths.append(path)
+            return paths
+        elif op == OP_SIZE:
+            self.need(1)
+            value = stack[-1]
+            stack.append(bn2vch(len(value)) if isinstance(value, str) else Expression('SIZE', (value,)))
+        elif op in [OP_EQUAL, OP_EQUALVERIFY]:
+            b = self.pop()
+            a = self.pop()
+            if isinstance(a, str) and isinstance(b, str):
+                result = '\x01' if a == b else ''
+            else:
+                result = Expression('EQUAL', (a, b))
+            if op == OP_EQUALVERIFY:
+                self.require_true(result)
+            else:
+                stack.append(result)
+        elif op in hash_ops:
+            name, func = hash_ops[op]
+            value = self.pop()
+            stack.append(func(value) if isinstance(value, str) else Expression(name, (value,)))
+        elif op in unary_ops:
+            value = self.pop()
+            if isinstance(value, str):
+                stack.append(bn2vch(unary_ops[op](vch2bn(value))))
+            else:
+                stack.append(Expression('NOT' if op == OP_NOT else op_name(op)[3:], (value,)))
+        elif op in binary_ops or op == OP_NUMEQUALVERIFY:
+            b = self.pop()
+            a = self.pop()
+            if op == OP_NUMEQUALVERIFY:
+                if isinstance(a, str) and isinstance(b, str):
+                    if vch2bn(a) != vch2bn(b):
+                        raise PathFailed()
+                else:
+                    self.require_true(Expression('NUMEQUAL', (a, b)))
+            elif isinstance(a, str) and isinstance(b, str):
+                stack.append(bn2vch(binary_ops[op](vch2bn(a), vch2bn(b))))
+            else:
+                stack.append(Expression(op_name(op)[3:], (a, b)))
+        elif op == OP_WITHIN:
+            self.need(3)
+            stack[-3:] = [Expression('WITHIN', tuple(stack[-3:]))]
+        elif op in [OP_CHECKSIG, OP_CHECKSIGVERIFY]:
+            pubkey = self.pop()
+            sig = self.pop()
+            result = Expression('CHECKSIG', (sig, pubkey))
+            if op == OP_CHECKSIGVERIFY:
+                self.require_true(result)
+            else:
+                stack.append(result)
+        elif op in [OP_CHECKMULTISIG, OP_CHECKMULTISIGVERIFY]:
+            n = small_int(self.pop())
+            if n is None or not 0 <= n <= 20:
+                raise Unsupported(op_name(op))
+            self.need(n)
+            pubkeys = tuple(reversed([self.pop() for _ in range(n)]))
+            m = small_int(self.pop())
+            if m is None or not 0 <= m <= n:
+                raise Unsupported(op_name(op))
+            self.need(m + 1)
+            # Signatures and the extra item.
+            del stack[len(stack) - m - 1:]
+            result = Expression('CHECKMULTISIG', (m, pubkeys))
+            if op == OP_CHECKMULTISIGVERIFY:
+                self.require_true(result)
+            else:
+                stack.append(result)
+        else:
+            raise Unsupported(op_name(op))
+        return [self]
+
+def spending_conditions(script, max_paths=256):
+    """Derive the conditions for spending script.
+
+    Paths through the script are executed together, one operation at
+    a time, and identical states are merged after each operation so
+    that IF branches that converge are only executed once.
+
+    Args:
+        script (CScript): Script to execute, such as a scriptPubKey.
+        max_paths (int): Maximum number of paths to explore at once.
+
+    Returns:
+        A list of SpendingPaths, one for each way that script can pass.
+    """
+    states = [SymbolicState((), (), (), (), 0, False)]
+    for op, data, pc in CScript(script).raw_iter():
+        next_states = []
+        seen = set()
+        for state in states:
+            if state.done:
+                new_states = [state]
+            else:
+                path = SymbolicPath(state)
+                try:
+                    # Paths whose stacks exceed the limit fail, as in the interpreter.
+                    new_states = [i.state() for i in path.execute(op, data)
+                                  if len(i.stack) + len(i.altstack) <= MAX_STACK_ITEMS]
+                except PathFailed:
+                    new_states = []
+                except Unsupported as e:
+                    path.add(Constraint('unsupported', (str(e),)))
+                    path.done = True
+                    new_states = [path.state()]
+            for i in new_states:
+                if i not in seen:
+                    seen.add(i)
+                    next_states.append(i)
+        if len(next_states) > max_paths:
+            raise Exception('Script has more than %d paths' % max_paths)
+        states = next_states
+
+    paths = []
+    for state in states:
+        path = SymbolicPath(state)
+        if not path.done:
+            if path.vf_exec:
+                continue
+            try:
+                path.require_true(path.pop())
+            except PathFailed:
+                continue
+        paths.append(SpendingPath(path.inputs, tuple(path.constraints)))
+    return paths
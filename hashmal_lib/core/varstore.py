@@ -0,0 +1,157 @@
+"""Storage of variables.
+
+Stores the Variables plugin's data in its own SQLite database,
+so that changing a variable writes only that variable.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+def value_hash(value):
+    return hashlib.sha256(value).digest()
+
+class VariableStore(object):
+    """On-disk store of variables, in the order that they were added.
+
+    Values larger than max_cached_size bytes are read from disk when
+    they are needed instead of being kept in memory. The categories
+    of each value are stored with it, so that values do not need to be
+    read to be classified. Changes are not permanent until commit() is called.
+
+    Args:
+        filename (str): Path of the SQLite database. Use ':memory:'
+            for a store that is not saved.
+    """
+    max_cached_size = 4096
+
+    def __init__(self, filename=':memory:'):
+        super(VariableStore, self).__init__()
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS variables (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                        'hash BLOB NOT NULL)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS categories (key TEXT PRIMARY KEY, context BLOB NOT NULL, '
+                        'names TEXT NOT NULL)')
+        self.db.commit()
+        # {key: value, or None if the value is not cached}
+        self.cache = OrderedDict()
+        # {key: value hash} and {value hash: key}
+        self.key_hashes = {}
+        self.hash_keys = {}
+        rows = self.db.execute('SELECT key, hash, CASE WHEN length(value) <= ? THEN value END FROM variables '
+                               'ORDER BY rowid', (self.max_cached_size,))
+        for key, digest, value in rows:
+            key = str(key)
+            self.cache[key] = str(value) if value is not None else None
+            self.key_hashes[key] = bytes(digest)
+            self.hash_keys[bytes(digest)] = key
+        # {key: (context, categories)}
+        self.key_categories = {}
+        for key, context, names in self.db.execute('SELECT key, context, names FROM categories'):
+            self.key_categories[str(key)] = (bytes(context), [str(i) for i in json.loads(names)])
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __iter__(self):
+        return iter(self.cache)
+
+    def __contains__(self, key):
+        return key in self.cache
+
+    def __getitem__(self, key):
+        value = self.cache[key]
+        if value is None:
+            with self.lock:
+                row = self.db.execute('SELECT value FROM variables WHERE key = ?', (key,)).fetchone()
+            value = str(row[0])
+        return value
+
+    def __setitem__(self, key, value):
+        digest = value_hash(value)
+        with self.lock:
+            cursor = self.db.execute('UPDATE variables SET value = ?, hash = ? WHERE key = ?',
+                                     (sqlite3.Binary(value), sqlite3.Binary(digest), key))
+            if cursor.rowcount == 0:
+                self.db.execute('INSERT INTO variables VALUES (?, ?, ?)',
+                                (key, sqlite3.Binary(value), sqlite3.Binary(digest)))
+        self._forget_hash(key)
+        self._forget_categories(key)
+        self.cache[key] = value if len(value) <= self.max_cached_size else None
+        self.key_hashes[key] = digest
+        self.hash_keys[digest] = key
+
+    def __delitem__(self, key):
+        if key not in self.cache:
+            raise KeyError(key)
+        with self.lock:
+            self.db.execute('DELETE FROM variables WHERE key = ?', (key,))
+        del self.cache[key]
+        self._forget_hash(key)
+        self._forget_categories(key)
+
+    def _forget_hash(self, key):
+        digest = self.key_hashes.pop(key, None)
+        if digest is not None and self.hash_keys.get(digest) == key:
+            del self.hash_keys[digest]
+
+    def _forget_categories(self, key):
+        if self.key_categories.pop(key, None) is not None:
+            with self.lock:
+                self.db.execute('DELETE FROM categories WHERE key = ?', (key,))
+
+    def get_categories(self, key, context):
+        """Get the stored categories of the value of key.
+
+        Args:
+            context (str): What the categories were determined with (e.g. a digest of the known types).
+
+        Returns:
+            The list of categories, or None if they were not stored with context.
+        """
+        stored = self.key_categories.get(key)
+        if stored is None or stored[0] != context:
+            return None
+        return stored[1]
+
+    def set_categories(self, key, context, categories):
+        """Store the categories of the value of key. They are forgotten when the value changes."""
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO categories VALUES (?, ?, ?)',
+                            (key, sqlite3.Binary(context), json.dumps(categories)))
+        self.key_categories[key] = (context, list(categories))
+
+    def get(self, key, default=None):
+        if key not in self.cache:
+            return default
+        return self[key]
+
+    def keys(self):
+        return self.cache.keys()
+
+    def items(self):
+        return [(k, self[k]) for k in self.cache]
+
+    def iteritems(self):
+        for k in self.cache:
+            yield (k, self[k])
+
+    def key_for_value(self, value):
+        """Get the key that was most recently set to value."""
+        return self.hash_keys.get(value_hash(value))
+
+    def update(self, data):
+        for k, v in data.items():
+            self[k] = v
+
+    def commit(self):
+        """Make the changes since the last commit permanent."""
+        with self.lock:
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,96 @@
+"""Verification of transaction inputs.
+
+Nothing here imports Qt, so inputs can be verified by scripts and
+by worker processes without the GUI's import cost.
+"""
+import multiprocessing
+
+from bitcoin.core.scripteval import VerifyScript, VerifyScriptError
+
+import chainparams
+from analysis import analyze_script
+from script import Script
+from transaction import Transaction
+
+def verify_input(tx, in_idx, prev_script_pubkey):
+    """Verify an input of a transaction.
+
+    Scripts that cannot pass are rejected without executing them.
+
+    Args:
+        tx (Transaction): Transaction.
+        in_idx (int): Index of the input.
+        prev_script_pubkey (CScript): scriptPubKey of the output that the input spends.
+
+    Raises:
+        VerifyScriptError: The input is invalid.
+    """
+    tx_in = tx.vin[in_idx]
+    for script in [tx_in.scriptSig, prev_script_pubkey]:
+        errors = analyze_script(script).errors
+        if errors:
+            raise VerifyScriptError(errors[0])
+    VerifyScript(tx_in.scriptSig, prev_script_pubkey, tx, in_idx)
+
+def _verify_input(tx, in_idx, prev_script_pubkey):
+    try:
+        verify_input(tx, in_idx, prev_script_pubkey)
+    except Exception as e:
+        return str(e)
+    return None
+
+# (tx fields, raw transaction, Transaction) of the last transaction that a worker process verified.
+_worker_tx = (None, None, None)
+
+def _worker_verify_inputs(args):
+    """Verify a chunk of inputs in a worker process.
+
+    Workers keep the last transaction that they deserialized,
+    so each worker deserializes a transaction once.
+    """
+    global _worker_tx
+    tx_fields, raw_tx, items = args
+    if _worker_tx[:2] != (tx_fields, raw_tx):
+        # Workers may not have inherited the active chainparams.
+        chainparams.set_tx_fields(tx_fields)
+        _worker_tx = (tx_fields, raw_tx, Transaction.deserialize(raw_tx))
+    tx = _worker_tx[2]
+    return [_verify_input(tx, in_idx, Script(prev_script_pubkey)) for in_idx, prev_script_pubkey in items]
+
+def verify_inputs(tx, prev_script_pubkeys, processes=1, pool=None):
+    """Verify every input of a transaction.
+
+    Starting worker processes costs more than verifying a few hundred
+    inputs (see benchmarks/bench_headless.py), so callers that verify
+    many transactions should pass the same pool to each call.
+
+    Args:
+        tx (Transaction): Transaction.
+        prev_script_pubkeys (list): scriptPubKey of the output that each input spends.
+        processes (int): Number of worker processes, or the number of processes
+            in pool. If 1 and pool is None, inputs are verified in this process.
+        pool (multiprocessing.Pool): Worker processes to use. If None,
+            a pool is started and stopped by this call.
+
+    Returns:
+        A list with None for each valid input, and the reason
+        that the input is invalid for each invalid input.
+    """
+    if processes == 1 and pool is None:
+        return [_verify_input(tx, i, script) for i, script in enumerate(prev_script_pubkeys)]
+
+    tx_fields = chainparams.get_tx_fields()
+    raw_tx = tx.serialize()
+    items = [(i, bytes(script)) for i, script in enumerate(prev_script_pubkeys)]
+    size = max(1, len(items) // (processes * 4))
+    chunks = [(tx_fields, raw_tx, items[i:i + size]) for i in range(0, len(items), size)]
+
+    own_pool = pool is None
+    if own_pool:
+        pool = multiprocessing.Pool(processes)
+    try:
+        results = pool.map(_worker_verify_inputs, chunks)
+    finally:
+        if own_pool:
+            pool.terminate()
+    return [result for chunk in results for result in chunk]
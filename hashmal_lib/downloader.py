@@ -1,3 +1,5 @@
+import threading
+
 from PyQt4.QtGui import *
 from PyQt4.QtCore import *
 
@@ -5,28 +7,139 @@ from PyQt4.QtCore import *
 class Downloader(QObject):
     """Abstract downloader class that plugins can subclass."""
     finished = pyqtSignal()
+    # Emitted instead of finished() if the download is cancelled.
+    cancelled = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(Downloader, self).__init__(parent)
+        # Set by cancel(). Long-running downloads should check this periodically.
+        self.is_cancelled = False
 
     @pyqtSlot()
     def download(self):
         """Abstract method.
 
-        Subclasses should overload this method and emit finished() with their results.
+        Subclasses should overload this method and call emit_finished() with their results.
         """
-        self.finished.emit()
+        self.emit_finished()
 
-class DownloadController(QObject):
-    """Manages creation of QThreads for downloading."""
-    def do_download(self, downloader, callback):
-        """Execute a download in a separate QThread."""
+    def emit_finished(self, *args):
+        """Emit finished() with args, or cancelled() if this download was cancelled."""
+        if self.is_cancelled:
+            self.cancelled.emit()
+        else:
+            self.finished.emit(*args)
+
+    def skip(self):
+        """Called instead of download() if this download was cancelled before it started.
+
+        Emits cancelled().
+        """
+        self.cancelled.emit()
+
+    def cancel(self):
+        """Cancel this download.
+
+        A download that has not started yet will not be run,
+        and a download that is running will not emit its results.
+        """
+        self.is_cancelled = True
+
+class DownloadTask(QRunnable):
+    """Runs a Downloader in a thread pool thread."""
+    def __init__(self, controller, downloader):
+        super(DownloadTask, self).__init__()
+        self.controller = controller
         self.downloader = downloader
-        self.downloader_thread = thread = QThread()
-        downloader.moveToThread(thread)
-        thread.started.connect(downloader.download)
 
+    def run(self):
+        self.controller.task_started(self.downloader)
+        try:
+            if self.downloader.is_cancelled:
+                self.downloader.skip()
+            else:
+                self.downloader.download()
+        finally:
+            self.controller.taskDone.emit(self.downloader)
+
+class DownloadController(QObject):
+    """Manages a bounded pool of threads for downloading.
+
+    Downloads are queued and run by at most max_threads threads.
+    Downloads with a higher priority are started first.
+    """
+    # Emitted from a pool thread when a task has finished or was skipped.
+    taskDone = pyqtSignal(object, name='taskDone')
+    # Emitted with the number of queued downloads when it changes.
+    queueDepthChanged = pyqtSignal(int, name='queueDepthChanged')
+
+    def __init__(self, max_threads=4, parent=None):
+        super(DownloadController, self).__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.lock = threading.Lock()
+        # Downloaders that are queued or running.
+        # References are kept here until the download is done.
+        self.downloaders = set()
+        self.queued_count = 0
+        self.taskDone.connect(self.on_task_done)
+
+    def do_download(self, downloader, callback, priority=0):
+        """Queue a download to run in the thread pool.
+
+        Args:
+            downloader (Downloader): Downloader to run.
+            callback: Function to connect to downloader.finished.
+            priority (int): Downloads with higher priorities are started first.
+        """
         downloader.finished.connect(callback)
-        downloader.finished.connect(thread.quit)
-        downloader.finished.connect(downloader.deleteLater)
-        thread.finished.connect(thread.deleteLater)
 
-        thread.start()
+        with self.lock:
+            self.downloaders.add(downloader)
+            self.queued_count += 1
+            depth = self.queued_count
+        self.queueDepthChanged.emit(depth)
+
+        task = DownloadTask(self, downloader)
+        task.setAutoDelete(True)
+        self.pool.start(task, priority)
+
+    def task_started(self, downloader):
+        """Called from a pool thread when a task starts."""
+        with self.lock:
+            self.queued_count -= 1
+            depth = self.queued_count
+        self.queueDepthChanged.emit(depth)
+
+    def on_task_done(self, downloader):
+        with self.lock:
+            self.downloaders.discard(downloader)
+        downloader.deleteLater()
+
+    def cancel(self, downloader):
+        """Cancel a download.
+
+        A queued download will not be run, and a running download
+        will emit cancelled() instead of its results.
+        """
+        downloader.cancel()
+
+    def cancel_all(self):
+        """Cancel all queued and running downloads."""
+        with self.lock:
+            downloaders = list(self.downloaders)
+        for downloader in downloaders:
+            downloader.cancel()
+
+    def queue_depth(self):
+        """Return the number of downloads waiting for a thread."""
+        with self.lock:
+            return self.queued_count
+
+    def active_count(self):
+        """Return the number of downloads currently running."""
+        return self.pool.activeThreadCount()
 
+    def wait_for_done(self, msecs=-1):
+        """Block until all downloads are done or msecs elapse."""
+        return self.pool.waitForDone(msecs)
@@ -0,0 +1,164 @@
+"""Local block explorer.
+
+Serves blockchain data from fixtures with the same routes as the
+insight API (see core.explorers.insight_explorer), so that data
+retrieval can be used and measured without network access.
+
+Usage:
+    python -m hashmal_lib.explorer_server [--fixtures DIR] [--blk FILE] [--port PORT]
+
+The "local" explorer in the Blockchain plugin uses this server.
+"""
+import argparse
+import json
+import os
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from bitcoin.core import b2x, b2lx
+
+from hashmal_lib.core import chainparams, Transaction, Block
+from hashmal_lib.core.block import iter_blk_file
+
+default_port = 3001
+
+class ExplorerData(object):
+    """Raw transactions and blocks, indexed by txid and block hash."""
+    def __init__(self):
+        self.txs = {}
+        self.blocks = {}
+
+    def add_tx(self, raw):
+        """Add a raw (binary) transaction."""
+        tx = Transaction.deserialize(raw)
+        self.txs[b2lx(tx.GetHash())] = raw
+
+    def add_block(self, raw):
+        """Add a raw (binary) block and its transactions."""
+        blk = Block.deserialize(raw)
+        self.blocks[b2lx(blk.GetHash())] = raw
+        for tx in blk.vtx:
+            self.txs[b2lx(tx.GetHash())] = tx.serialize()
+
+    def add_raw(self, raw):
+        """Add raw data that is either a block or a transaction."""
+        try:
+            tx = Transaction.deserialize(raw)
+            is_tx = tx.serialize() == raw
+        except Exception:
+            is_tx = False
+        if is_tx:
+            self.add_tx(raw)
+        else:
+            self.add_block(raw)
+
+    def load_fixtures(self, path):
+        """Load hex-encoded blocks and transactions from the files in path."""
+        for filename in sorted(os.listdir(path)):
+            with open(os.path.join(path, filename), 'r') as f:
+                data = f.read().strip()
+            if not data:
+                continue
+            self.add_raw(data.decode('hex'))
+
+    def load_blk_file(self, filename):
+        """Load blocks from a blk*.dat file, as written by a full node."""
+        for raw in iter_blk_file(filename):
+            self.add_block(raw)
+
+    def block_as_insight(self, blockhash):
+        """Return a dict in the format of an insight API block."""
+        raw = self.blocks[blockhash]
+        blk = Block.deserialize(raw)
+        return {
+            'hash': blockhash,
+            'size': len(raw),
+            'version': blk.nVersion,
+            'previousblockhash': b2lx(blk.hashPrevBlock),
+            'merkleroot': b2lx(blk.hashMerkleRoot),
+            'time': blk.nTime,
+            'bits': '%08x' % blk.nBits,
+            'nonce': blk.nNonce,
+            'tx': [b2lx(tx.GetHash()) for tx in blk.vtx],
+        }
+
+class ExplorerRequestHandler(BaseHTTPRequestHandler):
+    """Handles insight API routes."""
+    def route(self, path):
+        """Return the response dict for path, or None if there is no such data."""
+        data = self.server.data
+        parts = path.strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'api':
+            return None
+        route, identifier = parts[1], parts[2]
+        if route == 'rawtx' and identifier in data.txs:
+            return {'rawtx': b2x(data.txs[identifier])}
+        elif route == 'rawblock' and identifier in data.blocks:
+            return {'rawblock': b2x(data.blocks[identifier])}
+        elif route == 'block' and identifier in data.blocks:
+            return data.block_as_insight(identifier)
+        return None
+
+    def do_GET(self):
+        response = self.route(self.path.split('?')[0])
+        if response is None:
+            self.send_error(404, 'Not found')
+            return
+        body = json.dumps(response)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class ExplorerServer(ThreadingMixIn, HTTPServer):
+    """Local block explorer server."""
+    daemon_threads = True
+
+    def __init__(self, data, host='127.0.0.1', port=default_port, verbose=False):
+        HTTPServer.__init__(self, (host, port), ExplorerRequestHandler)
+        self.data = data
+        self.verbose = verbose
+
+    def url(self):
+        host, port = self.server_address
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        """Serve in a background thread."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve blockchain data with insight API routes.')
+    parser.add_argument('--fixtures', help='Directory of files containing hex-encoded blocks or transactions.')
+    parser.add_argument('--blk', action='append', default=[], help='blk*.dat file to load blocks from.')
+    parser.add_argument('--chainparams', default='Bitcoin', help='Chainparams preset to deserialize data with.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=default_port)
+    parser.add_argument('--verbose', action='store_true', help='Log requests.')
+    args = parser.parse_args()
+
+    chainparams.set_to_preset(args.chainparams)
+    data = ExplorerData()
+    if args.fixtures:
+        data.load_fixtures(args.fixtures)
+    for filename in args.blk:
+        data.load_blk_file(filename)
+
+    server = ExplorerServer(data, args.host, args.port, args.verbose)
+    print('Serving %d blocks and %d transactions at %s' % (len(data.blocks), len(data.txs), server.url()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,7 @@ from PyQt4.QtGui import *
 from PyQt4 import QtCore
 
 from hashmal_lib.core import chainparams
+import tracer
 from config import Config
 from plugin_handler import PluginHandler
 from settings_dialog import SettingsDialog, ChainparamsComboBox, LayoutChanger
@@ -32,14 +33,16 @@ class HashmalMain(QMainWindow):
         self.dock_orders = defaultdict(list)
         self.setCorner(QtCore.Qt.BottomRightCorner, QtCore.Qt.RightDockWidgetArea)
 
-        self.config = Config()
+        with tracer.phase('config load'):
+            self.config = Config()
 
         QtCore.QCoreApplication.setOrganizationName('mazaclub')
         QtCore.QCoreApplication.setApplicationName('hashmal')
         self.qt_settings = QtCore.QSettings()
 
-        active_params = self.config.get_option('chainparams', 'Bitcoin')
-        chainparams.set_to_preset(active_params)
+        with tracer.phase('chainparams'):
+            active_params = self.config.get_option('chainparams', 'Bitcoin')
+            chainparams.set_to_preset(active_params)
 
         self.download_controller = DownloadController()
 
@@ -47,32 +50,37 @@ class HashmalMain(QMainWindow):
         # Plugin Handler loads plugins and handles their dock widgets.
         self.plugin_handler = PluginHandler(self)
         self.plugin_handler.load_plugins()
-        self.plugin_handler.do_default_layout()
-
-        # Filename of script being edited.
-        self.filename = ''
-        # The last text that we saved.
-        self.last_saved = ''
-        self.create_script_editor()
-        # Set up script editor font.
-        script_font = self.qt_settings.value('editor/font', defaultValue=QtCore.QVariant('default')).toString()
-        if script_font == 'default':
-            font = monospace_font
-        else:
-            font = QFont()
-            font.fromString(script_font)
-        self.script_editor.setFont(font)
-
-        self.create_menubar()
-        self.create_toolbar()
-        self.create_actions()
+        with tracer.phase('default layout'):
+            self.plugin_handler.do_default_layout()
+
+        with tracer.phase('script editor'):
+            # Filename of script being edited.
+            self.filename = ''
+            # The last text that we saved.
+            self.last_saved = ''
+            self.create_script_editor()
+            # Set up script editor font.
+            script_font = self.qt_settings.value('editor/font', defaultValue=QtCore.QVariant('default')).toString()
+            if script_font == 'default':
+                font = monospace_font
+            else:
+                font = QFont()
+                font.fromString(script_font)
+            self.script_editor.setFont(font)
+
+        with tracer.phase('menus and toolbar'):
+            self.create_menubar()
+            self.create_toolbar()
+            self.create_actions()
         self.new_script()
         self.statusBar().setVisible(True)
         self.statusBar().messageChanged.connect(self.change_status_bar)
 
-        self.restoreState(self.qt_settings.value('toolLayout/default/state').toByteArray())
-        self.restoreGeometry(self.qt_settings.value('toolLayout/default/geometry').toByteArray())
+        with tracer.phase('restoreState'):
+            self.restoreState(self.qt_settings.value('toolLayout/default/state').toByteArray())
+            self.restoreGeometry(self.qt_settings.value('toolLayout/default/geometry').toByteArray())
         self.script_editor.setFocus()
+        tracer.add_section('Plugins', self.plugin_handler.timing_report())
 
         if self.qt_settings.value('quickTipsOnStart', defaultValue=QtCore.QVariant(True)).toBool():
             QtCore.QTimer.singleShot(500, self.do_quick_tips)
@@ -140,6 +148,8 @@ class HashmalMain(QMainWindow):
             self.qt_settings.setValue('toolLayout/default', self.saveState())
 
         if self.close_script():
+            self.download_controller.cancel_all()
+            self.config.flush()
             event.accept()
         else:
             event.ignore()
@@ -1,15 +1,20 @@
 from functools import partial
-from pkg_resources import iter_entry_points
-from collections import OrderedDict
+from pkg_resources import iter_entry_points, EntryPoint
+from collections import OrderedDict, defaultdict
 import sys
+import time
 import __builtin__
 
 from PyQt4.QtGui import *
 from PyQt4.QtCore import *
 
 from gui_utils import required_plugins, default_plugins, add_shortcuts, hashmal_entry_points
-import plugins
+from downloader import Downloader
+from hashmal_lib.core.inflight import InFlightRequests, RequestCancelled
+from hashmal_lib.core import Transaction
+from hashmal_lib.core.prevouts import PrevoutIndex, index_file_path
 from plugins.base import Category
+import tracer
 
 
 class Augmentation(object):
@@ -38,12 +43,23 @@ class Augmentation(object):
         return '%s.%s' % (self.augmenter_plugin.name, self.hook_name)
 
 class Augmentations(list):
-    """Container for Augmentation instances."""
+    """Container for Augmentation instances.
+
+    Augmentations are indexed by plugin name and hook name.
+    """
+    def __init__(self, iterable=()):
+        super(Augmentations, self).__init__()
+        # {(plugin name, hook name): Augmentation, ...}
+        self.index = {}
+        for i in iterable:
+            self.append(i)
+
+    def append(self, augmentation):
+        super(Augmentations, self).append(augmentation)
+        self.index[(augmentation.augmenter_plugin.name, augmentation.hook_name)] = augmentation
+
     def get(self, plugin_name, hook_name):
-        for i in self:
-            if i.augmenter_plugin.name == plugin_name and i.hook_name == hook_name:
-                return i
-        return None
+        return self.index.get((plugin_name, hook_name))
 
     def for_plugin(self, plugin_name):
         """Return an Augmentations instance with augmenters in plugin_name."""
@@ -54,12 +70,131 @@ class Augmentations(list):
         return Augmentations(filter(lambda i: i.is_enabled == False, self))
 
 
+class PluginEntry(object):
+    """A registered plugin.
+
+    The plugin's module is not imported until the plugin is needed,
+    and its UI is not constructed until the plugin is enabled.
+
+    Attributes:
+        - name: Entry point name.
+        - entry_point: pkg_resources.EntryPoint of the plugin's make_plugin() function.
+        - plugin: Plugin instance, or None if the module has not been imported.
+        - import_time: Seconds spent importing the module, or None.
+        - construct_time: Seconds spent constructing the UI, or None.
+    """
+    def __init__(self, entry_point):
+        self.name = entry_point.name
+        self.entry_point = entry_point
+        self.plugin = None
+        self.import_time = None
+        self.construct_time = None
+
+    @property
+    def is_imported(self):
+        return self.plugin is not None
+
+    @property
+    def is_constructed(self):
+        return self.plugin is not None and self.plugin.ui is not None
+
+    def get_plugin(self):
+        """Import the plugin's module if necessary and return its Plugin."""
+        if self.plugin is None:
+            start = time.time()
+            plugin_maker = self.entry_point.resolve()
+            plugin = plugin_maker()
+            self.import_time = time.time() - start
+            tool_name = plugin.ui_class.tool_name
+            plugin.name = tool_name if tool_name else self.name
+            self.plugin = plugin
+        return self.plugin
+
+    def construct(self, plugin_handler):
+        """Construct the plugin's UI if necessary and return its Plugin."""
+        plugin = self.get_plugin()
+        if plugin.ui is None:
+            start = time.time()
+            plugin.instantiate_ui(plugin_handler)
+            self.construct_time = time.time() - start
+        return plugin
+
+def format_duration(seconds):
+    """Format a duration in milliseconds, or '-' if seconds is None."""
+    return '-' if seconds is None else '%.1f' % (seconds * 1000)
+
+def deliver_blockchain_data(callback, request):
+    """Call callback with the result of an in-flight blockchain data request."""
+    _, data_type, identifier = request.key
+    error = str(request.error) if request.error is not None else ''
+    callback(data_type, identifier, request.result, error)
+
+class BlockchainDataDownloader(Downloader):
+    """Retrieves blockchain data with a data retriever plugin.
+
+    The result is stored in the in-flight request for (plugin name, data_type, identifier).
+    If the download is cancelled, the request is finished with RequestCancelled
+    and finished() is still emitted, so that everyone waiting on it is notified.
+    """
+    finished = pyqtSignal(object, name='finished')
+    def __init__(self, in_flight_requests, plugin, data_type, identifier):
+        super(BlockchainDataDownloader, self).__init__()
+        self.in_flight_requests = in_flight_requests
+        self.plugin = plugin
+        self.data_type = data_type
+        self.identifier = identifier
+
+    @pyqtSlot()
+    def download(self):
+        result, error = None, None
+        try:
+            result = self.plugin.ui.retrieve_blockchain_data(self.data_type, self.identifier)
+        except Exception as e:
+            error = e
+        if self.is_cancelled:
+            result, error = None, RequestCancelled('Download was cancelled.')
+        self.finish_request(result, error)
+
+    def skip(self):
+        super(BlockchainDataDownloader, self).skip()
+        self.finish_request(None, RequestCancelled('Download was cancelled.'))
+
+    def finish_request(self, result, error):
+        key = (self.plugin.name, self.data_type, self.identifier)
+        request = self.in_flight_requests.finish(key, result, error)
+        self.finished.emit(request)
+
+def deliver_request(request):
+    """Deliver the result of a finished in-flight request to everyone that requested it."""
+    for callback in request.callbacks:
+        callback(request)
+
+def download_blockchain_data_async(in_flight_requests, download_controller, plugin, data_type, identifier, callback):
+    """Download blockchain data with a data retriever plugin in a DownloadController thread.
+
+    Identical requests that are in flight are coalesced into one download.
+    See PluginHandler.download_blockchain_data_async().
+
+    Returns:
+        The BlockchainDataDownloader, or None if an identical request was in flight.
+    """
+    key = (plugin.name, data_type, identifier)
+    _, is_new = in_flight_requests.begin(key, partial(deliver_blockchain_data, callback))
+    if not is_new:
+        return None
+    downloader = BlockchainDataDownloader(in_flight_requests, plugin, data_type, identifier)
+    download_controller.do_download(downloader, deliver_request)
+    return downloader
+
 class PluginHandler(QWidget):
     """Handles loading/unloading plugins and managing their UI widgets."""
     def __init__(self, main_window):
         super(PluginHandler, self).__init__(main_window)
         self.gui = main_window
         self.config = main_window.config
+        # {name: PluginEntry, ...} for every registered plugin.
+        self.plugin_entries = OrderedDict()
+        # Plugins whose UIs have been constructed.
         self.loaded_plugins = []
         self.config.optionChanged.connect(self.on_option_changed)
         # Whether the initial plugin loading is done.
@@ -68,15 +203,40 @@ class PluginHandler(QWidget):
         self.waiting_augmentations = []
         # Augmentations collection.
         self.augmentations = Augmentations()
+        # {hook name: [plugin, ...], ...} for loaded plugins with augmenters.
+        self.hook_augmenters = defaultdict(list)
+        # {(class name, hook name): (class name, hook name, data, callback), ...} for requested hooks,
+        # so that plugins loaded later can augment them.
+        self.hook_requests = OrderedDict()
+        # Tools menu and its category submenus.
+        self.tools_menu = None
+        self.category_menus = []
+        # {Qt.DockWidgetArea: last dock added to it, ...}
+        self.last_docks = {}
+        # Blockchain data requests that are being fulfilled.
+        self.in_flight_requests = InFlightRequests()
+        # {chainparams preset name: PrevoutIndex, ...}
+        self.prevout_indexes = {}
 
     def get_plugin(self, plugin_name):
+        """Get a plugin, loading it if it has not been loaded."""
         for plugin in self.loaded_plugins:
             if plugin.name == plugin_name:
                 return plugin
-        return None
+        return self.load_plugin(plugin_name)
 
     def create_menu(self, menu):
         """Add plugins to menu."""
+        self.tools_menu = menu
+        self.update_menu()
+
+    def update_menu(self):
+        """Add the loaded plugins to the tools menu."""
+        menu = self.tools_menu
+        for category_menu in self.category_menus:
+            menu.removeAction(category_menu.menuAction())
+        self.category_menus = []
+
         _categories = OrderedDict()
         for c in sorted([x[0] for x in Category.categories()]):
             _categories[c] = []
@@ -94,55 +254,120 @@ class PluginHandler(QWidget):
             if len(plugins) == 0:
                 continue
             category_menu = menu.addMenu(i)
+            self.category_menus.append(category_menu)
             for plugin in sorted(plugins, key = lambda x: x.name):
                 category_menu.addAction(plugin.ui.toggleViewAction())
 
-    def load_plugin(self, plugin_maker, name):
-        plugin_instance = plugin_maker()
+    def register_plugins(self):
+        """Register plugins from entry points without importing them."""
+        if __builtin__.use_local_modules:
+            entry_points = [EntryPoint.parse(i) for i in hashmal_entry_points['hashmal.plugin']]
+        else:
+            entry_points = iter_entry_points(group='hashmal.plugin')
+        for entry_point in entry_points:
+            self.plugin_entries[entry_point.name] = PluginEntry(entry_point)
+
+    def import_plugin(self, plugin_name):
+        """Import a registered plugin's module without constructing its UI.
 
-        tool_name = plugin_instance.ui_class.tool_name
-        plugin_instance.name = tool_name if tool_name else name
-        plugin_instance.instantiate_ui(self)
+        Returns:
+            The Plugin, or None if no such plugin is registered.
+        """
+        entry = self.plugin_entries.get(plugin_name)
+        if entry is None:
+            return None
+        plugin = entry.get_plugin()
         # Don't load plugins with unknown category metadata.
-        if plugin_instance.ui.category not in Category.categories():
-            return
+        if plugin.ui_class.category not in Category.categories():
+            del self.plugin_entries[plugin_name]
+            return None
+        return plugin
+
+    def import_plugins(self):
+        """Import every registered plugin's module without constructing their UIs."""
+        for name in list(self.plugin_entries.keys()):
+            self.import_plugin(name)
+
+    def load_plugin(self, plugin_name):
+        """Construct a registered plugin's UI if it has not been constructed.
+
+        Returns:
+            The Plugin, or None if no such plugin is registered.
+        """
+        plugin = self.import_plugin(plugin_name)
+        if plugin is None or plugin.ui is not None:
+            return plugin
+
+        self.plugin_entries[plugin_name].construct(self)
+        self.loaded_plugins.append(plugin)
+        augmenters = plugin.augmenters()
+        for hook_name in augmenters:
+            self.hook_augmenters[hook_name].append(plugin)
+        if not self.plugins_loaded:
+            return plugin
 
-        self.loaded_plugins.append(plugin_instance)
+        # Give the plugin the same treatment as those loaded at startup.
+        if plugin.has_gui:
+            if not self.gui.restoreDockWidget(plugin.ui):
+                self.add_dock(plugin.ui)
+            if self.tools_menu is not None:
+                self.update_menu()
+        for class_name, hook_name, data, callback in self.hook_requests.values():
+            if hook_name in augmenters and self.augmentations.get(plugin.name, hook_name) is None:
+                augmentation = Augmentation(plugin, hook_name, requester=class_name, data=data, callback=callback)
+                # Run when the plugin is enabled.
+                augmentation.is_enabled = False
+                self.augmentations.append(augmentation)
+        if plugin.name not in self.config.get_option('enabled_plugins', default_plugins):
+            self.set_plugin_enabled(plugin.name, False)
+        return plugin
 
     def load_plugins(self):
-        """Load plugins from entry points."""
-        if __builtin__.use_local_modules:
-            for i in hashmal_entry_points['hashmal.plugin']:
-                plugin_name = i[:i.find(' = ')]
-                module_name, plugin_maker_name = i[i.find('plugins.') + 8:].split(':')
-                module = getattr(plugins, module_name)
-                plugin_maker = getattr(module, plugin_maker_name)
-                self.load_plugin(plugin_maker, plugin_name)
-        else:
-            for entry_point in iter_entry_points(group='hashmal.plugin'):
-                plugin_maker = entry_point.load()
-                self.load_plugin(plugin_maker, entry_point.name)
+        """Register plugins from entry points and load the enabled ones."""
+        with tracer.phase('plugin registration'):
+            self.register_plugins()
 
         # Fail if core plugins aren't present.
         for req in required_plugins:
-            if req not in [i.name for i in self.loaded_plugins]:
+            if req not in self.plugin_entries:
                 print('Required plugin "{}" not found.\nTry running setup.py.'.format(req))
                 sys.exit(1)
 
-        self.update_enabled_plugins()
-        self.enable_required_plugins()
+        with tracer.phase('plugin loading'):
+            self.enable_required_plugins()
+            self.update_enabled_plugins()
         self.plugins_loaded = True
-        for i in self.waiting_augmentations:
-            self.do_augment_hook(*i)
+        with tracer.phase('augmentation hooks'):
+            for i in self.waiting_augmentations:
+                self.do_augment_hook(*i)
+
+    def timing_report(self):
+        """Get a report of the time spent importing and constructing each plugin."""
+        lines = ['%-24s %12s %15s' % ('Plugin', 'Import (ms)', 'Construct (ms)')]
+        for entry in self.plugin_entries.values():
+            lines.append('%-24s %12s %15s' % (entry.name, format_duration(entry.import_time),
+                                              format_duration(entry.construct_time)))
+        return '\n'.join(lines)
 
     def set_plugin_enabled(self, plugin_name, is_enabled):
-        """Enable or disable a plugin and its UI."""
-        plugin = self.get_plugin(plugin_name)
-        if plugin is None:
+        """Enable or disable a plugin and its UI.
+
+        Plugins are loaded when they are first enabled.
+        """
+        entry = self.plugin_entries.get(plugin_name)
+        if entry is None:
             return
 
-        # Do not disable required plugins.
-        if not is_enabled and plugin_name in required_plugins:
+        if not is_enabled:
+            # Do not disable required plugins.
+            if plugin_name in required_plugins:
+                return
+            # Plugins that have not been loaded have nothing to disable.
+            if not entry.is_constructed:
+                return
+
+        plugin = self.load_plugin(plugin_name)
+        if plugin is None:
             return
 
         plugin.ui.is_enabled = is_enabled
@@ -234,25 +459,20 @@ class PluginHandler(QWidget):
             if not augmentation in self.waiting_augmentations:
                 self.waiting_augmentations.append(augmentation)
             return
-        for plugin in self.loaded_plugins:
-            if hook_name in plugin.augmenters():
-
-                augmentation = self.augmentations.get(plugin.name, hook_name)
-                if augmentation is None:
-                    augmentation = Augmentation(plugin, hook_name, requester=class_name, data=data, callback=callback)
-                    self.augmentations.append(augmentation)
-
-                augmentation = self.augmentations.get(plugin.name, hook_name)
-                if augmentation is None:
-                    continue
-
-                # Don't hook disabled plugins.
-                if plugin.name not in self.config.get_option('enabled_plugins', default_plugins):
-                    augmentation.is_enabled = False
-                    continue
+        self.hook_requests.setdefault((class_name, hook_name), (class_name, hook_name, data, callback))
+        for plugin in self.hook_augmenters.get(hook_name, []):
+            augmentation = self.augmentations.get(plugin.name, hook_name)
+            if augmentation is None:
+                augmentation = Augmentation(plugin, hook_name, requester=class_name, data=data, callback=callback)
+                self.augmentations.append(augmentation)
+
+            # Don't hook disabled plugins.
+            if not plugin.ui.is_enabled:
+                augmentation.is_enabled = False
+                continue
 
-                # Call the augmenter method.
-                self.do_augment(augmentation)
+            # Call the augmenter method.
+            self.do_augment(augmentation)
 
     def do_augment(self, augmentation):
         """Call the augmenter for an Augmentation."""
@@ -281,20 +501,102 @@ class PluginHandler(QWidget):
         return retrievers
 
     # TODO access data retrievers from Plugin, not UI
+    def get_data_retriever(self, data_type):
+        """Get the pre-chosen plugin for retrieving data_type data."""
+        plugin_name = self.config.get_option('data_retriever', 'Blockchain')
+        plugin = self.get_plugin(plugin_name)
+        if not plugin or not hasattr(plugin.ui, 'retrieve_blockchain_data'):
+            plugin = self.get_plugin('Blockchain')
+        if not data_type in plugin.ui.supported_blockchain_data_types():
+            raise Exception('Plugin "%s" does not support downloading "%s" data.' % (plugin.name, data_type))
+        return plugin
+
     def download_blockchain_data(self, data_type, identifier):
         """Download blockchain data with the pre-chosen plugin.
 
+        If an identical request is already in flight, its result
+        is returned instead of downloading the data again.
+
         Args:
             data_type (str): Type of data (e.g. 'raw_transaction').
             identifier (str): Data identifier (e.g. transaction ID).
         """
-        plugin_name = self.config.get_option('data_retriever', 'Blockchain')
-        plugin = self.get_plugin(plugin_name)
-        if not plugin or not hasattr(plugin.ui, 'retrieve_blockchain_data'):
-            plugin = self.get_plugin('Blockchain')
-        if not data_type in plugin.ui.supported_blockchain_data_types():
-            raise Exception('Plugin "%s" does not support downloading "%s" data.' % (plugin.name, data_type))
-        return plugin.ui.retrieve_blockchain_data(data_type, identifier)
+        plugin = self.get_data_retriever(data_type)
+        key = (plugin.name, data_type, identifier)
+        return self.in_flight_requests.fetch(key, lambda: plugin.ui.retrieve_blockchain_data(data_type, identifier))
+
+    def download_blockchain_data_async(self, data_type, identifier, callback):
+        """Download blockchain data with the pre-chosen plugin in a separate thread.
+
+        Identical requests that are in flight are coalesced into one download.
+
+        Args:
+            data_type (str): Type of data (e.g. 'raw_transaction').
+            identifier (str): Data identifier (e.g. transaction ID).
+            callback: Function to call with (data_type, identifier, result, error)
+                when the download is done. error is an empty string on success.
+        """
+        plugin = self.get_data_retriever(data_type)
+        download_blockchain_data_async(self.in_flight_requests, self.gui.download_controller,
+                                       plugin, data_type, identifier, callback)
+
+    def get_prevout_index(self):
+        """Get the PrevoutIndex for the active chainparams preset."""
+        name = self.config.get_option('chainparams', 'Bitcoin')
+        index = self.prevout_indexes.get(name)
+        if index is None:
+            index = self.prevout_indexes[name] = PrevoutIndex(index_file_path(name))
+        return index
+
+    def get_prevout(self, txid, n):
+        """Get the scriptPubKey and value of a transaction output.
+
+        The prevout index is consulted before downloading the transaction.
+        Downloaded transactions are added to the index.
+
+        Returns:
+            A 2-tuple of (scriptPubKey, nValue).
+        """
+        index = self.get_prevout_index()
+        prevout = index.get(txid, n)
+        if prevout is not None:
+            return prevout
+
+        raw_tx = self.download_blockchain_data('raw_transaction', txid)
+        tx = Transaction.deserialize(raw_tx.decode('hex'))
+        index.add_tx(tx)
+        return (tx.vout[n].scriptPubKey, tx.vout[n].nValue)
+
+    def get_prevout_async(self, txid, n, callback):
+        """Get the scriptPubKey and value of a transaction output without blocking.
+
+        The prevout index is consulted before downloading the transaction
+        in a separate thread.
+
+        Args:
+            callback: Function to call with (prevout, error) when done.
+                prevout is a 2-tuple of (scriptPubKey, nValue), or None if error is not empty.
+        """
+        index = self.get_prevout_index()
+        prevout = index.get(txid, n)
+        if prevout is not None:
+            callback(prevout, '')
+            return
+
+        def on_downloaded(data_type, identifier, raw_tx, error):
+            if not error:
+                try:
+                    tx = Transaction.deserialize(raw_tx.decode('hex'))
+                    index.add_tx(tx)
+                    prevout = (tx.vout[n].scriptPubKey, tx.vout[n].nValue)
+                except Exception as e:
+                    error = str(e)
+            callback(None if error else prevout, error)
+
+        try:
+            self.download_blockchain_data_async('raw_transaction', txid, on_downloaded)
+        except Exception as e:
+            callback(None, str(e))
 
     def evaluate_current_script(self):
         """Evaluate the script being edited with the Stack Evaluator tool."""
@@ -304,32 +606,30 @@ class PluginHandler(QWidget):
         self.get_plugin('Stack Evaluator').ui.tx_script.setPlainText(script_hex)
         self.get_plugin('Stack Evaluator').ui.do_evaluate()
 
+    def add_dock(self, dock):
+        """Add a hidden dock to the main window, tabified with the last dock in its area."""
+        # Large docks go to the bottom. Small docks go to the right.
+        area = Qt.BottomDockWidgetArea if dock.is_large else Qt.RightDockWidgetArea
+        self.gui.addDockWidget(area, dock)
+        last_dock = self.last_docks.get(area)
+        if last_dock:
+            self.gui.tabifyDockWidget(last_dock, dock)
+        self.last_docks[area] = dock
+        dock.setVisible(False)
+
     def do_default_layout(self):
-        last_small = last_large = None
+        self.last_docks = {}
         for plugin in self.loaded_plugins:
             if not plugin.has_gui:
                 continue
-            dock = plugin.ui
-            # Large docks go to the bottom.
-            if dock.is_large:
-                self.gui.addDockWidget(Qt.BottomDockWidgetArea, dock)
-                if last_large:
-                    self.gui.tabifyDockWidget(last_large, dock)
-                last_large = dock
-            # Small docks go to the right.
-            else:
-                self.gui.addDockWidget(Qt.RightDockWidgetArea, dock)
-                if last_small:
-                    self.gui.tabifyDockWidget(last_small, dock)
-                last_small = dock
-            dock.setVisible(False)
+            self.add_dock(plugin.ui)
 
         self.get_plugin('Variables').ui.setVisible(True)
         self.get_plugin('Stack Evaluator').ui.setVisible(True)
 
     def enable_required_plugins(self):
         """Ensure that all required plugins are enabled."""
-        enabled_plugins = self.config.get_option('enabled_plugins', default_plugins)
+        enabled_plugins = list(self.config.get_option('enabled_plugins', default_plugins))
         needs_save = False
         for i in required_plugins:
             if i not in enabled_plugins:
@@ -341,9 +641,8 @@ class PluginHandler(QWidget):
     def update_enabled_plugins(self):
         """Enable or disable plugin docks according to config file."""
         enabled_plugins = self.config.get_option('enabled_plugins', default_plugins)
-        for plugin in self.loaded_plugins:
-            is_enabled = plugin.name in enabled_plugins
-            self.set_plugin_enabled(plugin.name, is_enabled)
+        for name in list(self.plugin_entries.keys()):
+            self.set_plugin_enabled(name, name in enabled_plugins)
 
     def on_option_changed(self, key):
         if key == 'enabled_plugins':
@@ -4,22 +4,25 @@ from PyQt4.QtGui import *
 from PyQt4.QtCore import *
 
 from gui_utils import Separator, required_plugins, default_plugins
+from plugin_handler import format_duration
 
 class PluginsModel(QAbstractTableModel):
     def __init__(self, gui, parent=None):
         super(PluginsModel, self).__init__(parent)
         self.gui = gui
-        self.plugins = gui.plugin_handler.loaded_plugins
+        # Plugin metadata requires importing plugins, but not constructing their UIs.
+        gui.plugin_handler.import_plugins()
+        self.entries = sorted(gui.plugin_handler.plugin_entries.values(), key=lambda i: i.plugin.name)
         self.config = gui.config
         self.config.optionChanged.connect(self.on_option_changed)
         self.enabled_plugins = self.config.get_option('enabled_plugins', default_plugins)
         self.favorite_plugins = self.config.get_option('favorite_plugins', [])
 
     def columnCount(self, parent=QModelIndex()):
-        return 6
+        return 7
 
     def rowCount(self, parent=QModelIndex()):
-        return len(self.plugins)
+        return len(self.entries)
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         if orientation == Qt.Vertical:
@@ -31,7 +34,8 @@ class PluginsModel(QAbstractTableModel):
                 {Qt.DisplayRole: 'Enabled', Qt.ToolTipRole: 'Whether the plugin is enabled'},
                 {Qt.DisplayRole: 'Favorite', Qt.ToolTipRole: 'Whether the plugin is a favorite'},
                 {Qt.DisplayRole: 'GUI', Qt.ToolTipRole: 'Whether the plugin has a graphical user interface'},
-                {Qt.DisplayRole: 'Description', Qt.ToolTipRole: 'Plugin description'}
+                {Qt.DisplayRole: 'Description', Qt.ToolTipRole: 'Plugin description'},
+                {Qt.DisplayRole: 'Load Time', Qt.ToolTipRole: 'Time spent importing and constructing the plugin'}
         ]
 
         data = None
@@ -55,7 +59,7 @@ class PluginsModel(QAbstractTableModel):
             if role in [Qt.DisplayRole, Qt.ToolTipRole, Qt.EditRole]:
                 data = plugin.name
         elif col == 1:
-            category_name, category_desc = plugin.ui.category
+            category_name, category_desc = plugin.ui_class.category
             if role in [Qt.DisplayRole, Qt.EditRole]:
                 data = category_name
             elif role in [Qt.ToolTipRole]:
@@ -80,7 +84,12 @@ class PluginsModel(QAbstractTableModel):
                 data = has_gui
         elif col == 5:
             if role in [Qt.DisplayRole, Qt.EditRole]:
-                data = plugin.ui.description
+                data = plugin.ui_class.description
+        elif col == 6:
+            entry = self.entries[index.row()]
+            if role in [Qt.DisplayRole, Qt.EditRole]:
+                data = 'Import: %s ms, construction: %s ms' % (format_duration(entry.import_time),
+                                                               format_duration(entry.construct_time))
 
         return QVariant(data)
 
@@ -93,7 +102,7 @@ class PluginsModel(QAbstractTableModel):
 
         if col == 2:
             is_checked = value.toBool()
-            enabled = self.enabled_plugins
+            enabled = list(self.enabled_plugins)
             name = plugin.name
             is_enabled = name in enabled
 
@@ -111,7 +120,7 @@ class PluginsModel(QAbstractTableModel):
             return True
         elif col == 3:
             is_checked = value.toBool()
-            favorites = self.favorite_plugins
+            favorites = list(self.favorite_plugins)
             name = plugin.name
             in_favorites = name in favorites
 
@@ -133,8 +142,7 @@ class PluginsModel(QAbstractTableModel):
     def plugin_for_index(self, index):
         if not index.isValid():
             return None
-        plugin = sorted(self.plugins, key=lambda i: i.name)[index.row()]
-        return plugin
+        return self.entries[index.row()].plugin
 
     def on_option_changed(self, key):
         if key == 'enabled_plugins':
@@ -159,11 +167,13 @@ class PluginDetails(QWidget):
         self.name_label = QLineEdit()
         self.category_label = QLineEdit()
         self.desc_edit = QTextEdit()
+        self.load_time_label = QLineEdit()
+        self.load_time_label.setToolTip('Time spent importing and constructing the plugin. Plugins are constructed when they are first enabled.')
         self.name_label.setToolTip('Plugin name')
         self.desc_edit.setToolTip('Plugin description')
         self.desc_edit.setReadOnly(True)
         self.desc_edit.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Minimum)
-        for i in [self.name_label, self.category_label, self.desc_edit]:
+        for i in [self.name_label, self.category_label, self.desc_edit, self.load_time_label]:
             i.setReadOnly(True)
         self.plugin_is_enabled = QCheckBox('Enabled')
         self.plugin_is_enabled.setToolTip('Whether this plugin is enabled')
@@ -182,11 +192,13 @@ class PluginDetails(QWidget):
         self.mapper.addMapping(self.plugin_is_favorite, 3)
         self.mapper.addMapping(self.has_gui, 4)
         self.mapper.addMapping(self.desc_edit, 5)
+        self.mapper.addMapping(self.load_time_label, 6)
 
         form = QFormLayout()
         form.setContentsMargins(0,6,0,0)
         form.addRow('Plugin Name:', self.name_label)
         form.addRow('Category:', self.category_label)
+        form.addRow('Load Time:', self.load_time_label)
         form.addRow(self.plugin_is_enabled)
         form.addRow(self.plugin_is_favorite)
         form.addRow(self.has_gui)
@@ -230,7 +242,7 @@ class PluginManager(QDialog):
         self.view.horizontalHeader().setResizeMode(0, QHeaderView.Stretch)
         self.view.horizontalHeader().setResizeMode(1, QHeaderView.ResizeToContents)
         self.view.horizontalHeader().setHighlightSections(False)
-        for i in [4, 5]:
+        for i in [4, 5, 6]:
             self.view.horizontalHeader().setSectionHidden(i, True)
         self.view.verticalHeader().setDefaultSectionSize(22)
         self.view.verticalHeader().setVisible(False)
@@ -1,16 +1,5 @@
+# Plugin modules are imported by PluginHandler when they are needed.
 import base
 from base import augmenter
 from base import BasePluginUI, BaseDock
 from base import Plugin, Category
-
-import addr_encoder
-import block_analyzer
-import blockchain
-import item_types
-import script_gen
-import stack
-import tx_analyzer
-import tx_builder
-import variables
-import wallet_rpc
-
@@ -102,7 +102,7 @@ class BasePluginUI(object):
 
     def set_option(self, key, value):
         """Set a plugin-specific config option."""
-        options = self.options()
+        options = dict(self.options())
         options[key] = value
         self.save_options(options)
 
@@ -184,6 +184,9 @@ class BaseDock(BasePluginUI, QDockWidget):
         if self.isVisible():
             self.needsFocus.emit()
 
-    def download_async(self, downloader, callback):
-        """Execute a downloader.Downloader subclass in a separate thread and call callback with the results."""
-        self.handler.gui.download_controller.do_download(downloader, callback)
+    def download_async(self, downloader, callback, priority=0):
+        """Execute a downloader.Downloader subclass in a separate thread and call callback with the results.
+
+        Downloads with a higher priority are started first.
+        """
+        self.handler.gui.download_controller.do_download(downloader, callback, priority)
@@ -12,6 +12,8 @@ from item_types import ItemAction
 from hashmal_lib.gui_utils import Separator
 from hashmal_lib.widgets.block import BlockWidget
 from hashmal_lib.core import BlockHeader, Block
+from hashmal_lib.core.block import classify_outputs
+from hashmal_lib.core.script import script_types
 
 def make_plugin():
     return Plugin(BlockAnalyzer)
@@ -36,6 +38,22 @@ def deserialize_block_or_header(raw):
     except Exception as e:
         return (None, None)
 
+# Display names of output script types.
+script_type_names = {
+    'pubkeyhash': 'P2PKH',
+    'scripthash': 'P2SH',
+    'pubkey': 'P2PK',
+    'multisig': 'Multisig',
+    'nulldata': 'OP_RETURN',
+    'nonstandard': 'Nonstandard',
+}
+
+def script_types_summary(blk):
+    """Describe the number of each type of output script in blk."""
+    classified = classify_outputs(blk)
+    counts = ['%d %s' % (len(classified[i]), script_type_names[i]) for i in script_types if i in classified]
+    return ', '.join(counts)
+
 class BlockAnalyzer(BaseDock):
 
     tool_name = 'Block Analyzer'
@@ -79,6 +97,10 @@ class BlockAnalyzer(BaseDock):
         form.addRow(self.raw_block_invalid)
         form.addRow(Separator())
         form.addRow(self.block_widget)
+
+        self.script_types_label = QLabel()
+        self.script_types_label.setWhatsThis('The number of each type of output script in the block\'s transactions.')
+        form.addRow('Output Scripts:', self.script_types_label)
         return form
 
     def raw_block_context_menu(self, pos):
@@ -99,6 +121,7 @@ class BlockAnalyzer(BaseDock):
 
         # Clears the widget if block_header is None.
         self.block_widget.set_block(self.header, self.block)
+        self.script_types_label.setText(script_types_summary(self.block) if self.block else '')
 
     def deserialize_item(self, item):
         self.needsFocus.emit()
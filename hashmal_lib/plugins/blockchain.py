@@ -1,12 +1,11 @@
 from collections import namedtuple, OrderedDict
-import requests
 
 from PyQt4.QtGui import *
 from PyQt4.QtCore import *
 from bitcoin.core import x, lx, b2x
 
 from hashmal_lib.gui_utils import floated_buttons
-from hashmal_lib.core import BlockHeader
+from hashmal_lib.core.explorers import known_explorers, local_explorer
 from hashmal_lib.downloader import Downloader
 from base import BaseDock, Plugin, Category
 
@@ -17,58 +16,6 @@ known_data_types = OrderedDict()
 known_data_types.update({'Transaction': 'raw_tx'})
 known_data_types.update({'Block Header': 'raw_header'})
 
-class BlockExplorer(object):
-    """Blockchain API base class.
-
-    Attributes:
-        name (str): Identifying name.
-        domain (str): Base URL.
-        routes (dict): URL routes for data (e.g. {'raw_tx': '/tx/'}).
-        parsers (dict): Lambdas for parsing request responses.
-
-    """
-    name = ''
-    domain = ''
-    routes = None
-    parsers = None
-
-    def __init__(self, **kwargs):
-        for k, v in kwargs.items():
-            setattr(self, k, v)
-        if self.routes is None:
-            self.routes = {}
-        if self.parsers is None:
-            self.parsers = {}
-
-    def request(self, url):
-        r = requests.get(url)
-        r.raise_for_status()
-        return r.json()
-
-    def get_data(self, data_type, identifier):
-        if not self.routes.get(data_type) or not self.parsers.get(data_type):
-            return
-        s = [self.domain]
-        s.append(self.routes[data_type])
-        s.append(identifier)
-        s = ''.join(s)
-        res = self.request(s)
-        return self.parsers[data_type](res)
-
-def header_from_insight_block(d):
-    version = int(d['version'])
-    prev_block = lx(d['previousblockhash'])
-    merkle_root = lx(d['merkleroot'])
-    time = int(d['time'])
-    bits = int(d['bits'], 16)
-    nonce = int(d['nonce'])
-    return BlockHeader(version, prev_block, merkle_root, time, bits, nonce).as_hex()
-
-insight_explorer = type('insight_explorer', (BlockExplorer,), dict(name='insight',domain='https://insight.bitpay.com',
-                routes = {'raw_tx':'/api/rawtx/', 'raw_header':'/api/block/'},
-                parsers = {'raw_tx':lambda d: d.get('rawtx'), 'raw_header': header_from_insight_block}))
-known_explorers = {'Bitcoin': [insight_explorer()]}
-
 class BlockchainDownloader(Downloader):
     finished = pyqtSignal(str, str, str, str, name='finished')
     def __init__(self, explorer, data_type, identifier):
@@ -85,7 +32,7 @@ class BlockchainDownloader(Downloader):
             raw = self.explorer.get_data(self.data_type, self.identifier)
         except Exception as e:
             error = '{}: {}'.format(str(e.__class__.__name__), str(e))
-        self.finished.emit(self.data_type, self.identifier, raw, error)
+        self.emit_finished(self.data_type, self.identifier, raw, error)
 
 class Blockchain(BaseDock):
 
@@ -109,6 +56,7 @@ class Blockchain(BaseDock):
             explorer = self.known_explorers['Bitcoin'][0]
         self.chain = chain
         self.explorer = explorer
+        self.set_local_explorer_url(self.option('local_explorer_url', local_explorer.domain))
         # Cache of recently downloaded txs
         self.recent_data = OrderedDict()
 
@@ -182,7 +130,16 @@ class Blockchain(BaseDock):
             self.set_option('cache_size', new_size)
         cache_size_box.valueChanged.connect(change_cache_size)
 
+        local_url_edit = QLineEdit(self.option('local_explorer_url', local_explorer.domain))
+        local_url_edit.setWhatsThis('Use this to change the URL of the "local" block explorer. A local block explorer can be run with hashmal_lib.explorer_server.')
+        def change_local_url():
+            url = str(local_url_edit.text())
+            self.set_option('local_explorer_url', url)
+            self.set_local_explorer_url(url)
+        local_url_edit.editingFinished.connect(change_local_url)
+
         form.addRow('Transaction cache size:', cache_size_box)
+        form.addRow('Local explorer URL:', local_url_edit)
 
         w = QWidget()
         w.setLayout(form)
@@ -242,7 +199,8 @@ class Blockchain(BaseDock):
 
     def update_cache(self, identifier, raw):
         self.recent_data[identifier] = raw
-        while len(self.recent_data.keys()) > int(self.option('cache_size', 25)):
+        cache_size = int(self.option('cache_size', 25))
+        while len(self.recent_data) > cache_size:
             self.recent_data.popitem(False)
 
     def do_download(self):
@@ -313,6 +271,13 @@ class Blockchain(BaseDock):
             self.update_cache(blockhash, rawheader)
         return rawheader
 
+    def set_local_explorer_url(self, url):
+        """Set the URL of "local" block explorers."""
+        for explorers in self.known_explorers.values():
+            for explorer in explorers:
+                if isinstance(explorer, local_explorer):
+                    explorer.domain = url.rstrip('/')
+
     def on_explorer_combo_changed(self, idx):
         new_explorer = self.known_explorers[self.chain][idx]
         self.set_explorer(new_explorer)
@@ -3,13 +3,16 @@
 This module makes it easier for individual plugins and
 parts of Hashmal to use consistent metadata.
 """
+import hashlib
+import string
+import struct
 from collections import namedtuple, defaultdict
 
 from bitcoin.core import x, lx, b2x, b2lx
 from PyQt4.QtCore import pyqtSignal, QObject
 from PyQt4.QtGui import QApplication
 
-from hashmal_lib.core import Transaction, BlockHeader, Block
+from hashmal_lib.core import chainparams, Transaction, BlockHeader, Block
 from base import Plugin, BasePluginUI
 
 class Item(object):
@@ -20,6 +23,16 @@ class Item(object):
         """Attempt to coerce data into an item of this type."""
         return None
 
+    @classmethod
+    def sniff(cls, data):
+        """Cheaply check whether data could be coerced into an item of this type.
+
+        Returns:
+            The form of data to pass to coerce_item(), or None if
+            coerce_item() would certainly fail.
+        """
+        return data
+
     def __init__(self, value):
         self.value = value
         # Actions that this item supports without the need of any plugins.
@@ -41,12 +54,84 @@ item_types = []
 # List of ItemAction instances.
 item_actions = []
 
+# Item types that string data was coerced into, by data hash and formats.
+_coerced_types = {}
+max_cache_size = 1000
+
+def _cache_key(data):
+    return (len(item_types), tuple(chainparams.get_tx_fields()), tuple(chainparams.get_block_header_fields()),
+            tuple(chainparams.get_block_fields()), hashlib.sha256(data).digest())
+
 def instantiate_item(data):
-    """Attempt to instantiate an item with the value of data."""
+    """Attempt to instantiate an item with the value of data.
+
+    Item types whose sniff() rules out data are skipped, and the
+    type that string data is coerced into is cached, so that data
+    is not repeatedly parsed as every type.
+    """
+    if not isinstance(data, str):
+        for i in item_types:
+            instance = i.coerce_item(data)
+            if instance is not None:
+                return instance
+        return None
+
+    key = _cache_key(data)
+    if key in _coerced_types:
+        cls = _coerced_types[key]
+        return cls.coerce_item(cls.sniff(data)) if cls else None
+
+    instance = None
     for i in item_types:
-        instance = i.coerce_item(data)
+        value = i.sniff(data)
+        if value is None:
+            continue
+        instance = i.coerce_item(value)
         if instance is not None:
-            return instance
+            break
+
+    if len(_coerced_types) >= max_cache_size:
+        _coerced_types.clear()
+    _coerced_types[key] = instance.__class__ if instance is not None else None
+    return instance
+
+# Last (data, binary form) pair, since each item type sniffs the same data.
+_last_binary_form = (None, None)
+
+def binary_form(data):
+    """Get binary data from data, decoding it if it is hex."""
+    global _last_binary_form
+    if not isinstance(data, str):
+        return None
+    if _last_binary_form[0] is data:
+        return _last_binary_form[1]
+    raw = data
+    if len(data) % 2 == 0 and not data.translate(None, string.hexdigits):
+        raw = x(data)
+    _last_binary_form = (data, raw)
+    return raw
+
+def read_compact_size(data, offset):
+    """Read a compact size (varint) at offset in data.
+
+    Returns:
+        A 2-tuple of (value, number of bytes read), or None if data is too short.
+    """
+    if offset >= len(data):
+        return None
+    first = ord(data[offset])
+    if first < 0xfd:
+        return (first, 1)
+    fmt, size = {0xfd: ('<H', 2), 0xfe: ('<I', 4), 0xff: ('<Q', 8)}[first]
+    if offset + 1 + size > len(data):
+        return None
+    return (struct.unpack(fmt, data[offset + 1:offset + 1 + size])[0], 1 + size)
+
+def fixed_length(fields):
+    """Get the total size of fields, or None if any field has a variable size."""
+    if any(i[2] is None for i in fields):
+        return None
+    return sum(i[2] for i in fields)
 
 def get_actions(name):
     """Get actions for an item type.
@@ -87,6 +172,28 @@ class TxItem(Item):
                 if value:
                     return cls(value)
 
+    @classmethod
+    def sniff(cls, data):
+        raw = binary_form(data)
+        if raw is None:
+            return data
+        # Check that there is room for the inputs that the input count specifies.
+        fields = chainparams.get_tx_fields()
+        names = [i[0] for i in fields]
+        if 'vin' not in names:
+            return raw
+        offset = fixed_length(fields[:names.index('vin')])
+        if offset is None:
+            return raw
+        count = read_compact_size(raw, offset)
+        if count is None:
+            return None
+        # An input is at least 41 bytes.
+        n, size = count
+        if offset + size + n * 41 > len(raw):
+            return None
+        return raw
+
     def __init__(self, *args):
         super(TxItem, self).__init__(*args)
         def copy_txid():
@@ -122,6 +229,29 @@ class BlockItem(Item):
                 if value:
                     return cls(value)
 
+    @classmethod
+    def sniff(cls, data):
+        raw = binary_form(data)
+        if raw is None:
+            return data
+        header_length = fixed_length(chainparams.get_block_header_fields())
+        if header_length is None:
+            return raw
+        if len(raw) <= header_length:
+            return None
+        fields = chainparams.get_block_fields()
+        if not fields or fields[0][1] != 'vectortx':
+            return raw
+        # Check that there is room for the transactions that the transaction count specifies.
+        count = read_compact_size(raw, header_length)
+        if count is None:
+            return None
+        # A transaction is at least 10 bytes.
+        n, size = count
+        if n < 1 or header_length + size + n * 10 > len(raw):
+            return None
+        return raw
+
     def __init__(self, *args):
         super(BlockItem, self).__init__(*args)
         def copy_hash():
@@ -157,6 +287,16 @@ class BlockHeaderItem(Item):
                 if value:
                     return cls(value)
 
+    @classmethod
+    def sniff(cls, data):
+        raw = binary_form(data)
+        if raw is None:
+            return data
+        header_length = fixed_length(chainparams.get_block_header_fields())
+        if header_length is not None and len(raw) != header_length:
+            return None
+        return raw
+
     def __init__(self, *args):
         super(BlockHeaderItem, self).__init__(*args)
         def copy_hash():
@@ -8,8 +8,9 @@ from PyQt4.QtCore import *
 
 from base import BaseDock, Plugin, Category, augmenter
 from item_types import Item, ItemAction
-from hashmal_lib.core import Script
-from hashmal_lib.core.utils import is_hex, push_script, format_hex_string
+from hashmal_lib.core import Script, opcodes
+from hashmal_lib.core.script import standard_layouts
+from hashmal_lib.core.utils import is_hex, push_script
 from hashmal_lib.gui_utils import monospace_font, floated_buttons
 
 def make_plugin():
@@ -53,44 +54,123 @@ def template_to_script(template, variables):
         text = text.replace(old, v)
     return text
 
-def is_valid_variable_value(value, variable_type):
-    """Returns whether value is valid."""
+class TemplateNode(object):
+    """Node of a TemplateMatcher's trie."""
+    def __init__(self):
+        # {(opcode, data): TemplateNode} for literal operations.
+        self.literals = {}
+        # {(var_name, var_type): TemplateNode} for variables.
+        self.variables = {}
+        # Indices of templates that end at this node.
+        self.templates = []
+
+def is_valid_push(data, variable_type):
+    """Returns whether pushed data is a valid value for a variable."""
     if variable_type == 'address':
-        v = format_hex_string(value, with_prefix=False)
-        if len(v) == 40:
-            return True
-    return False
+        return len(data) == 20
+    return True
 
-def is_template_script(script, template):
-    """Returns whether script complies with template."""
-    iterator = script.human_iter()
-    text = template.text.split()
-    index = 0
-    used_variables = []
-    while 1:
+def format_variable_value(data, variable_type):
+    """Format pushed data as the value of a template variable."""
+    if variable_type == 'text':
+        return data
+    return ''.join(['0x', data.encode('hex')])
+
+class TemplateMatcher(object):
+    """Matches scripts against a list of templates in one pass.
+
+    Templates are compiled into a trie of operations, so that matching
+    a script walks its operations once regardless of the number of templates.
+    Variables match data pushes that are valid for their types.
+    """
+    def __init__(self, templates):
+        self.templates = list(templates)
+        self.root = TemplateNode()
+        for index, template in enumerate(self.templates):
+            steps = self.compile(template)
+            if steps is None:
+                continue
+            node = self.root
+            for is_variable, key in steps:
+                children = node.variables if is_variable else node.literals
+                node = children.setdefault(key, TemplateNode())
+            node.templates.append(index)
+
+    def compile(self, template):
+        """Get the trie steps of template as (is_variable, key) 2-tuples.
+
+        Returns None if a word of the template is not an operation,
+        since no script can match the template.
+        """
+        steps = []
+        for word in template.text.split():
+            if word.startswith('<') and word.endswith('>'):
+                name = word[1:-1]
+                steps.append((True, (name, template.variables[name])))
+                continue
+            try:
+                ops = list(Script.from_human(word).raw_iter())
+            except Exception:
+                ops = []
+            if not ops:
+                return None
+            opcode, data, _ = ops[0]
+            steps.append((False, (opcode, data)))
+        return steps
+
+    def match(self, script):
+        """Find the first template that script complies with.
+
+        Returns:
+            A 2-tuple of (template, {variable name: value}), or None.
+        """
+        # (node, captured variables) for each partial match.
+        states = [(self.root, ())]
         try:
-            s = next(iterator)
-            txt = text[index]
-            # Check variable value.
-            if txt.startswith('<') and txt.endswith('>'):
-                var_type = template.variables[txt[1:-1]]
-                if not is_valid_variable_value(s, var_type):
-                    return False
-                else:
-                    used_variables.append(txt[1:-1])
-            elif s != txt:
-                return False
-            index += 1
-        except StopIteration:
-            break
+            for opcode, data, _ in script.raw_iter():
+                next_states = []
+                for node, captured in states:
+                    child = node.literals.get((opcode, data))
+                    if child:
+                        next_states.append((child, captured))
+                    if data is None:
+                        continue
+                    for (name, var_type), child in node.variables.items():
+                        if is_valid_push(data, var_type):
+                            next_states.append((child, captured + ((name, format_variable_value(data, var_type)),)))
+                if not next_states:
+                    return None
+                states = next_states
         except Exception:
-            return False
-            break
+            return None
+
+        best = None
+        for node, captured in states:
+            for index in node.templates:
+                if best is None or index < best[0]:
+                    best = (index, captured)
+        if best is None:
+            return None
+        return self.templates[best[0]], dict(best[1])
+
+_template_matcher = None
+
+def get_template_matcher():
+    """Get a TemplateMatcher for known_templates.
+
+    The matcher is rebuilt if known_templates or opcode names have changed.
+    """
+    global _template_matcher
+    m = _template_matcher
+    if (m is None or m.revision != opcodes.revision or len(m.templates) != len(known_templates)
+            or any(a is not b for a, b in zip(m.templates, known_templates))):
+        m = _template_matcher = TemplateMatcher(known_templates)
+        m.revision = opcodes.revision
+    return m
 
-    # Fail if there are not values for all expected variables.
-    if not all(i in used_variables for i in template.variables.keys()):
-        return False
-    return True
+def is_template_script(script, template):
+    """Returns whether script complies with template."""
+    return TemplateMatcher([template]).match(script) is not None
 
 class ScriptTemplateItem(Item):
     name = 'Script Matching Template'
@@ -101,27 +181,18 @@ class ScriptTemplateItem(Item):
                 data = Script.from_human(data)
             except Exception:
                 return None
-        for i in known_templates:
-            if is_template_script(data, i):
-                return cls(data, i)
+        match = get_template_matcher().match(data)
+        if match:
+            template, variables = match
+            return cls(data, template, variables)
 
-    def __init__(self, value, template=''):
+    def __init__(self, value, template='', variables=None):
         super(ScriptTemplateItem, self).__init__(value)
         self.template = template
         # Populate variables dict.
-        variables = {}
-        iterator = self.value.human_iter()
-        text = self.template.text.split()
-        index = 0
-        while 1:
-            try:
-                s = next(iterator)
-                txt = text[index]
-                if txt.startswith('<') and txt.endswith('>'):
-                    variables[txt[1:-1]] = s
-                index += 1
-            except Exception:
-                break
+        if variables is None:
+            match = TemplateMatcher([template]).match(value) if template else None
+            variables = match[1] if match else {}
         self.variables = variables
 
         def copy_recipient():
@@ -186,11 +257,11 @@ class TemplateWidget(QWidget):
 known_templates = [
     # P2PKH
     ScriptTemplate('Pay-To-Public-Key-Hash Output',
-        'OP_DUP OP_HASH160 <recipient> OP_EQUALVERIFY OP_CHECKSIG',
+        standard_layouts['pubkeyhash'][0],
         {'recipient': 'address'}),
     # P2SH
     ScriptTemplate('Pay-To-Script-Hash Output',
-        'OP_HASH160 <recipient> OP_EQUAL',
+        standard_layouts['scripthash'][0],
         {'recipient': 'address'}),
     # OP_RETURN
     ScriptTemplate('Null Output',
@@ -1,10 +1,12 @@
 import bitcoin
+from bitcoin.core import b2x, b2lx
 
 from PyQt4.QtGui import *
 from PyQt4.QtCore import *
 
 from hashmal_lib.core import Transaction, Script
 from hashmal_lib.core.stack import Stack, ScriptExecution, ExecutionData
+from hashmal_lib.core.symbolic import spending_conditions
 from hashmal_lib.gui_utils import monospace_font, floated_buttons, AmountEdit
 from hashmal_lib.widgets import ScriptExecutionWidget
 from base import BaseDock, Plugin, Category, augmenter
@@ -73,6 +75,7 @@ class StackEval(BaseDock):
         tabs.addTab(self.create_main_tab(), 'Stack')
         tabs.addTab(self.create_tx_tab(), 'Transaction')
         tabs.addTab(self.create_block_tab(), 'Block')
+        tabs.addTab(self.create_conditions_tab(), 'Conditions')
         self.setFocusProxy(tabs)
         vbox.addWidget(tabs)
 
@@ -138,6 +141,12 @@ class StackEval(BaseDock):
         in_idx_box.addWidget(self.input_idx)
         in_idx_box.addStretch(1)
 
+        self.load_prevout_button = QPushButton('Load Previous Output')
+        self.load_prevout_button.setEnabled(False)
+        self.load_prevout_button.setToolTip('Set the script to the output spent by the spending input.')
+        self.load_prevout_button.setWhatsThis('This button will set the script being evaluated to the scriptPubKey of the output that the spending input spends.\n\nThe output is looked up in the local output index first. If it is not there, the previous transaction is downloaded.')
+        self.load_prevout_button.clicked.connect(self.load_prevout_script)
+
 
         desc = QLabel(' '.join(['You can specify the transaction that contains the script you\'re testing.',
                         'This allows you to evaluate whether an input spends successfully.']))
@@ -145,6 +154,7 @@ class StackEval(BaseDock):
         form.addRow(desc)
         form.addRow('Raw Transaction:', self.tx_edit)
         form.addRow('Spending Input:', self.input_idx)
+        form.addRow(floated_buttons([self.load_prevout_button]))
 
         w = QWidget()
         w.setLayout(form)
@@ -175,6 +185,46 @@ class StackEval(BaseDock):
         w.setLayout(form)
         return w
 
+    def create_conditions_tab(self):
+        vbox = QVBoxLayout()
+
+        desc = QLabel(' '.join(['You can derive the conditions for spending the script in the Stack tab.',
+                        'Each way of spending the script is listed with the number of stack items it requires.']))
+        desc.setWordWrap(True)
+
+        self.conditions_view = QPlainTextEdit()
+        self.conditions_view.setReadOnly(True)
+        self.conditions_view.setFont(monospace_font)
+        self.conditions_view.setWhatsThis('The script is executed with unknown stack items, and the conditions that those items must meet are listed here. Paths through the script that cannot pass are omitted.')
+
+        self.conditions_button = QPushButton('Derive Conditions')
+        self.conditions_button.setToolTip('Derive the conditions for spending the script.')
+        self.conditions_button.clicked.connect(self.derive_conditions)
+
+        vbox.addWidget(desc)
+        vbox.addWidget(self.conditions_view, stretch=1)
+        vbox.addLayout(floated_buttons([self.conditions_button]))
+
+        w = QWidget()
+        w.setLayout(vbox)
+        return w
+
+    def derive_conditions(self):
+        try:
+            scr = Script(str(self.tx_script.toPlainText()).decode('hex'))
+            paths = spending_conditions(scr)
+        except Exception as e:
+            self.conditions_view.setPlainText('Error: %s' % str(e))
+            return
+        if not paths:
+            self.conditions_view.setPlainText('The script cannot be spent.')
+            return
+        lines = []
+        for i, path in enumerate(paths):
+            lines.append('Path %d (%d stack items):' % (i + 1, path.inputs))
+            lines.extend('    %s' % c for c in path.constraints)
+        self.conditions_view.setPlainText('\n'.join(lines))
+
     def set_spending_item(self, item):
         """Called from other tools to set the spending transaction."""
         self.needsFocus.emit()
@@ -195,14 +245,32 @@ class StackEval(BaseDock):
             self.tx_edit.setToolTip(''.join(['Tx ID: ', bitcoin.core.b2lx(self.tx.GetHash())]))
             self.input_idx.setRange(0, len(self.tx.vin) - 1)
             self.input_idx.setEnabled(True)
+            self.load_prevout_button.setEnabled(not self.tx.is_coinbase())
         except Exception:
             self.tx = None
             self.tx_edit.setToolTip('')
             self.input_idx.setEnabled(False)
+            self.load_prevout_button.setEnabled(False)
 
     def set_input_index(self, idx):
         self.inIdx = idx
 
+    def load_prevout_script(self):
+        """Set the script to the scriptPubKey of the output that the spending input spends."""
+        if not self.tx:
+            return
+        tx_in = self.tx.vin[self.inIdx]
+        self.load_prevout_button.setEnabled(False)
+        self.handler.get_prevout_async(b2lx(tx_in.prevout.hash), tx_in.prevout.n, self.on_prevout)
+
+    def on_prevout(self, prevout, error):
+        self.load_prevout_button.setEnabled(bool(self.tx) and not self.tx.is_coinbase())
+        if error:
+            self.status_message(error, True)
+            return
+        script_pubkey, _ = prevout
+        self.tx_script.setPlainText(b2x(script_pubkey))
+
     def do_evaluate(self):
         scr = Script(str(self.tx_script.toPlainText()).decode('hex'))
         exec_data = None
@@ -1,3 +1,5 @@
+from functools import partial
+
 import bitcoin
 from bitcoin.core import b2lx
 
@@ -10,6 +12,7 @@ from hashmal_lib.gui_utils import monospace_font, floated_buttons, Separator
 from hashmal_lib.widgets.tx import TxWidget
 from hashmal_lib.core.script import Script
 from hashmal_lib.core import Transaction
+from hashmal_lib.core.verify import verify_input
 
 def make_plugin():
     return Plugin(TxAnalyzer)
@@ -243,50 +246,58 @@ class TxAnalyzer(BaseDock):
         self.inputs_table.set_tx(self.tx)
         self.status_message('Deserialized transaction {}'.format(bitcoin.core.b2lx(self.tx.GetHash())))
 
-    def do_verify_input(self, tx, in_idx):
-        raw_prev_tx = None
+    def do_verify_input(self, tx, in_idx, callback=None):
+        """Verify an input once the output it spends is retrieved.
+
+        The output is downloaded in a separate thread if necessary.
+        callback is called with (in_idx, is_valid) when done.
+        """
         tx_in = tx.vin[in_idx]
         txid = b2lx(tx_in.prevout.hash)
-        prev_out_n = tx_in.prevout.n
-
-        try:
-            raw_prev_tx = self.handler.download_blockchain_data('raw_transaction', txid)
-        except Exception as e:
-            self.status_message(str(e), True)
-            return False
+        self.handler.get_prevout_async(txid, tx_in.prevout.n, partial(self.on_prevout, tx, in_idx, callback))
 
-        try:
-            prev_tx = Transaction.deserialize(raw_prev_tx.decode('hex'))
-            result = bitcoin.core.scripteval.VerifyScript(tx_in.scriptSig, prev_tx.vout[prev_out_n].scriptPubKey, tx, in_idx)
-            self.result_edit.setText('Successfully verified input {}'.format(in_idx))
-            self.inputs_table.set_verified(in_idx, True)
-        except Exception as e:
-            self.result_edit.setText(str(e))
-            self.inputs_table.set_verified(in_idx, False)
-            self.status_message(str(e), True)
-            return False
-
-        return True
+    def on_prevout(self, tx, in_idx, callback, prevout, error):
+        is_valid = False
+        if error:
+            self.status_message(error, True)
+        else:
+            prev_script_pubkey, _ = prevout
+            try:
+                verify_input(tx, in_idx, prev_script_pubkey)
+                self.result_edit.setText('Successfully verified input {}'.format(in_idx))
+                is_valid = True
+            except Exception as e:
+                self.result_edit.setText(str(e))
+                self.status_message(str(e), True)
+            # The transaction being analyzed may have changed during the download.
+            if self.tx and self.tx.GetHash() == tx.GetHash():
+                self.inputs_table.set_verified(in_idx, is_valid)
+
+        if callback:
+            callback(in_idx, is_valid)
 
     def do_verify_inputs(self, txt):
         self.needsFocus.emit()
         self.raw_tx_edit.setPlainText(txt)
         tx = Transaction.deserialize(txt.decode('hex'))
-        failed_inputs = []
+        if len(tx.vin) == 0:
+            self.result_edit.setText('Transaction has no inputs.')
+            return
         self.result_edit.setText('Verifying...')
+
+        results = {}
+        def on_verified(in_idx, is_valid):
+            results[in_idx] = is_valid
+            if len(results) < len(tx.vin):
+                return
+            failed_inputs = [i for i in sorted(results) if not results[i]]
+            result = 'Successfully verified all inputs.'
+            if failed_inputs:
+                result = 'Failed to verify inputs: {}'.format(failed_inputs)
+            self.result_edit.setText(result)
+
         for i in range(len(tx.vin)):
-            if not self.do_verify_input(tx, i):
-                failed_inputs.append(i)
-
-        result = 'Successfully verified all inputs.'
-        ret_val = True
-        if failed_inputs:
-            result = 'Failed to verify inputs: {}'.format(failed_inputs)
-            ret_val = False
-        if len(tx.vin) == 0:
-            result = 'Transaction has no inputs.'
-        self.result_edit.setText(result)
-        return ret_val
+            self.do_verify_input(tx, i, on_verified)
 
     def verify_input(self):
         tx = None
@@ -1,5 +1,6 @@
-from collections import OrderedDict, namedtuple
+from collections import OrderedDict, namedtuple, defaultdict
 from functools import partial
+import hashlib
 
 from bitcoin.core import x, lx, b2x, b2lx
 from bitcoin.base58 import CBase58Data
@@ -9,7 +10,8 @@ from PyQt4 import QtCore
 
 from base import BaseDock, Plugin, augmenter
 from item_types import ItemAction, item_types
-from hashmal_lib.core import Transaction, Block, BlockHeader
+from hashmal_lib.core import chainparams, Transaction, Block, BlockHeader, my_config
+from hashmal_lib.core.varstore import VariableStore
 from hashmal_lib.gui_utils import floated_buttons, HBox
 from hashmal_lib.core.utils import is_hex
 
@@ -47,15 +49,104 @@ def classify_data(value):
 
     return var_types
 
+def item_variable_type(item):
+    """Get the variable type of values that can be coerced into an item type.
+
+    Values that the item type's sniff() rules out are not deserialized.
+    """
+    def classify(value):
+        value = item.sniff(value)
+        return value is not None and item.coerce_item(value) is not None
+    return VariableType(item.name, classify)
+
+def classification_context():
+    """Get a digest of what classify_data() depends on: the variable types and chainparams fields."""
+    return hashlib.sha256(repr((variable_types.keys(), chainparams.get_tx_fields(),
+                                chainparams.get_block_header_fields(), chainparams.get_block_fields()))).digest()
+
+def trigrams(text):
+    """Get the set of 3-character substrings of text."""
+    return set(text[i:i+3] for i in range(len(text) - 2))
+
+class KeyIndex(object):
+    """Substring index of variable keys.
+
+    Keys are indexed by their trigrams, so that the keys containing
+    a substring of at least 3 characters are found without scanning
+    every key. The matches for the most recent query are kept up to
+    date as keys are added and removed.
+    """
+    def __init__(self, keys=()):
+        self.keys = set()
+        # {trigram: set of keys}
+        self.trigram_keys = defaultdict(set)
+        self.last_query = None
+        self.last_matches = None
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key):
+        self.keys.add(key)
+        for gram in trigrams(key):
+            self.trigram_keys[gram].add(key)
+        if self.last_query is not None and self.last_query in key:
+            self.last_matches.add(key)
+
+    def remove(self, key):
+        self.keys.discard(key)
+        for gram in trigrams(key):
+            keys = self.trigram_keys.get(gram)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self.trigram_keys[gram]
+        if self.last_matches is not None:
+            self.last_matches.discard(key)
+
+    def search(self, query):
+        """Get the set of keys that contain query."""
+        if query == self.last_query:
+            return self.last_matches
+
+        candidates = None
+        if len(query) >= 3:
+            sets = sorted([self.trigram_keys.get(gram, set()) for gram in trigrams(query)], key=len)
+            candidates = sets[0].intersection(*sets[1:])
+        # Keys that match a longer query are a subset of the last matches.
+        if self.last_query is not None and self.last_query in query:
+            if candidates is None or len(self.last_matches) < len(candidates):
+                candidates = self.last_matches
+        if candidates is None:
+            candidates = self.keys
+
+        matches = set(key for key in candidates if query in key)
+        self.last_query = query
+        self.last_matches = matches
+        return matches
+
 class VarsModel(QtCore.QAbstractTableModel):
-    """Model for stored variables."""
+    """Model for stored variables.
+
+    Args:
+        data (VariableStore): Stored variables.
+    """
     def __init__(self, data, parent=None):
         super(VarsModel, self).__init__(parent)
         self.vars_data = data
-        self.reverse_lookup = {}
-        for k, v in self.vars_data.items():
-            self.reverse_lookup[v] = k
+        # {key: categories of the key's value}
         self.classification_cache = {}
+        # Keys in row order, and the row of each key.
+        self.keys = list(self.vars_data.keys())
+        self.key_rows = dict((k, i) for i, k in enumerate(self.keys))
+        self.key_index = KeyIndex(self.keys)
+        # {category: set of keys}. Built when it is first needed.
+        self.category_keys = None
+        # classification_context() of the cached categories.
+        self.context = None
 
     def columnCount(self, parent = QtCore.QModelIndex()):
         return 2
@@ -101,7 +192,7 @@ class VarsModel(QtCore.QAbstractTableModel):
         data = None
         r = index.row()
         c = index.column()
-        key = self.vars_data.keys()[r]
+        key = self.keys[r]
 
         if c == 0:
             data = key
@@ -109,35 +200,102 @@ class VarsModel(QtCore.QAbstractTableModel):
             if role == QtCore.Qt.DisplayRole:
                 data = self.vars_data[key]
             elif role == QtCore.Qt.UserRole:
-                value = self.vars_data[key]
-                cached = self.classification_cache.get(value, None)
-                if cached is None:
-                    data = classify_data(value)
-                    self.classification_cache[value] = data
-                else:
-                    data = cached
+                data = self.classify(key)
 
         return QtCore.QVariant(data)
 
+    def classify(self, key):
+        """Get the categories of the value of key.
+
+        Categories are stored with values, so values are only read
+        if they changed or if what they are classified with changed.
+        """
+        cached = self.classification_cache.get(key, None)
+        if cached is None:
+            if self.context is None:
+                self.context = classification_context()
+            cached = self.vars_data.get_categories(key, self.context)
+            if cached is None:
+                cached = classify_data(self.vars_data[key])
+                self.vars_data.set_categories(key, self.context, cached)
+            self.classification_cache[key] = cached
+        return cached
+
+    def get_category_keys(self):
+        """Get the index of {category: set of keys}."""
+        if self.category_keys is None:
+            self.category_keys = defaultdict(set)
+            for k in self.keys:
+                self._index_categories(k)
+        return self.category_keys
+
+    def _index_categories(self, key, remove=False):
+        if self.category_keys is None:
+            return
+        for category in self.classify(key):
+            if remove:
+                self.category_keys[category].discard(key)
+            else:
+                self.category_keys[category].add(key)
+
+    def keys_in_category(self, category):
+        return self.get_category_keys().get(category, set())
+
+    def used_categories(self):
+        """Get the categories that at least one value has."""
+        return [k for k, v in self.get_category_keys().items() if v]
+
+    def keys_matching(self, text):
+        """Get the set of keys that contain text."""
+        return self.key_index.search(text)
+
+    def row_for_key(self, key):
+        return self.key_rows.get(key)
+
+    def key_at(self, row):
+        return self.keys[row]
+
     def set_key(self, key, value):
+        row = self.key_rows.get(key)
+        # Replace an existing value.
+        if row is not None:
+            self._index_categories(key, remove=True)
+            self.classification_cache.pop(key, None)
+            self.vars_data[key] = value
+            self._index_categories(key)
+            self.dataChanged.emit(self.createIndex(row, 0), self.createIndex(row, 1))
+            return
+
         self.beginInsertRows( QtCore.QModelIndex(), self.rowCount(), self.rowCount() )
         self.vars_data[key] = value
-        self.reverse_lookup[value] = key
+        self.key_rows[key] = len(self.keys)
+        self.keys.append(key)
+        self.key_index.add(key)
+        self._index_categories(key)
         self.endInsertRows()
 
     def remove_key(self, key):
-        row = self.vars_data.keys().index(key)
+        row = self.key_rows.get(key)
+        if row is None:
+            raise ValueError('No variable named "{}"'.format(key))
         self.beginRemoveRows( QtCore.QModelIndex(), row, row )
-        value = self.vars_data[key]
-        del self.reverse_lookup[value]
+        self._index_categories(key, remove=True)
+        self.classification_cache.pop(key, None)
         del self.vars_data[key]
+        del self.keys[row]
+        del self.key_rows[key]
+        self.key_index.remove(key)
+        for i in range(row, len(self.keys)):
+            self.key_rows[self.keys[i]] = i
         self.endRemoveRows()
 
     def key_for_value(self, value):
-        return self.reverse_lookup.get(value)
+        return self.vars_data.key_for_value(value)
 
     def invalidate_cache(self):
         self.classification_cache.clear()
+        self.category_keys = None
+        self.context = None
 
 class VarsProxyModel(QSortFilterProxyModel):
     def __init__(self, parent=None):
@@ -164,14 +322,13 @@ class VarsProxyModel(QSortFilterProxyModel):
         return self.sourceModel().data(data_idx, role)
 
     def filterAcceptsRow(self, source_row, source_parent):
+        model = self.sourceModel()
+        key = model.key_at(source_row)
         if self.category_filter and self.category_filter != 'None':
-            categories = self.sourceModel().dataAt(source_row, 1, QtCore.Qt.UserRole).toList()
-            if self.category_filter not in categories:
+            if key not in model.keys_in_category(self.category_filter):
                 return False
         if self.key_filter:
-            idx = self.sourceModel().index(source_row, 0, source_parent)
-            key = str(self.sourceModel().data(idx).toString())
-            if self.key_filter not in key:
+            if key not in model.keys_matching(self.key_filter):
                 return False
         return True
 
@@ -195,8 +352,7 @@ class Variables(BaseDock):
         # Since we know that the Item Types has been instantiated now, add variable types for known item_types
         # and connect to itemTypesChanged.
         for i in sorted(item_types, key = lambda item_type: item_type.name):
-            var_type = VariableType(i.name, lambda x, item=i: item.coerce_item(x) is not None)
-            variable_types.update({var_type.name: var_type})
+            variable_types.update({i.name: item_variable_type(i)})
         self.on_var_types_changed()
         self.handler.get_plugin('Item Types').ui.itemTypesChanged.connect(self.on_item_types_changed)
         return (
@@ -206,7 +362,17 @@ class Variables(BaseDock):
         )
 
     def init_data(self):
-        self.data = OrderedDict(self.option('data', {}))
+        self.data = VariableStore(my_config.data_file_path('variables.db'))
+        # Move variables from the config file, where they used to be stored.
+        old_data = self.option('data')
+        if old_data:
+            for k, v in old_data.items():
+                if k not in self.data:
+                    self.data[k] = v
+            self.data.commit()
+            options = dict(self.options())
+            del options['data']
+            self.save_options(options)
         self.auto_save = self.option('auto_save', False)
         self.filters = variable_types.keys()
 
@@ -259,8 +425,8 @@ class Variables(BaseDock):
         self.auto_save_check.stateChanged.connect(change_auto_save)
         self.save_button = QPushButton('Save')
         self.save_button.clicked.connect(self.save_variables)
-        self.save_button.setToolTip('Save variables to config file')
-        self.save_button.setWhatsThis('This button will save your stored variables in the Hashmal config file.')
+        self.save_button.setToolTip('Save variables')
+        self.save_button.setWhatsThis('This button will save your stored variables. Unsaved changes are discarded when Hashmal exits.')
 
         form.addRow('Add:', add_var_hbox)
         form.addRow(floated_buttons([self.auto_save_check, self.save_button]))
@@ -331,11 +497,15 @@ class Variables(BaseDock):
         self.needsFocus.emit()
 
     def get_key(self, key):
-        """Get a value for a key.
+        """Get a value for a key."""
+        return self.data.get(key)
+
+    def has_key(self, key):
+        """Get whether a key exists without reading its value.
 
         Used by scriptedit for highlighting variable keys.
         """
-        return self.data.get(key)
+        return key in self.data
 
     def set_key(self, key, value):
         """Store a new variable."""
@@ -369,9 +539,9 @@ class Variables(BaseDock):
                 return key
 
     def save_variables(self):
-        self.set_option('data', self.data)
+        self.data.commit()
         if not self.auto_save:
-            self.status_message('Saved variables to config file.')
+            self.status_message('Saved variables.')
 
     def context_menu(self, position):
         menu = QMenu()
@@ -414,10 +584,7 @@ class Variables(BaseDock):
 
     def hide_unused_category_names(self):
         filters = list(self.filters)
-        used_categories = set()
-        for i in range(self.model.rowCount()):
-            categories = [str(x.toString()) for x in self.model.dataAt(i, 1, QtCore.Qt.UserRole).toList()]
-            used_categories.update(categories)
+        used_categories = set(self.model.used_categories())
         filters = filter(lambda x: x in used_categories, filters)
         filters.insert(0, 'None')
         self.filter_category.clear()
@@ -434,8 +601,7 @@ class Variables(BaseDock):
             if i.name in variable_types.keys():
                 continue
             changed = True
-            var_type = VariableType(i.name, lambda x, item=i: item.coerce_item(x) is not None)
-            variable_types.update({var_type.name: var_type})
+            variable_types.update({i.name: item_variable_type(i)})
         if changed:
             self.on_var_types_changed()
 
@@ -7,15 +7,21 @@ from PyQt4.QtGui import *
 from PyQt4.QtCore import *
 
 import hashmal_lib
+from hashmal_lib.core import BlockHeader
 from hashmal_lib.plugins import BaseDock, Plugin, Category
 from hashmal_lib.gui_utils import floated_buttons
 from hashmal_lib.downloader import Downloader
 
 known_methods = [
     'getblock',
+    'getblockhash',
+    'getblockheader',
     'getrawtransaction'
 ]
 
+# JSON-RPC error code for an unknown method.
+RPC_METHOD_NOT_FOUND = -32601
+
 def make_plugin():
     return Plugin(WalletRPC)
 
@@ -44,6 +50,43 @@ class RPCProfile(object):
                     self.port)
 
 
+def is_method_not_found(error):
+    """Return whether error is a JSON-encoded "Method not found" RPC error."""
+    try:
+        return json.loads(error).get('code') == RPC_METHOD_NOT_FOUND
+    except Exception:
+        return False
+
+def parse_batch_response(respdata, count):
+    """Parse the response to a batch of count requests whose ids are 0 to count - 1.
+
+    Returns:
+        A 2-tuple of (list of results in the order of the requests, error).
+        If a request failed or has no result, the list is empty.
+    """
+    try:
+        responses = json.loads(respdata)
+    except ValueError as e:
+        return [], 'Invalid response: %s' % str(e)
+    if not isinstance(responses, list):
+        responses = [responses]
+    results = [None] * count
+    for r in responses:
+        error = r.get('error')
+        if error:
+            if type(error) not in (str, unicode):
+                error = json.dumps(error, indent=2)
+            return [], error
+        i = r.get('id')
+        if not isinstance(i, int) or not 0 <= i < count:
+            return [], 'Unexpected response id: %s' % i
+        results[i] = r.get('result')
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        return [], 'No results for requests: %s' % missing
+    return results, ''
+
+
 class RPCDownloader(Downloader):
     finished = pyqtSignal(str, str, str, name='finished')
     def __init__(self, profile, method_name, params):
@@ -83,7 +126,7 @@ class RPCDownloader(Downloader):
 
         for i in [result, error]:
             if i is None: i = ''
-        self.finished.emit(self.method_name, result, error)
+        self.emit_finished(self.method_name, result, error)
 
 
 class WalletRPC(BaseDock):
@@ -172,16 +215,25 @@ class WalletRPC(BaseDock):
 
     def supported_blockchain_data_types(self):
         """Get the types of data this plugin can retrieve."""
-        return ['raw_transaction', 'raw_block', 'raw_header', 'block_hash']
+        return ['raw_transaction', 'raw_block', 'raw_header', 'raw_headers', 'block_hash']
 
     def retrieve_blockchain_data(self, data_type, identifier):
-        """Signifies that this plugin is a data retriever."""
+        """Signifies that this plugin is a data retriever.
+
+        For 'raw_headers', identifier is a 2-tuple of
+        (start_height, count).
+        """
+        if data_type == 'raw_header':
+            return self.retrieve_block_header(identifier)
+        elif data_type == 'raw_headers':
+            return self.retrieve_block_headers(*identifier)
+
         params = [identifier]
         method_name = ''
         if data_type == 'raw_transaction':
             method_name = 'getrawtransaction'
             params.append(0)
-        elif data_type in ('raw_block', 'raw_header'):
+        elif data_type == 'raw_block':
             method_name = 'getblock'
             params.append(False)
         elif data_type == 'block_hash':
@@ -195,13 +247,57 @@ class WalletRPC(BaseDock):
             result, err = self.do_rpc(method_name, params, async=False)
             if err:
                 return err
-            # Truncate block to header
-            if data_type == 'raw_header':
-                result = result[:160]
         except Exception as e:
             result = str(e)
         return result
 
+    def retrieve_block_header(self, blockhash):
+        """Retrieve a raw block header.
+
+        Uses getblockheader so that only the header is transferred. Falls back
+        to getblock for nodes that do not have getblockheader.
+        """
+        header_hex_length = BlockHeader.header_length() * 2
+        try:
+            result, err = self.do_rpc('getblockheader', [blockhash, False], async=False)
+            if err and is_method_not_found(err):
+                result, err = self.do_rpc('getblock', [blockhash, False], async=False)
+            if err:
+                return err
+        except Exception as e:
+            return str(e)
+        return result[:header_hex_length]
+
+    def retrieve_block_headers(self, start_height, count):
+        """Retrieve count consecutive raw block headers beginning at start_height.
+
+        Headers are fetched with two batched calls (getblockhash, then getblockheader),
+        so the amount of data transferred is proportional to the number of headers.
+        Falls back to getblock for nodes that do not have getblockheader.
+
+        Returns:
+            The concatenated hex-encoded headers, or an error message.
+        """
+        header_hex_length = BlockHeader.header_length() * 2
+        heights = range(int(start_height), int(start_height) + int(count))
+        try:
+            hashes, err = self.do_rpc_batch([('getblockhash', [i]) for i in heights])
+            if err:
+                return err
+            headers, err = self.do_rpc_batch([('getblockheader', [i, False]) for i in hashes])
+            if err and is_method_not_found(err):
+                blocks, err = self.do_rpc_batch([('getblock', [i, False]) for i in hashes])
+                headers = [i[:header_hex_length] for i in blocks]
+            if err:
+                return err
+
+            for header in headers:
+                if len(header) != header_hex_length:
+                    return 'Expected headers of %d bytes, got %d bytes.' % (header_hex_length / 2, len(header) / 2)
+        except Exception as e:
+            return str(e)
+        return ''.join(headers)
+
     def call_rpc(self):
         """Call do_rpc() with text from widgets."""
         method_name = str(self.method_edit.text())
@@ -253,6 +349,26 @@ class WalletRPC(BaseDock):
                         error = error.strip('"')
             return result, error
 
+    def do_rpc_batch(self, calls):
+        """Call the full client with a batch of requests in one round-trip.
+
+        Args:
+            calls (list): List of (method_name, params) 2-tuples.
+
+        Returns:
+            A 2-tuple of (list of results in the order of calls, error).
+            If a call failed or has no result, the list is empty.
+        """
+        postdata = json.dumps([{'method': method_name, 'params': params, 'id': i}
+                                for i, (method_name, params) in enumerate(calls)])
+        try:
+            connection = urllib.urlopen(self.profile.as_url(), postdata)
+            respdata = connection.read()
+            connection.close()
+        except Exception as e:
+            return [], str(e)
+        return parse_batch_response(respdata, len(calls))
+
     def set_result(self, method_name, result, error):
         self.result_edit.setPlainText(error if error else result)
         self.result_edit.setProperty('hasError', True if error else False)
@@ -0,0 +1,147 @@
+"""Startup tracing.
+
+Records how long each phase of startup takes and how long each module
+takes to import, and writes them to a file. Tracing is enabled with
+the hashmal script's --trace option or the HASHMAL_TRACE environment
+variable. When tracing is not enabled, the functions in this module
+do nothing.
+"""
+import __builtin__
+import sys
+import time
+from contextlib import contextmanager
+
+def imported_module_name(name, module, fromlist):
+    """Get the full name of the module that an import statement imported."""
+    if fromlist or not hasattr(module, '__name__'):
+        return getattr(module, '__name__', name)
+    # __import__() returns the top-level module of a dotted name.
+    head = name.partition('.')[0]
+    return module.__name__ + name[len(head):]
+
+class StartupTracer(object):
+    """Records phase timings and import times.
+
+    Args:
+        filename (str): File to write the trace to.
+    """
+    def __init__(self, filename):
+        super(StartupTracer, self).__init__()
+        self.filename = filename
+        self.start_time = time.time()
+        # [(name, depth, start offset, duration), ...]
+        self.phases = []
+        # [(module name, depth, duration excluding nested imports, duration), ...] in order of completion.
+        self.imports = []
+        # [(title, text), ...]
+        self.sections = []
+        self._phase_depth = 0
+        # Time spent in nested imports, for each import in progress.
+        self._nested_import_times = []
+        self._original_import = None
+
+    def install(self):
+        """Start recording import times."""
+        if self._original_import is None:
+            self._original_import = __builtin__.__import__
+            __builtin__.__import__ = self._import
+
+    def uninstall(self):
+        """Stop recording import times."""
+        if self._original_import is not None:
+            __builtin__.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=None, level=-1):
+        module_count = len(sys.modules)
+        self._nested_import_times.append(0.0)
+        start = time.time()
+        try:
+            module = self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            duration = time.time() - start
+            nested = self._nested_import_times.pop()
+            if self._nested_import_times:
+                self._nested_import_times[-1] += duration
+        # Only record imports that loaded modules.
+        if len(sys.modules) > module_count:
+            self.imports.append((imported_module_name(name, module, fromlist), len(self._nested_import_times),
+                                 duration - nested, duration))
+        return module
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that records how long a phase of startup takes."""
+        depth = self._phase_depth
+        self._phase_depth += 1
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._phase_depth -= 1
+            self.phases.append((name, depth, start - self.start_time, time.time() - start))
+
+    def add_section(self, title, text):
+        """Add a section of text to the trace."""
+        self.sections.append((title, text))
+
+    def format(self):
+        """Get the trace as text."""
+        lines = ['Startup trace', 'Total: %.1f ms' % ((time.time() - self.start_time) * 1000), '']
+
+        lines.append('%10s %10s  %s' % ('Start (ms)', 'Time (ms)', 'Phase'))
+        for name, depth, offset, duration in sorted(self.phases, key=lambda i: (i[2], i[1])):
+            lines.append('%10.1f %10.1f  %s%s' % (offset * 1000, duration * 1000, '  ' * depth, name))
+        lines.append('')
+
+        lines.append('%10s %10s  %s' % ('Self (ms)', 'Total (ms)', 'Import'))
+        for name, depth, self_duration, duration in self.imports:
+            lines.append('%10.1f %10.1f  %s%s' % (self_duration * 1000, duration * 1000, '  ' * depth, name))
+
+        for title, text in self.sections:
+            lines.extend(['', title, text])
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """Write the trace to its file."""
+        with open(self.filename, 'w') as f:
+            f.write(self.format())
+
+# The StartupTracer that is recording, if any.
+active_tracer = None
+
+def start(filename):
+    """Start tracing startup.
+
+    Returns:
+        The StartupTracer.
+    """
+    global active_tracer
+    if active_tracer is None:
+        active_tracer = StartupTracer(filename)
+        active_tracer.install()
+    return active_tracer
+
+def finish():
+    """Stop tracing and write the trace."""
+    global active_tracer
+    if active_tracer is None:
+        return
+    active_tracer.uninstall()
+    active_tracer.write()
+    active_tracer = None
+
+@contextmanager
+def _no_phase():
+    yield
+
+def phase(name):
+    """Context manager that records how long a phase of startup takes."""
+    if active_tracer is None:
+        return _no_phase()
+    return active_tracer.phase(name)
+
+def add_section(title, text):
+    """Add a section of text to the trace."""
+    if active_tracer is not None:
+        active_tracer.add_section(title, text)
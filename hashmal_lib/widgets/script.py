@@ -5,7 +5,7 @@ from PyQt4.QtGui import *
 from PyQt4.QtCore import *
 from PyQt4 import QtCore
 
-from hashmal_lib.core.script import Script, transform_human
+from hashmal_lib.core.script import Script, transform_human, variable_names, ContextIndex
 from hashmal_lib.gui_utils import monospace_font
 
 def transform_human_script(text, main_window):
@@ -15,24 +15,116 @@ def transform_human_script(text, main_window):
     variables = main_window.plugin_handler.get_plugin('Variables').ui.data
     return transform_human(text, variables)
 
+def parse_human(text, variables=None):
+    """Parse human-readable script text.
+
+    Returns:
+        A 2-tuple of (Script, or None if text could not be parsed, context tips).
+    """
+    txt, context = transform_human(text, variables)
+    try:
+        script = Script.from_human(txt)
+    except Exception:
+        script = None
+    return script, context
+
+class ScriptParseTask(QRunnable):
+    """Parses a ScriptEdit's text in a thread pool thread.
+
+    The task does nothing if the editor's text has changed
+    since it was created.
+    """
+    def __init__(self, editor, generation, text, variables):
+        super(ScriptParseTask, self).__init__()
+        self.editor = editor
+        self.generation = generation
+        self.text = text
+        self.variables = variables
+
+    def is_stale(self):
+        return self.generation != self.editor.parse_generation
+
+    def run(self):
+        if self.is_stale():
+            return
+        script, context = parse_human(self.text, self.variables)
+        if self.is_stale():
+            return
+        try:
+            self.editor.parsed.emit(self.generation, script, context)
+        # The editor was deleted.
+        except RuntimeError:
+            pass
+
 class ScriptEdit(QTextEdit):
     """Script editor.
 
     Keeps an internal Script instance that it updates
     with its text, and uses to convert formats.
+
+    Human-readable text is parsed in a background thread once
+    typing pauses for parse_delay milliseconds.
     """
+    # Emitted from a thread pool thread with (generation, script, context).
+    parsed = pyqtSignal(int, object, object)
+    parse_delay = 150
+
     def __init__(self, parent=None):
         super(ScriptEdit, self).__init__(parent)
         self.current_format = 'Human'
         self.script = Script()
+        # Incremented whenever the text changes, so that
+        # the results of parses of older text are discarded.
+        self.parse_generation = 0
+        # Whether the script does not reflect the current text yet.
+        self.parse_pending = False
+        self.parse_timer = QTimer(self)
+        self.parse_timer.setSingleShot(True)
+        self.parse_timer.setInterval(self.parse_delay)
+        self.parse_timer.timeout.connect(self.start_parse)
+        self.parsed.connect(self.on_parsed)
         self.textChanged.connect(self.on_text_changed)
         self.setFont(monospace_font)
         # For tooltips
         self.context = []
+        self.context_index = ContextIndex()
 
     def on_text_changed(self):
-        txt = str(self.toPlainText())
-        self.set_data(txt, self.current_format)
+        if self.current_format != 'Human':
+            txt = str(self.toPlainText())
+            self.set_data(txt, self.current_format)
+            return
+        self.parse_generation += 1
+        self.parse_pending = True
+        self.parse_timer.start()
+
+    def start_parse(self):
+        text = str(self.toPlainText())
+        task = ScriptParseTask(self, self.parse_generation, text, self.get_variables(text))
+        QThreadPool.globalInstance().start(task)
+
+    def on_parsed(self, generation, script, context):
+        # Discard results for text that has since changed.
+        if generation != self.parse_generation:
+            return
+        self.parse_pending = False
+        self.apply_parse(script, context)
+
+    def apply_parse(self, script, context):
+        """Set a parsed script and its context tips together."""
+        self.set_context(context)
+        self.script = script
+
+    def flush_parse(self):
+        """Parse the current text now if it has not been parsed yet."""
+        if not self.parse_pending:
+            return
+        self.parse_timer.stop()
+        self.set_data(str(self.toPlainText()), self.current_format)
+
+    def get_variables(self, text):
+        """Get the variables to substitute when parsing text."""
+        return {}
 
     def copy_hex(self):
         txt = self.get_data('Hex')
@@ -43,23 +135,34 @@ class ScriptEdit(QTextEdit):
         menu.addAction('Copy Hex', self.copy_hex)
         menu.exec_(e.globalPos())
 
+    def set_context(self, context):
+        """Set the contextual tips for the current text."""
+        self.context = context
+        self.context_index = ContextIndex(context)
+
     def set_format(self, fmt):
+        self.flush_parse()
         self.current_format = fmt
         self.setPlainText(self.get_data())
 
     def set_data(self, text, fmt):
+        # Any parse in progress is now stale.
+        self.parse_generation += 1
+        self.parse_pending = False
+        if fmt == 'Human':
+            self.apply_parse(*parse_human(text, self.get_variables(text)))
+            return
+
         script = None
         if fmt == 'Hex' and len(text) % 2 == 0:
             try:
                 script = Script(text.decode('hex'))
             except Exception:
                 pass
-        elif fmt == 'Human':
-            txt, self.context = transform_human(text)
-            script = Script.from_human(txt)
         self.script = script
 
     def get_data(self, fmt=None):
+        self.flush_parse()
         if fmt is None:
             fmt = self.current_format
         if not self.script: return ''
@@ -83,9 +186,10 @@ class ScriptEdit(QTextEdit):
         """Returns the contextual tip for the word at index."""
         if index < 0 or len(self.toPlainText()) < index:
             return ''
-        for start, end, value, match_type in self.context:
-            if index >= start and index < end:
-                return '{} ({})'.format(value, match_type)
+        tip = self.context_index.tip_at(index)
+        if tip:
+            start, end, value, match_type = tip
+            return '{} ({})'.format(value, match_type)
 
 
 class ScriptHighlighter(QSyntaxHighlighter):
@@ -97,12 +201,15 @@ class ScriptHighlighter(QSyntaxHighlighter):
 
     def highlightBlock(self, text):
         """Use the ScriptEdit's context attribute to highlight."""
-        if len(self.editor.context) == 0:
+        block = self.currentBlock()
+        offset = block.position()
+        tips = self.editor.context_index.in_range(offset, offset + block.length())
+        if not tips:
             return
 
         settings = self.gui.qt_settings
-        offset = self.currentBlock().position()
-        for start, end, value, match_type in self.editor.context:
+        variables = self.gui.plugin_handler.get_plugin('Variables').ui
+        for start, end, value, match_type in tips:
             start = start - offset
             end = end - offset
             idx = start
@@ -111,7 +218,7 @@ class ScriptHighlighter(QSyntaxHighlighter):
             if match_type == 'Variable':
                 length += 1 # account for '$' prefix
                 var_name = str(text[idx+1: idx+length]).strip()
-                if self.gui.plugin_handler.get_plugin('Variables').ui.get_key(var_name):
+                if variables.has_key(var_name):
                     fmt.setForeground( QColor(settings.value('color/variables', 'darkMagenta')) )
             elif match_type == 'String literal':
                 fmt.setForeground( QColor(settings.value('color/strings', 'gray')) )
@@ -127,23 +234,53 @@ class ScriptEditor(ScriptEdit):
         super(ScriptEditor, self).__init__(gui)
         self.gui = gui
         self.highlighter = ScriptHighlighter(self.gui, self)
+        # Range of text changed since the context was last updated.
+        self.changed_range = None
+        self.document().contentsChange.connect(self.on_contents_change)
 
     def contextMenuEvent(self, e):
         menu = self.createStandardContextMenu()
         menu.addAction('Copy Hex', self.copy_hex)
         menu.exec_(e.globalPos())
 
-    def set_data(self, text, fmt):
-        script = None
-        if fmt == 'Hex' and len(text) % 2 == 0:
-            try:
-                script = Script(text.decode('hex'))
-            except Exception:
-                pass
-        elif fmt == 'Human':
-            txt, self.context = transform_human_script(text, self.gui)
-            script = Script.from_human(txt)
-        self.script = script
+    def get_variables(self, text):
+        # Copied, since parsing may happen in another thread.
+        # Only the variables that text names are needed.
+        data = self.gui.plugin_handler.get_plugin('Variables').ui.data
+        return dict((name, data[name]) for name in variable_names(text) if name in data)
+
+    def apply_parse(self, script, context):
+        super(ScriptEditor, self).apply_parse(script, context)
+        self.rehighlight_changed()
+
+    def on_contents_change(self, position, removed, added):
+        # Ignore formatting changes, such as those made by the highlighter.
+        if removed == 0 and added == 0:
+            return
+        start, end = position, position + added
+        if self.changed_range:
+            start = min(start, self.changed_range[0])
+            end = max(end, self.changed_range[1])
+        self.changed_range = (start, end)
+
+    def rehighlight_changed(self):
+        """Highlight the blocks in the changed range with the current context.
+
+        The highlighter runs on these blocks before the context is
+        updated, so they are highlighted again afterward.
+        """
+        if self.changed_range is None:
+            return
+        start, end = self.changed_range
+        self.changed_range = None
+        doc = self.document()
+        block = doc.findBlock(start)
+        last = doc.findBlock(end)
+        while block.isValid():
+            self.highlighter.rehighlightBlock(block)
+            if block == last:
+                break
+            block = block.next()
 
     @pyqtProperty(str)
     def humanText(self):
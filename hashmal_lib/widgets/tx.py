@@ -16,6 +16,17 @@ from hashmal_lib.core.script import Script
 from hashmal_lib.core import Transaction
 from hashmal_lib import config
 
+def cached_script(cache, data):
+    """Get the Script for data from cache, adding it if necessary.
+
+    Scripts memoize their rendered forms, so reusing them
+    lets views repaint without decoding scripts again.
+    """
+    script = cache.get(data)
+    if script is None:
+        script = cache[data] = Script(data)
+    return script
+
 class InputsModel(QAbstractTableModel):
     """Model of a transaction's inputs."""
     def __init__(self, tx=None, parent=None):
@@ -23,6 +34,8 @@ class InputsModel(QAbstractTableModel):
         if tx is None:
             tx = Transaction()
         self.tx = tx
+        # Scripts by their raw data.
+        self.scripts = {}
 
     def rowCount(self, parent=QModelIndex()):
         return len(self.tx.vin)
@@ -58,10 +71,8 @@ class InputsModel(QAbstractTableModel):
             if role == Qt.DisplayRole:
                 data = str(data)
         elif col == 2:
-            if role == RawRole:
-                data = Script(tx_input.scriptSig).get_hex()
-            else:
-                data = Script(tx_input.scriptSig).get_human()
+            script = cached_script(self.scripts, tx_input.scriptSig)
+            data = script.get_hex() if role == RawRole else script.get_human()
         elif col == 3:
             data = tx_input.nSequence
             if role == Qt.DisplayRole:
@@ -88,6 +99,7 @@ class InputsModel(QAbstractTableModel):
         """Reset the model to reflect tx."""
         self.beginResetModel()
         self.tx = Transaction.from_tx(tx)
+        self.scripts = {}
         self.endResetModel()
 
     def add_input(self, tx_input=None, input_index=None):
@@ -197,6 +209,8 @@ class OutputsModel(QAbstractTableModel):
         if tx is None:
             tx = Transaction()
         self.tx = tx
+        # Scripts by their raw data.
+        self.scripts = {}
         self.amount_format = config.get_config().get_option('amount_format', 'coins')
 
     def rowCount(self, parent=QModelIndex()):
@@ -232,10 +246,8 @@ class OutputsModel(QAbstractTableModel):
             else:
                 data = self.format_amount(tx_out.nValue)
         elif col == 1:
-            if role == RawRole:
-                data = Script(tx_out.scriptPubKey).get_hex()
-            else:
-                data = Script(tx_out.scriptPubKey).get_human()
+            script = cached_script(self.scripts, tx_out.scriptPubKey)
+            data = script.get_hex() if role == RawRole else script.get_human()
 
         return QVariant(data)
 
@@ -254,6 +266,7 @@ class OutputsModel(QAbstractTableModel):
         """Reset the model to reflect tx."""
         self.beginResetModel()
         self.tx = Transaction.from_tx(tx)
+        self.scripts = {}
         self.endResetModel()
 
     def add_output(self, tx_out=None, output_index=None):
@@ -0,0 +1,76 @@
+import unittest
+
+from bitcoin.core.script import CScript, OP_0, OP_1, OP_IF, OP_ENDIF
+from bitcoin.core.scripteval import EvalScript
+
+from hashmal_lib.core.analysis import analyze_script
+from hashmal_lib.core.script import Script
+from hashmal_lib.core.stack import ScriptExecution
+
+class AnalysisTest(unittest.TestCase):
+
+    def test_p2pkh(self):
+        analysis = analyze_script(Script.from_human('OP_DUP OP_HASH160 0x' + '00' * 20 + ' OP_EQUALVERIFY OP_CHECKSIG'))
+        self.assertEqual(4, analysis.op_count)
+        self.assertEqual(2, analysis.required_items)
+        self.assertEqual(4, analysis.max_depth)
+        self.assertTrue(analysis.if_balanced)
+        self.assertEqual([], analysis.errors)
+
+    def test_if_branches(self):
+        analysis = analyze_script(Script.from_human('OP_IF 0x01 0x02 OP_ELSE 0x03 OP_ENDIF OP_DROP OP_DROP'))
+        self.assertTrue(analysis.if_balanced)
+        # The ELSE branch pushes only one item.
+        self.assertEqual(2, analysis.required_items)
+        self.assertEqual(3, analysis.max_depth)
+
+        for text in ['OP_IF 0x01', 'OP_ENDIF', '0x01 OP_ELSE']:
+            analysis = analyze_script(Script.from_human(text))
+            self.assertFalse(analysis.if_balanced)
+            self.assertTrue(analysis.errors)
+
+    def test_stack_limit(self):
+        # Always exceeds the stack limit.
+        analysis = analyze_script(CScript([b'\x01'] * 1001))
+        self.assertEqual(['max stack items limit reached'], analysis.errors)
+
+        # The branch that exceeds the stack limit never runs.
+        script = CScript([OP_0, OP_IF] + [b'\x01'] * 1001 + [OP_ENDIF, OP_1])
+        stack = []
+        EvalScript(stack, script, None, 0)
+        analysis = analyze_script(script)
+        self.assertEqual([], analysis.errors)
+        self.assertEqual(['max stack items limit may be reached'], analysis.warnings)
+        execution = ScriptExecution()
+        execution.evaluate(script)
+        self.assertIsNone(execution.error)
+
+    def test_multisig(self):
+        pubkey = '0x02' + '11' * 32
+        analysis = analyze_script(Script.from_human('OP_1 %s %s OP_2 OP_CHECKMULTISIG' % (pubkey, pubkey)))
+        self.assertEqual(3, analysis.op_count)
+        # The extra item and one signature.
+        self.assertEqual(2, analysis.required_items)
+
+    def test_disabled_opcodes(self):
+        analysis = analyze_script(Script.from_human('0x01 0x02 OP_CAT'))
+        self.assertEqual(['OP_CAT'], analysis.disabled_opcodes)
+        self.assertEqual(['opcode OP_CAT is disabled'], analysis.errors)
+
+    def test_op_count(self):
+        analysis = analyze_script(Script.from_human(' '.join(['OP_NOP'] * 202)))
+        self.assertEqual(202, analysis.op_count)
+        self.assertEqual(['max opcode count exceeded'], analysis.errors)
+
+        # CHECKMULTISIG keys only count if the branch runs.
+        multisig = ' '.join(['OP_0 OP_0'] + ['0x' + '02' * 33] * 16 + ['OP_16 OP_CHECKMULTISIG OP_DROP'])
+        analysis = analyze_script(Script.from_human(' '.join(['OP_0 OP_IF'] + [multisig] * 12 + ['OP_ENDIF OP_1'])))
+        self.assertEqual(26 + 12 * 16, analysis.op_count)
+        self.assertEqual([], analysis.errors)
+        self.assertEqual(['max opcode count may be exceeded'], analysis.warnings)
+
+    def test_evaluate_rejects_without_executing(self):
+        execution = ScriptExecution()
+        steps = execution.evaluate(Script.from_human('0x01 0x02 OP_CAT'))
+        self.assertEqual([], steps)
+        self.assertIn('OP_CAT is disabled', str(execution.error))
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from hashmal_lib.core.my_config import Config, journal_file_path
+
+class ConfigTest(unittest.TestCase):
+    def setUp(self):
+        super(ConfigTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'hashmal.conf')
+        self.configs = []
+
+    def tearDown(self):
+        super(ConfigTest, self).tearDown()
+        for config in self.configs:
+            if config.save_timer:
+                config.save_timer.cancel()
+        shutil.rmtree(self.directory)
+
+    def make_config(self):
+        config = Config()
+        # Never save in the background during tests.
+        config.save_delay = 3600
+        config.load(self.filename)
+        self.configs.append(config)
+        return config
+
+    def read_file(self):
+        with open(self.filename, 'r') as f:
+            return json.loads(f.read() or '{}')
+
+    def test_coalesced_writes(self):
+        config = self.make_config()
+        for i in range(100):
+            config.set_option('count', i)
+        self.assertTrue(config.dirty)
+        self.assertNotIn('count', self.read_file())
+        self.assertTrue(os.path.exists(journal_file_path(self.filename)))
+
+        config.flush()
+        self.assertFalse(config.dirty)
+        self.assertEqual(99, self.read_file()['count'])
+        self.assertFalse(os.path.exists(journal_file_path(self.filename)))
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+
+    def test_replay_journal(self):
+        config = self.make_config()
+        config.set_option('a', 'first')
+        config.set_option('b', {'nested': [1, 2]})
+        config.set_option('a', 'second')
+        # Simulate exiting before the config file is written.
+        config.save_timer.cancel()
+
+        config = self.make_config()
+        self.assertEqual('second', config.get_option('a'))
+        self.assertEqual({'nested': [1, 2]}, config.get_option('b'))
+        # Replayed changes are written to the config file.
+        self.assertEqual('second', self.read_file()['a'])
+        self.assertFalse(os.path.exists(journal_file_path(self.filename)))
+
+    def test_incomplete_journal_entry(self):
+        config = self.make_config()
+        config.set_option('a', 1)
+        config.save_timer.cancel()
+        with open(journal_file_path(self.filename), 'a') as f:
+            f.write('["b", ')
+
+        config = self.make_config()
+        self.assertEqual(1, config.get_option('a'))
+        self.assertIsNone(config.get_option('b'))
+
+    def test_immediate_save(self):
+        config = self.make_config()
+        config.save_delay = None
+        config.set_option('a', 1)
+        self.assertEqual(1, self.read_file()['a'])
+        self.assertFalse(os.path.exists(journal_file_path(self.filename)))
+
+    def test_read_only_options(self):
+        config = self.make_config()
+        value = {'plugins': ['a', 'b'], 'size': 1}
+        config.set_option('x', value)
+        # Changing the original value does not change the option.
+        value['size'] = 2
+        self.assertEqual(1, config.get_option('x')['size'])
+
+        # The same read-only value is returned every time.
+        options = config.get_option('x')
+        self.assertIs(options, config.get_option('x'))
+        self.assertRaises(TypeError, options.__setitem__, 'size', 3)
+        self.assertRaises(TypeError, options['plugins'].append, 'c')
+
+        # Copies can be modified.
+        options = dict(options)
+        options['size'] = 3
+        plugins = list(options['plugins'])
+        plugins.append('c')
+        self.assertEqual(['a', 'b', 'c'], plugins)
+
+        default = []
+        self.assertRaises(TypeError, config.get_option('missing', default).append, 'a')
+        self.assertEqual([], default)
+
+    def test_read_only_options_are_saved(self):
+        config = self.make_config()
+        config.set_option('x', {'plugins': ['a', 'b']})
+        config.flush()
+        self.assertEqual({'plugins': ['a', 'b']}, self.read_file()['x'])
@@ -0,0 +1,191 @@
+import threading
+import unittest
+
+from PyQt4.QtCore import QCoreApplication
+
+from hashmal_lib.core.inflight import InFlightRequests, RequestCancelled, RequestTimedOut
+from hashmal_lib.downloader import Downloader, DownloadController
+from hashmal_lib.plugin_handler import download_blockchain_data_async
+
+class RecordingDownloader(Downloader):
+    """Downloader that records its name when it runs.
+
+    If release is given, the download waits until it is set.
+    """
+    def __init__(self, name, runs, release=None):
+        super(RecordingDownloader, self).__init__()
+        self.name = name
+        self.runs = runs
+        self.release = release
+        self.started = threading.Event()
+        self.skipped = False
+
+    def download(self):
+        self.started.set()
+        if self.release:
+            self.release.wait()
+        self.runs.append(self.name)
+        self.emit_finished()
+
+    def skip(self):
+        self.skipped = True
+        super(RecordingDownloader, self).skip()
+
+class InFlightRequestsTest(unittest.TestCase):
+    def setUp(self):
+        super(InFlightRequestsTest, self).setUp()
+        self.requests = InFlightRequests()
+
+    def test_fetch(self):
+        self.assertEqual('0100', self.requests.fetch(('raw_transaction', 'txid'), lambda: '0100'))
+        self.assertNotIn(('raw_transaction', 'txid'), self.requests)
+
+    def test_fetch_raises(self):
+        def fail():
+            raise ValueError('Failed')
+        self.assertRaises(ValueError, self.requests.fetch, ('raw_transaction', 'txid'), fail)
+        self.assertNotIn(('raw_transaction', 'txid'), self.requests)
+
+    def test_coalesce_identical_requests(self):
+        key = ('raw_transaction', 'txid')
+        all_requested = threading.Event()
+        class CountingRequests(InFlightRequests):
+            count = 0
+            def begin(self, key, callback=None):
+                value = super(CountingRequests, self).begin(key, callback)
+                with self.lock:
+                    self.count += 1
+                    if self.count == 4:
+                        all_requested.set()
+                return value
+        requests = CountingRequests()
+
+        calls = []
+        def download():
+            calls.append(key)
+            all_requested.wait()
+            return '0100'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(requests.fetch(key, download))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(['0100'] * 4, results)
+
+    def test_wait_timeout(self):
+        key = ('raw_transaction', 'txid')
+        self.requests.begin(key)
+        self.assertRaises(RequestTimedOut, self.requests.fetch, key, lambda: '0100', timeout=0.01)
+        self.assertIn(key, self.requests)
+
+    def test_callbacks(self):
+        key = ('raw_transaction', 'txid')
+        delivered = []
+        request, is_new = self.requests.begin(key, lambda r: delivered.append(r.result))
+        self.assertTrue(is_new)
+        _, is_new = self.requests.begin(key, lambda r: delivered.append(r.result))
+        self.assertFalse(is_new)
+
+        request = self.requests.finish(key, '0100')
+        for callback in request.callbacks:
+            callback(request)
+        self.assertEqual(['0100', '0100'], delivered)
+        self.assertNotIn(key, self.requests)
+
+class DownloadControllerTest(unittest.TestCase):
+    def setUp(self):
+        super(DownloadControllerTest, self).setUp()
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        self.runs = []
+        self.finished = []
+        self.cancelled = []
+        self.release = threading.Event()
+
+    def tearDown(self):
+        super(DownloadControllerTest, self).tearDown()
+        self.release.set()
+
+    def queue(self, controller, name, priority=0, release=None):
+        downloader = RecordingDownloader(name, self.runs, release)
+        downloader.cancelled.connect(lambda: self.cancelled.append(name))
+        controller.do_download(downloader, lambda: self.finished.append(name), priority)
+        return downloader
+
+    def wait(self, controller):
+        self.release.set()
+        self.assertTrue(controller.wait_for_done(5000))
+        self.app.processEvents()
+
+    def test_priority(self):
+        controller = DownloadController(max_threads=1)
+        blocker = self.queue(controller, 'blocker', release=self.release)
+        self.assertTrue(blocker.started.wait(5))
+        self.queue(controller, 'low')
+        self.queue(controller, 'high', priority=1)
+        self.wait(controller)
+        self.assertEqual(['blocker', 'high', 'low'], self.runs)
+
+    def test_bounded(self):
+        controller = DownloadController(max_threads=2)
+        downloaders = [self.queue(controller, str(i), release=self.release) for i in range(4)]
+        for downloader in downloaders[:2]:
+            self.assertTrue(downloader.started.wait(5))
+        self.assertEqual(2, controller.active_count())
+        self.assertEqual(2, controller.queue_depth())
+        self.assertFalse(any(i.started.is_set() for i in downloaders[2:]))
+
+        self.wait(controller)
+        self.assertEqual(0, controller.queue_depth())
+        self.assertEqual(['0', '1', '2', '3'], sorted(self.runs))
+        self.assertEqual(['0', '1', '2', '3'], sorted(self.finished))
+
+    def test_cancel(self):
+        controller = DownloadController(max_threads=1)
+        running = self.queue(controller, 'running', release=self.release)
+        self.assertTrue(running.started.wait(5))
+        queued = self.queue(controller, 'queued')
+        self.queue(controller, 'other')
+        controller.cancel(running)
+        controller.cancel(queued)
+        self.wait(controller)
+
+        # The running download finishes but does not emit its results.
+        # The queued download is skipped.
+        self.assertEqual(['running', 'other'], self.runs)
+        self.assertFalse(running.skipped)
+        self.assertTrue(queued.skipped)
+        self.assertEqual(['other'], self.finished)
+        self.assertEqual(['queued', 'running'], sorted(self.cancelled))
+
+    def test_cancel_blockchain_data(self):
+        class Retriever(object):
+            name = 'Retriever'
+            def retrieve_blockchain_data(self, data_type, identifier):
+                return '0100'
+        plugin = Retriever()
+        plugin.ui = plugin
+
+        controller = DownloadController(max_threads=1)
+        running = self.queue(controller, 'running', release=self.release)
+        self.assertTrue(running.started.wait(5))
+
+        requests = InFlightRequests()
+        key = ('Retriever', 'raw_transaction', 'txid')
+        delivered = []
+        def callback(data_type, identifier, result, error):
+            delivered.append((result, error))
+        downloader = download_blockchain_data_async(requests, controller, plugin, 'raw_transaction', 'txid', callback)
+        request, _ = requests.begin(key)
+        # Identical requests are coalesced.
+        self.assertIsNone(download_blockchain_data_async(requests, controller, plugin, 'raw_transaction', 'txid', callback))
+        controller.cancel(downloader)
+        self.wait(controller)
+
+        # Everyone waiting on the request is told that it was cancelled.
+        self.assertNotIn(key, requests)
+        self.assertRaises(RequestCancelled, request.wait, 0)
+        self.assertEqual([(None, 'Download was cancelled.')] * 2, delivered)
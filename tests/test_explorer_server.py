@@ -0,0 +1,68 @@
+import unittest
+
+import requests
+
+from hashmal_lib.core import chainparams
+from hashmal_lib.core.explorers import local_explorer
+from hashmal_lib.explorer_server import ExplorerData, ExplorerServer
+
+btc_genesis = '0100000000000000000000000000000000000000000000000000000000000000000000003ba3edfd7a7b12b27ac72c3e67768f617fc81bc3888a51323a9fb8aa4b1e5e4a29ab5f49ffff001d1dac2b7c0101000000010000000000000000000000000000000000000000000000000000000000000000ffffffff4d04ffff001d0104455468652054696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e64206261696c6f757420666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000'
+btc_genesis_hash = '000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f'
+btc_genesis_txid = '4a5e1e4baab89f3a32518a88c31bc87f618f76673e2cc77ab2127b7afdeda33b'
+btc_genesis_tx = btc_genesis[162:]
+
+class ExplorerDataTest(unittest.TestCase):
+    def setUp(self):
+        super(ExplorerDataTest, self).setUp()
+        chainparams.set_to_preset('Bitcoin')
+        self.data = ExplorerData()
+
+    def test_add_block(self):
+        self.data.add_raw(btc_genesis.decode('hex'))
+        self.assertEqual([btc_genesis_hash], self.data.blocks.keys())
+        self.assertEqual([btc_genesis_txid], self.data.txs.keys())
+        self.assertEqual(btc_genesis_tx, self.data.txs[btc_genesis_txid].encode('hex'))
+
+    def test_add_tx(self):
+        self.data.add_raw(btc_genesis_tx.decode('hex'))
+        self.assertEqual({}, self.data.blocks)
+        self.assertEqual([btc_genesis_txid], self.data.txs.keys())
+
+    def test_block_as_insight(self):
+        self.data.add_block(btc_genesis.decode('hex'))
+        d = self.data.block_as_insight(btc_genesis_hash)
+        self.assertEqual(1, d['version'])
+        self.assertEqual('0' * 64, d['previousblockhash'])
+        self.assertEqual(btc_genesis_txid, d['merkleroot'])
+        self.assertEqual(1231006505, d['time'])
+        self.assertEqual('1d00ffff', d['bits'])
+        self.assertEqual(2083236893, d['nonce'])
+        self.assertEqual([btc_genesis_txid], d['tx'])
+
+class ExplorerServerTest(unittest.TestCase):
+    def setUp(self):
+        super(ExplorerServerTest, self).setUp()
+        chainparams.set_to_preset('Bitcoin')
+        data = ExplorerData()
+        data.add_block(btc_genesis.decode('hex'))
+        # Listen on an ephemeral port.
+        self.server = ExplorerServer(data, port=0)
+        self.server.start()
+        self.explorer = local_explorer(domain=self.server.url())
+
+    def tearDown(self):
+        super(ExplorerServerTest, self).tearDown()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_raw_tx(self):
+        self.assertEqual(btc_genesis_tx, self.explorer.get_data('raw_tx', btc_genesis_txid))
+
+    def test_raw_header(self):
+        self.assertEqual(btc_genesis[:160], self.explorer.get_data('raw_header', btc_genesis_hash))
+
+    def test_not_found(self):
+        self.assertRaises(requests.HTTPError, self.explorer.get_data, 'raw_tx', '00' * 32)
+        self.assertRaises(requests.HTTPError, self.explorer.get_data, 'raw_header', btc_genesis_txid)
+        r = requests.get(self.server.url() + '/api/unknown/' + btc_genesis_hash)
+        self.assertEqual(404, r.status_code)
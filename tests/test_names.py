@@ -0,0 +1,64 @@
+import __builtin__
+import importlib
+import os
+import symtable
+import unittest
+
+import hashmal_lib
+
+try:
+    import PyQt4
+    has_qt = True
+except ImportError:
+    has_qt = False
+
+package_dir = os.path.dirname(os.path.abspath(hashmal_lib.__file__))
+
+def module_names():
+    """Get the names of the modules in hashmal_lib."""
+    names = []
+    for directory, _, filenames in os.walk(package_dir):
+        package = 'hashmal_lib' + directory[len(package_dir):].replace(os.sep, '.')
+        for filename in sorted(filenames):
+            if not filename.endswith('.py'):
+                continue
+            name = filename[:-3]
+            names.append(package if name == '__init__' else '.'.join([package, name]))
+    return names
+
+def undefined_globals(module):
+    """Get the global names that module's code uses but that module does not define."""
+    with open(module.__file__.replace('.pyc', '.py')) as f:
+        table = symtable.symtable(f.read(), module.__file__, 'exec')
+    defined = set(vars(module)) | set(vars(__builtin__))
+    undefined = set()
+    tables = [table]
+    while tables:
+        t = tables.pop()
+        tables.extend(t.get_children())
+        for symbol in t.get_symbols():
+            if symbol.is_referenced() and symbol.is_global() and symbol.get_name() not in defined:
+                undefined.add('%s: %s' % (t.get_name(), symbol.get_name()))
+    return undefined
+
+@unittest.skipUnless(has_qt, 'PyQt4 is required to import the GUI modules')
+class UndefinedNamesTest(unittest.TestCase):
+    def setUp(self):
+        super(UndefinedNamesTest, self).setUp()
+        # Hashmal is run with this set by the hashmal script.
+        self.had_local_modules = hasattr(__builtin__, 'use_local_modules')
+        if not self.had_local_modules:
+            __builtin__.use_local_modules = True
+
+    def tearDown(self):
+        super(UndefinedNamesTest, self).tearDown()
+        if not self.had_local_modules:
+            del __builtin__.use_local_modules
+
+    def test_undefined_names(self):
+        """Every module only uses global names that it defines or imports."""
+        undefined = []
+        for name in module_names():
+            module = importlib.import_module(name)
+            undefined.extend('%s.%s' % (name, i) for i in undefined_globals(module))
+        self.assertEqual([], sorted(undefined))
@@ -2,12 +2,17 @@ import unittest
 from collections import OrderedDict
 
 from bitcoin.core import x, lx, b2x, b2lx
+from pkg_resources import EntryPoint
 
 from hashmal_lib.plugins.addr_encoder import encode_address, decode_address
-from hashmal_lib.plugins.block_analyzer import deserialize_block_or_header
-from hashmal_lib.plugins import script_gen
-from hashmal_lib.plugins.variables import classify_data
+from hashmal_lib.plugins.block_analyzer import deserialize_block_or_header, script_types_summary
+from hashmal_lib.plugins import item_types, script_gen, Plugin
+from hashmal_lib.plugins.variables import classify_data, VarsModel, KeyIndex
+from hashmal_lib.plugins.wallet_rpc import is_method_not_found, parse_batch_response
 from hashmal_lib.core import chainparams, Script
+from hashmal_lib.core.script import classify_script, standard_layouts
+from hashmal_lib.core.varstore import VariableStore
+from hashmal_lib.plugin_handler import PluginEntry, Augmentation, Augmentations
 
 class VariablesTest(unittest.TestCase):
     def setUp(self):
@@ -28,6 +33,69 @@ class VariablesTest(unittest.TestCase):
             categories = classify_data(data)
             self.assertEqual(set(categories), set(classification), 'Incorrect classification for %s: %s' % (data, categories))
 
+    def test_vars_model_index(self):
+        store = VariableStore()
+        store.update(OrderedDict([('a', '0x00'), ('b', '"text"'), ('c', '11' * 32)]))
+        model = VarsModel(store)
+        self.assertEqual(set(['a', 'c']), model.keys_in_category('Hex'))
+        self.assertEqual(set(['c']), model.keys_in_category('64 Hex Digits'))
+        self.assertEqual(set(['Hex', 'Text', '64 Hex Digits']), set(model.used_categories()))
+
+        model.set_key('d', '"more text"')
+        self.assertEqual(3, model.row_for_key('d'))
+        self.assertEqual(set(['b', 'd']), model.keys_in_category('Text'))
+
+        # Replacing a value keeps its row.
+        model.set_key('b', '0x01')
+        self.assertEqual(1, model.row_for_key('b'))
+        self.assertEqual(set(['d']), model.keys_in_category('Text'))
+        self.assertEqual('b', model.key_for_value('0x01'))
+        self.assertIsNone(model.key_for_value('"text"'))
+
+        model.remove_key('a')
+        self.assertEqual(['b', 'c', 'd'], model.keys)
+        self.assertEqual([0, 1, 2], [model.row_for_key(i) for i in model.keys])
+        self.assertEqual(set(['b', 'c']), model.keys_in_category('Hex'))
+        self.assertRaises(ValueError, model.remove_key, 'a')
+
+    def test_vars_model_stored_categories(self):
+        class CountingStore(VariableStore):
+            reads = 0
+            def __getitem__(self, key):
+                self.reads += 1
+                return super(CountingStore, self).__getitem__(key)
+        store = CountingStore()
+        store.update(OrderedDict([('a', '0x00'), ('b', '"text"')]))
+        self.assertEqual(set(['a']), VarsModel(store).keys_in_category('Hex'))
+        self.assertEqual(2, store.reads)
+
+        # A new model uses the stored categories instead of reading values.
+        model = VarsModel(store)
+        self.assertEqual(set(['b']), model.keys_in_category('Text'))
+        self.assertEqual(2, store.reads)
+
+        # Values are classified again if what they are classified with changes.
+        chainparams.set_to_preset('Clams')
+        model.invalidate_cache()
+        self.assertEqual(set(['b']), model.keys_in_category('Text'))
+        self.assertEqual(4, store.reads)
+        chainparams.set_to_preset('Bitcoin')
+
+    def test_key_index(self):
+        keys = ['rawtx', 'rawtx1', 'rawblock', 'pubkey', 'mypubkey2', 'tx']
+        index = KeyIndex(keys)
+        for query in ['raw', 'rawt', 'tx', 'x', 'pubkey', 'key2', 'nothing', 'rawtx1']:
+            self.assertEqual(set(i for i in keys if query in i), index.search(query), query)
+
+        # The last matches are kept up to date.
+        self.assertEqual(set(['pubkey', 'mypubkey2']), index.search('pub'))
+        index.add('pubkey3')
+        index.remove('pubkey')
+        self.assertEqual(set(['mypubkey2', 'pubkey3']), index.search('pub'))
+        self.assertEqual(set(['mypubkey2', 'pubkey3']), index.search('pubkey'))
+        self.assertEqual(set(['pubkey3']), index.search('pubkey3'))
+        self.assertEqual(set(), index.search('pubkey'[:5] + 'x'))
+
 class BlockAnalyzerTest(unittest.TestCase):
     btc_genesis = '0100000000000000000000000000000000000000000000000000000000000000000000003ba3edfd7a7b12b27ac72c3e67768f617fc81bc3888a51323a9fb8aa4b1e5e4a29ab5f49ffff001d1dac2b7c0101000000010000000000000000000000000000000000000000000000000000000000000000ffffffff4d04ffff001d0104455468652054696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e64206261696c6f757420666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000'
     btc_genesis_header = btc_genesis[:160]
@@ -60,6 +128,79 @@ class BlockAnalyzerTest(unittest.TestCase):
         self.assertEqual('000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f', b2lx(blk.GetHash()))
         self.assertEqual('000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f', b2lx(header.GetHash()))
 
+    def test_script_types_summary(self):
+        blk, _ = deserialize_block_or_header(self.btc_genesis)
+        self.assertEqual('1 P2PK', script_types_summary(blk))
+
+class ItemTypesTest(unittest.TestCase):
+    def setUp(self):
+        chainparams.set_to_preset('Bitcoin')
+        self.block = BlockAnalyzerTest.btc_genesis
+        self.header = BlockAnalyzerTest.btc_genesis_header
+        # Coinbase transaction of the genesis block.
+        self.tx = self.block[162:]
+
+    def test_sniff(self):
+        self.assertIsNone(item_types.BlockHeaderItem.sniff(self.block))
+        self.assertIsNone(item_types.BlockItem.sniff(self.header))
+        self.assertIsNone(item_types.BlockItem.sniff(self.tx))
+        self.assertEqual(x(self.tx), item_types.TxItem.sniff(self.tx))
+        self.assertIsNone(item_types.TxItem.sniff('xyz'))
+        # Non-string data is left to coerce_item().
+        data = object()
+        self.assertIs(data, item_types.TxItem.sniff(data))
+
+    def test_instantiate_item(self):
+        for data, cls in [(self.block, item_types.BlockItem), (self.header, item_types.BlockHeaderItem),
+                          (self.tx, item_types.TxItem), (x(self.tx), item_types.TxItem)]:
+            # The second time, the cached item type is used.
+            for _ in range(2):
+                item = item_types.instantiate_item(data)
+                self.assertIsInstance(item, cls)
+            self.assertIs(cls, item_types._coerced_types[item_types._cache_key(data)])
+        self.assertIsNone(item_types.instantiate_item('xyz'))
+
+class PluginEntryTest(unittest.TestCase):
+    def test_lazy_import(self):
+        entry = PluginEntry(EntryPoint.parse('Address Encoder = hashmal_lib.plugins.addr_encoder:make_plugin'))
+        self.assertEqual('Address Encoder', entry.name)
+        self.assertFalse(entry.is_imported)
+        self.assertIsNone(entry.import_time)
+
+        plugin = entry.get_plugin()
+        self.assertTrue(entry.is_imported)
+        self.assertFalse(entry.is_constructed)
+        self.assertEqual('Address Encoder', plugin.name)
+        self.assertIsNotNone(entry.import_time)
+        self.assertIsNone(entry.construct_time)
+        self.assertIsNone(plugin.ui)
+        self.assertIs(plugin, entry.get_plugin())
+
+class AugmentationsTest(unittest.TestCase):
+    def test_index(self):
+        plugins = []
+        for name in ['Plugin A', 'Plugin B']:
+            plugin = Plugin(None)
+            plugin.name = name
+            plugins.append(plugin)
+        augmentations = Augmentations()
+        a = Augmentation(plugins[0], 'item_types')
+        b = Augmentation(plugins[1], 'item_types')
+        c = Augmentation(plugins[1], 'item_actions')
+        for i in [a, b, c]:
+            augmentations.append(i)
+
+        self.assertIs(a, augmentations.get('Plugin A', 'item_types'))
+        self.assertIs(c, augmentations.get('Plugin B', 'item_actions'))
+        self.assertIsNone(augmentations.get('Plugin A', 'item_actions'))
+
+        c.is_enabled = False
+        disabled = augmentations.disabled()
+        self.assertEqual([c], list(disabled))
+        self.assertIs(c, disabled.get('Plugin B', 'item_actions'))
+        self.assertIsNone(disabled.get('Plugin B', 'item_types'))
+        self.assertEqual([b, c], list(augmentations.for_plugin('Plugin B')))
+
 class AddrEncoderTest(unittest.TestCase):
     def test_decode_address(self):
         addr = '1111111111111111111114oLvT2'
@@ -73,6 +214,33 @@ class AddrEncoderTest(unittest.TestCase):
         addr = encode_address(h160, version)
         self.assertEqual('1111111111111111111114oLvT2', str(addr))
 
+class WalletRPCTest(unittest.TestCase):
+    def test_is_method_not_found(self):
+        self.assertTrue(is_method_not_found('{"code": -32601, "message": "Method not found"}'))
+        self.assertFalse(is_method_not_found('{"code": -5, "message": "Block not found"}'))
+        self.assertFalse(is_method_not_found('Connection refused'))
+        self.assertFalse(is_method_not_found(''))
+
+    def test_parse_batch_response(self):
+        # Results are ordered by id, not by the order of the responses.
+        respdata = '[{"id": 1, "result": "bb", "error": null}, {"id": 0, "result": "aa", "error": null}]'
+        self.assertEqual((['aa', 'bb'], ''), parse_batch_response(respdata, 2))
+
+        respdata = '[{"id": 0, "result": "aa", "error": null}, {"id": 1, "result": null, "error": {"code": -32601}}]'
+        results, error = parse_batch_response(respdata, 2)
+        self.assertEqual([], results)
+        self.assertTrue(is_method_not_found(error))
+
+        # A response is missing.
+        results, error = parse_batch_response('[{"id": 1, "result": "bb", "error": null}]', 2)
+        self.assertEqual([], results)
+        self.assertIn('0', error)
+
+        for respdata in ['[{"id": 2, "result": "cc", "error": null}]', '[{"result": "aa", "error": null}]', 'Not JSON']:
+            results, error = parse_batch_response(respdata, 1)
+            self.assertEqual([], results)
+            self.assertTrue(error)
+
 class ScriptGenTest(unittest.TestCase):
     def setUp(self):
         super(ScriptGenTest, self).setUp()
@@ -111,3 +279,39 @@ class ScriptGenTest(unittest.TestCase):
 
         scr = Script.from_human('OP_DUP OP_HASH160 0x00000000000000000000000000000000000000 OP_EQUALVERIFY OP_CHECKSIG')
         self.assertFalse(script_gen.is_template_script(scr, template))
+
+        scr = Script.from_human('OP_DUP OP_HASH160 0x0000000000000000000000000000000000000000 OP_EQUALVERIFY')
+        self.assertFalse(script_gen.is_template_script(scr, template))
+
+    def test_template_matcher(self):
+        matcher = script_gen.TemplateMatcher(script_gen.known_templates)
+        tests = [
+            ('OP_DUP OP_HASH160 0x1111111111111111111111111111111111111111 OP_EQUALVERIFY OP_CHECKSIG',
+                'Pay-To-Public-Key-Hash Output', {'recipient': '0x' + '11' * 20}),
+            ('OP_HASH160 0x2222222222222222222222222222222222222222 OP_EQUAL',
+                'Pay-To-Script-Hash Output', {'recipient': '0x' + '22' * 20}),
+            ('OP_RETURN "testing"', 'Null Output', {'text': 'testing'}),
+        ]
+        for text, name, variables in tests:
+            template, matched_variables = matcher.match(Script.from_human(text))
+            self.assertEqual(name, template.name)
+            self.assertEqual(variables, matched_variables)
+
+        for text in ['OP_HASH160 0x22 OP_EQUAL', 'OP_RETURN', 'OP_RETURN 0x01 0x02', '']:
+            self.assertIsNone(matcher.match(Script.from_human(text)))
+
+    def test_template_matcher_invalid_word(self):
+        # A template with a word that is not an operation matches nothing, and does not break other templates.
+        invalid = script_gen.ScriptTemplate('Invalid', 'OP_DUP PUSHDATA1 OP_DROP', {})
+        matcher = script_gen.TemplateMatcher([invalid] + script_gen.known_templates)
+        self.assertIsNone(matcher.match(Script.from_human('OP_DUP OP_DROP')))
+        template, _ = matcher.match(Script.from_human('OP_HASH160 0x' + '22' * 20 + ' OP_EQUAL'))
+        self.assertEqual('Pay-To-Script-Hash Output', template.name)
+
+    def test_standard_templates(self):
+        """Templates of standard scripts agree with classify_script()."""
+        matcher = script_gen.TemplateMatcher(script_gen.known_templates)
+        for script_type, name in [('pubkeyhash', 'Pay-To-Public-Key-Hash Output'), ('scripthash', 'Pay-To-Script-Hash Output')]:
+            script = Script.from_human(standard_layouts[script_type][0].replace('<recipient>', '0x' + '11' * 20))
+            self.assertEqual(script_type, classify_script(script))
+            self.assertEqual(name, matcher.match(script)[0].name)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from bitcoin.core import x, b2x, b2lx
+
+from hashmal_lib.core import chainparams, Transaction
+from hashmal_lib.core import prevouts
+from hashmal_lib.core.prevouts import PrevoutIndex
+
+raw_tx = '010000000279fd18c19fad871077a757804561e11d722296b68e6afd4d2a16c06d9c9a30b8000000006a4730440220380bf06cf81a43a9d425b6d34be7315e9ebb396081ecb94e291a906e6b9e36a6022060458349b8592a1d7133e77756a011e2d8e5749b67a2a94f3a5488e81458c00c0121024370144b106ab92b9bdf2cf2de6eb173f4656e581d27ed2c0f77479db338fc21ffffffff551d183e1f98a5a5e7f5b296ba6d77729babb7f90aaabe6b8eb128c624e10fce000000006b483045022100e1d89636d53334e29703dff014323cb8c9836e2b77f666477f185a1882cc2c7a02201d3af8352b2bf338b79a709a30fdf4e9c5166487b7af15fb48a85eac2e43c722012103c4e79c99c1cfcce534b4715ec9a8f6ccf735f050a58caf7b6126ebe4691aa480ffffffff025a232d00000000001976a9144fd5ae7260db3ddc49d058e6f200a486058c666288ac00127a00000000001976a9149d0d296ad8e00e57f90670215d9276765ba1c81788ac00000000'
+btc_genesis = '0100000000000000000000000000000000000000000000000000000000000000000000003ba3edfd7a7b12b27ac72c3e67768f617fc81bc3888a51323a9fb8aa4b1e5e4a29ab5f49ffff001d1dac2b7c0101000000010000000000000000000000000000000000000000000000000000000000000000ffffffff4d04ffff001d0104455468652054696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e64206261696c6f757420666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000'
+btc_genesis_txid = '4a5e1e4baab89f3a32518a88c31bc87f618f76673e2cc77ab2127b7afdeda33b'
+
+class PrevoutIndexTest(unittest.TestCase):
+    def setUp(self):
+        super(PrevoutIndexTest, self).setUp()
+        chainparams.set_to_preset('Bitcoin')
+        self.tx = Transaction.deserialize(x(raw_tx))
+        self.txid = b2lx(self.tx.GetHash())
+
+    def test_add_tx(self):
+        index = PrevoutIndex()
+        index.add_raw_tx(x(raw_tx))
+        self.assertEqual(2, len(index))
+
+        script_pubkey, value = index.get(self.txid, 1)
+        self.assertEqual('76a9149d0d296ad8e00e57f90670215d9276765ba1c81788ac', b2x(script_pubkey))
+        self.assertEqual(8000000, value)
+
+        self.assertIs(None, index.get(self.txid, 2))
+        self.assertIs(None, index.get('00' * 32, 0))
+
+    def test_persistence(self):
+        path = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(path, 'prevouts.db')
+            index = PrevoutIndex(filename)
+            index.add_tx(self.tx)
+            index.close()
+
+            index = PrevoutIndex(filename)
+            script_pubkey, value = index.get(self.txid, 0)
+            self.assertEqual('76a9144fd5ae7260db3ddc49d058e6f200a486058c666288ac', b2x(script_pubkey))
+            self.assertEqual(2958170, value)
+            index.close()
+        finally:
+            shutil.rmtree(path)
+
+    def test_add_blk_file(self):
+        path = tempfile.mkdtemp()
+        try:
+            # One block, followed by preallocated space.
+            blk_file = os.path.join(path, 'blk00000.dat')
+            with open(blk_file, 'wb') as f:
+                raw = x(btc_genesis)
+                f.write(x('f9beb4d9') + struct.pack(b'<I', len(raw)) + raw + b'\x00' * 16)
+
+            index = PrevoutIndex()
+            self.assertEqual(1, index.add_blk_file(blk_file))
+            script_pubkey, value = index.get(btc_genesis_txid, 0)
+            self.assertEqual(btc_genesis[-142:-8], b2x(script_pubkey))
+            self.assertEqual(5000000000, value)
+
+            filename = os.path.join(path, 'prevouts.db')
+            prevouts.main(['--db', filename, blk_file])
+            index = PrevoutIndex(filename)
+            self.assertEqual(1, len(index))
+            self.assertIsNotNone(index.get(btc_genesis_txid, 0))
+            index.close()
+        finally:
+            shutil.rmtree(path)
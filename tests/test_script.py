@@ -4,7 +4,8 @@ from collections import namedtuple
 import bitcoin
 from bitcoin.core.script import *
 
-from hashmal_lib.core.script import Script, transform_human
+from hashmal_lib.core import opcodes
+from hashmal_lib.core.script import Script, transform_human, variable_names, ContextIndex, classify_script
 
 # Test item with hex and human representations.
 ScriptItem = namedtuple('ScriptItem', ('hex', 'human'))
@@ -40,6 +41,31 @@ class ScriptTest(unittest.TestCase):
         self.assertEqual(s.get_hex(), i.hex)
         self.assertEqual(s.get_human(), i.human)
 
+    def test_script_from_human_pushdata(self):
+        s = Script.from_human('0x' + '00' * 80)
+        self.assertEqual(('4c50' + '00' * 80).decode('hex'), s)
+
+        s = Script.from_human('"a b" 0x123 OP_DUP')
+        self.assertEqual('03612062020123' + '76', s.get_hex())
+
+    def test_script_from_human_unclosed_quote(self):
+        s = Script.from_human('"a b" "x y')
+        self.assertEqual('036120620222780179', s.get_hex())
+
+    def test_script_pushdata_to_hex(self):
+        data = ('4c50' + '00' * 80).decode('hex')
+        self.assertEqual(data.encode('hex'), Script(data).get_hex())
+
+    def test_get_human_follows_opcode_names(self):
+        s = Script('b1'.decode('hex'))
+        self.assertEqual('OP_NOP2', s.get_human())
+        try:
+            opcodes.set_overridden_opcodes([(0xb1, 'OP_CHECKLOCKTIMEVERIFY', opcodes.clams_checklocktimeverify)])
+            self.assertEqual('OP_CHECKLOCKTIMEVERIFY', s.get_human())
+        finally:
+            opcodes.set_overridden_opcodes(None)
+        self.assertEqual('OP_NOP2', s.get_human())
+
     def test_compatibility_with_cscript(self):
         cs = CScript(['01'.decode('hex'), OP_DUP, OP_HASH160])
         s = Script(cs)
@@ -81,6 +107,10 @@ class ParsingTest(unittest.TestCase):
         scr = '$seven 0x07 OP_EQUAL'
         self.assertEqual('0x07 0x07 OP_EQUAL', transform_human(scr, variables)[0])
 
+    def test_variable_names(self):
+        self.assertEqual(set(['a', 'testVar2']), variable_names('$a 0x01 $testVar2 OP_DROP $a'))
+        self.assertEqual(set(), variable_names('OP_DUP "$"'))
+
     def test_opcode_transform(self):
         ops_tests = [
             ('ADD', 'OP_ADD'),
@@ -106,3 +136,54 @@ class ParsingTest(unittest.TestCase):
             self.assertEqual(expected, txt)
             s = Script.from_human(txt)
             self.assertEqual(expected_hex, s.get_hex())
+
+    def test_context_tips(self):
+        variables = {'seven': '0x7'}
+        _, tips = transform_human('$seven "a b" DUP 5', variables)
+        self.assertEqual([(0, 6, '$seven', 'Variable'), (7, 12, 'a b', 'String literal'),
+                          (13, 16, 'DUP', 'Opcode'), (17, 18, '5', 'Hex')], tips)
+
+    def test_overridden_opcode_names(self):
+        try:
+            opcodes.set_overridden_opcodes([(0xb1, 'OP_CHECKLOCKTIMEVERIFY', opcodes.clams_checklocktimeverify)])
+            self.assertEqual('OP_CHECKLOCKTIMEVERIFY', transform_human('CHECKLOCKTIMEVERIFY')[0])
+        finally:
+            opcodes.set_overridden_opcodes(None)
+        self.assertEqual('CHECKLOCKTIMEVERIFY', transform_human('CHECKLOCKTIMEVERIFY')[0])
+
+class ContextIndexTest(unittest.TestCase):
+
+    def test_in_range(self):
+        _, context = transform_human('DUP 5\n"a b" ADD\n$x', {'x': '0x01'})
+        index = ContextIndex(context)
+        self.assertEqual([(0, 3, 'DUP', 'Opcode'), (4, 5, '5', 'Hex')], index.in_range(0, 6))
+        self.assertEqual([(6, 11, 'a b', 'String literal'), (12, 15, 'ADD', 'Opcode')], index.in_range(6, 16))
+        self.assertEqual([(16, 18, '$x', 'Variable')], index.in_range(16, 18))
+        self.assertEqual([], index.in_range(18, 20))
+
+    def test_tip_at(self):
+        _, context = transform_human('DUP "a b"')
+        index = ContextIndex(context)
+        self.assertEqual((0, 3, 'DUP', 'Opcode'), index.tip_at(2))
+        self.assertEqual(None, index.tip_at(3))
+        self.assertEqual((4, 9, 'a b', 'String literal'), index.tip_at(6))
+
+class ClassifyScriptTest(unittest.TestCase):
+
+    def test_classify_script(self):
+        pubkey = '02' + '11' * 32
+        tests = [
+            ('OP_DUP OP_HASH160 0x' + '00' * 20 + ' OP_EQUALVERIFY OP_CHECKSIG', 'pubkeyhash'),
+            ('OP_HASH160 0x' + '00' * 20 + ' OP_EQUAL', 'scripthash'),
+            ('0x' + pubkey + ' OP_CHECKSIG', 'pubkey'),
+            ('0x04' + '11' * 64 + ' OP_CHECKSIG', 'pubkey'),
+            ('OP_1 0x%s 0x%s OP_2 OP_CHECKMULTISIG' % (pubkey, pubkey), 'multisig'),
+            ('OP_RETURN "testing"', 'nulldata'),
+            ('OP_RETURN', 'nulldata'),
+            ('OP_RETURN OP_DUP', 'nonstandard'),
+            ('OP_2 0x%s 0x%s OP_1 OP_CHECKMULTISIG' % (pubkey, pubkey), 'nonstandard'),
+            ('OP_HASH160 0x' + '00' * 20 + ' OP_EQUALVERIFY', 'nonstandard'),
+            ('', 'nonstandard'),
+        ]
+        for text, script_type in tests:
+            self.assertEqual(script_type, classify_script(Script.from_human(text)))
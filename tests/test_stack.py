@@ -1,8 +1,10 @@
+import hashlib
 import unittest
 
 import bitcoin
 from bitcoin.core.scripteval import EvalScript
 
+from hashmal_lib.core.fuzz import fuzz, compare
 from hashmal_lib.core.script import Script, transform_human
 from hashmal_lib.core.stack import Stack, ScriptExecution
 from hashmal_lib.core.transaction import Transaction
@@ -55,6 +57,22 @@ class StackTest(unittest.TestCase):
             for i, L in enumerate(expected_states):
                 self.assertEqual(L, steps[i].stack)
 
+    def test_within(self):
+        execution = ScriptExecution()
+        final_state = execution.evaluate(Script.from_human('0x02 0x01 0x03 OP_WITHIN'))[-1]
+        self.assertEqual(['\x01'], final_state.stack)
+        self.assertIn('1 <= 2 < 3', final_state.log)
+
+    @unittest.skipUnless('ripemd160' in getattr(hashlib, 'algorithms_available', ()), 'RIPEMD160 is not available')
+    def test_ripemd160(self):
+        execution = ScriptExecution()
+        final_state = execution.evaluate(Script.from_human('"abc" OP_RIPEMD160'))[-1]
+        self.assertEqual(['8eb208f7e05d987a9b044a8e98c6b087f15a0bfc'.decode('hex')], final_state.stack)
+        self.assertIsNone(compare(Script.from_human('"abc" OP_RIPEMD160')))
+
+    def test_differential_fuzz(self):
+        self.assertEqual([], fuzz(0, 500))
+
     def test_p2sh_script_verification(self):
         # P2SH tx from Bitcoin Core tests.
         rawtx = '01000000010001000000000000000000000000000000000000000000000000000000000000000000006e493046022100c66c9cdf4c43609586d15424c54707156e316d88b0a1534c9e6b0d4f311406310221009c0fe51dbc9c4ab7cc25d3fdbeccf6679fe6827f08edf2b4a9f16ee3eb0e438a0123210338e8034509af564c62644c07691942e0c056752008a173c89f60ab2a88ac2ebfacffffffff010000000000000000015100000000'
@@ -0,0 +1,76 @@
+import unittest
+
+from hashmal_lib.core.script import Script
+from hashmal_lib.core.symbolic import spending_conditions, Constraint, Symbol
+
+class SymbolicTest(unittest.TestCase):
+    def conditions(self, human):
+        return spending_conditions(Script.from_human(human))
+
+    def test_p2pkh(self):
+        paths = self.conditions('OP_DUP OP_HASH160 0x1111111111111111111111111111111111111111 OP_EQUALVERIFY OP_CHECKSIG')
+        self.assertEqual(1, len(paths))
+        self.assertEqual(2, paths[0].inputs)
+        self.assertEqual((Constraint('preimage', ('HASH160', '\x11' * 20, Symbol('input0'))),
+                          Constraint('signature', (Symbol('input0'),))), paths[0].constraints)
+
+    def test_hashlock_or_timelock(self):
+        paths = self.conditions('OP_IF OP_SHA256 0x' + '22' * 32 + ' OP_EQUALVERIFY 0x03aa OP_ELSE 0x0a OP_NOP2 OP_DROP 0x03bb OP_ENDIF OP_CHECKSIG')
+        self.assertEqual(2, len(paths))
+        hashlock, timelock = paths
+        self.assertEqual(3, hashlock.inputs)
+        self.assertIn(Constraint('preimage', ('SHA256', '\x22' * 32, Symbol('input1'))), hashlock.constraints)
+        self.assertIn(Constraint('signature', ('\x03\xaa',)), hashlock.constraints)
+        self.assertEqual(2, timelock.inputs)
+        self.assertIn(Constraint('locktime', (10,)), timelock.constraints)
+        self.assertIn(Constraint('signature', ('\x03\xbb',)), timelock.constraints)
+
+    def test_multisig(self):
+        paths = self.conditions('OP_2 0x02aa 0x02bb 0x02cc OP_3 OP_CHECKMULTISIG')
+        self.assertEqual(1, len(paths))
+        self.assertEqual(3, paths[0].inputs)
+        self.assertEqual((Constraint('multisig', (2, ('\x02\xaa', '\x02\xbb', '\x02\xcc'))),), paths[0].constraints)
+
+    def test_unspendable(self):
+        self.assertEqual([], self.conditions('OP_RETURN 0x00'))
+        self.assertEqual([], self.conditions('OP_1 OP_2 OP_EQUAL'))
+        self.assertEqual(1, len(self.conditions('OP_1 OP_1 OP_EQUAL')))
+
+    def test_repeated_branches(self):
+        # Contradictory branches are pruned and identical states are merged,
+        # so the number of paths does not grow with the number of IFs.
+        paths = self.conditions(' '.join(['OP_DUP OP_IF OP_ELSE OP_ENDIF'] * 20) + ' OP_DROP OP_1')
+        self.assertEqual(2, len(paths))
+
+    def test_ifdup(self):
+        # Only the branch that contradicts earlier constraints is pruned.
+        paths = self.conditions('OP_DUP OP_VERIFY OP_IFDUP OP_DROP')
+        self.assertEqual(1, len(paths))
+        self.assertEqual((Constraint('true', (Symbol('input0'),)),), paths[0].constraints)
+
+        paths = self.conditions('OP_DUP OP_NOTIF OP_1 OP_ELSE OP_IFDUP OP_ENDIF')
+        self.assertEqual(2, len(paths))
+        self.assertEqual([(Constraint('false', (Symbol('input0'),)),),
+                          (Constraint('true', (Symbol('input0'),)),)], [i.constraints for i in paths])
+
+    def test_numequalverify(self):
+        paths = self.conditions('0x05 OP_NUMEQUALVERIFY OP_1')
+        self.assertEqual(1, len(paths))
+        self.assertEqual((Constraint('numequal', (Symbol('input0'), '\x05')),), paths[0].constraints)
+        self.assertEqual(1, len(self.conditions('0x05 0x0500 OP_NUMEQUALVERIFY OP_1')))
+
+    def test_stack_limit(self):
+        # Picking an item deeper than the stack limit cannot pass, and does not create the items.
+        self.assertEqual([], self.conditions('0xffffff7f OP_PICK'))
+        self.assertEqual([], self.conditions('0x40420f OP_ROLL'))
+        self.assertEqual([], self.conditions('0xe803 OP_PICK'))
+        # The picked item is one more item than the limit allows.
+        self.assertEqual([], self.conditions('0xe703 OP_PICK'))
+        paths = self.conditions('0xe603 OP_PICK')
+        self.assertEqual(1, len(paths))
+        self.assertEqual(999, paths[0].inputs)
+
+    def test_unsupported(self):
+        paths = self.conditions('OP_DEPTH')
+        self.assertEqual(1, len(paths))
+        self.assertEqual((Constraint('unsupported', ('OP_DEPTH',)),), paths[0].constraints)
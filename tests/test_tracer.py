@@ -0,0 +1,71 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from hashmal_lib import tracer
+
+class TracerTest(unittest.TestCase):
+    def setUp(self):
+        super(TracerTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'trace.txt')
+
+    def tearDown(self):
+        super(TracerTest, self).tearDown()
+        if tracer.active_tracer is not None:
+            tracer.active_tracer.uninstall()
+            tracer.active_tracer = None
+        shutil.rmtree(self.directory)
+
+    def test_inactive(self):
+        with tracer.phase('phase'):
+            pass
+        tracer.add_section('Section', 'text')
+        tracer.finish()
+        self.assertFalse(os.path.exists(self.filename))
+
+    def test_phases(self):
+        active = tracer.start(self.filename)
+        with tracer.phase('outer'):
+            with tracer.phase('inner'):
+                pass
+        self.assertEqual(['inner', 'outer'], [i[0] for i in active.phases])
+        self.assertEqual([1, 0], [i[1] for i in active.phases])
+
+        tracer.add_section('Section', 'section text')
+        tracer.finish()
+        self.assertIsNone(tracer.active_tracer)
+        with open(self.filename) as f:
+            trace = f.read()
+        lines = trace.splitlines()
+        # Phases are listed in the order that they start.
+        self.assertLess([i for i, line in enumerate(lines) if line.endswith('outer')][0],
+                        [i for i, line in enumerate(lines) if line.endswith('  inner')][0])
+        self.assertIn('section text', trace)
+
+    def test_imports(self):
+        package = os.path.join(self.directory, 'tracedpkg')
+        os.mkdir(package)
+        with open(os.path.join(package, '__init__.py'), 'w') as f:
+            f.write('import tracedmod\n')
+        with open(os.path.join(package, 'tracedmod.py'), 'w') as f:
+            f.write('x = 1\n')
+        sys.path.insert(0, self.directory)
+        try:
+            active = tracer.start(self.filename)
+            import tracedpkg
+            # Modules that are already imported are not recorded.
+            import tracedpkg.tracedmod
+            tracer.finish()
+        finally:
+            sys.path.remove(self.directory)
+            for name in ['tracedpkg', 'tracedpkg.tracedmod']:
+                sys.modules.pop(name, None)
+
+        self.assertEqual([('tracedpkg.tracedmod', 1), ('tracedpkg', 0)], [i[:2] for i in active.imports])
+        for name, depth, self_duration, duration in active.imports:
+            self.assertLessEqual(self_duration, duration)
+        # The import hook is removed when tracing finishes.
+        self.assertIsNone(active._original_import)
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from hashmal_lib.core.varstore import VariableStore
+
+class VariableStoreTest(unittest.TestCase):
+    def setUp(self):
+        super(VariableStoreTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'variables.db')
+
+    def tearDown(self):
+        super(VariableStoreTest, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_set_and_remove(self):
+        store = VariableStore()
+        store['a'] = '0x01'
+        store['b'] = '"text"'
+        store['c'] = '0x03'
+        self.assertEqual(['a', 'b', 'c'], store.keys())
+        self.assertEqual('"text"', store['b'])
+        self.assertEqual('b', store.key_for_value('"text"'))
+
+        # Replacing a value keeps its position.
+        store['a'] = '0x02'
+        self.assertEqual(['a', 'b', 'c'], store.keys())
+        self.assertEqual('0x02', store.get('a'))
+        self.assertIsNone(store.key_for_value('0x01'))
+
+        del store['b']
+        self.assertEqual(['a', 'c'], store.keys())
+        self.assertNotIn('b', store)
+        self.assertIsNone(store.get('b'))
+        self.assertIsNone(store.key_for_value('"text"'))
+
+    def test_large_values_are_not_cached(self):
+        store = VariableStore()
+        large = '00' * store.max_cached_size
+        store['small'] = '0x00'
+        store['large'] = large
+        self.assertIsNone(store.cache['large'])
+        self.assertEqual(large, store['large'])
+        self.assertEqual('large', store.key_for_value(large))
+
+    def test_commit(self):
+        store = VariableStore(self.filename)
+        store['a'] = '0x01'
+        store['large'] = '00' * store.max_cached_size
+        store.commit()
+        store['b'] = '0x02'
+        store.close()
+
+        # Uncommitted changes are discarded.
+        store = VariableStore(self.filename)
+        self.assertEqual(['a', 'large'], store.keys())
+        self.assertEqual('0x01', store['a'])
+        self.assertEqual('00' * store.max_cached_size, store['large'])
+        store.close()
+
+    def test_categories(self):
+        store = VariableStore(self.filename)
+        store['a'] = '0x01'
+        store['b'] = '"text"'
+        store.set_categories('a', 'context', ['Hex'])
+        store.set_categories('b', 'context', ['Text'])
+        self.assertEqual(['Hex'], store.get_categories('a', 'context'))
+        self.assertIsNone(store.get_categories('a', 'other context'))
+
+        # Categories are forgotten when the value changes.
+        store['b'] = '0x02'
+        self.assertIsNone(store.get_categories('b', 'context'))
+        store.commit()
+        store.close()
+
+        store = VariableStore(self.filename)
+        self.assertEqual(['Hex'], store.get_categories('a', 'context'))
+        self.assertIsNone(store.get_categories('b', 'context'))
+        del store['a']
+        self.assertIsNone(store.get_categories('a', 'context'))
+        store.close()
@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import unittest
+
+from bitcoin.core import COutPoint, CTxIn, CTxOut
+from bitcoin.core.script import CScript, OP_0, OP_1, OP_16, OP_CAT, OP_CHECKMULTISIG, OP_DROP, OP_IF, OP_ENDIF
+from bitcoin.core.scripteval import VerifyScriptError
+
+from hashmal_lib.core import chainparams, Transaction
+from hashmal_lib.core.verify import verify_input, verify_inputs
+
+class VerifyTest(unittest.TestCase):
+    def setUp(self):
+        super(VerifyTest, self).setUp()
+        chainparams.set_to_preset('Bitcoin')
+        vin = [CTxIn(COutPoint('\x01' * 32, i), CScript([OP_1])) for i in range(3)]
+        self.tx = Transaction(vin, [CTxOut(0, CScript([OP_1]))])
+        # A valid spend, a spend of a script that returns false, and a spend of a script with a disabled opcode.
+        self.prev_script_pubkeys = [CScript([OP_1]), CScript([OP_0]), CScript([OP_1, OP_CAT])]
+
+    def test_verify_input(self):
+        verify_input(self.tx, 0, self.prev_script_pubkeys[0])
+        self.assertRaises(VerifyScriptError, verify_input, self.tx, 1, self.prev_script_pubkeys[1])
+        with self.assertRaises(VerifyScriptError) as context:
+            verify_input(self.tx, 2, self.prev_script_pubkeys[2])
+        self.assertIn('disabled', str(context.exception))
+
+        # A branch that would exceed the stack limit, but never runs.
+        verify_input(self.tx, 0, CScript([OP_0, OP_IF] + [b'\x01'] * 1001 + [OP_ENDIF, OP_1]))
+        # Branches whose CHECKMULTISIG keys would exceed the opcode limit, but never run.
+        multisig = [OP_0, OP_0] + [b'\x02' * 33] * 16 + [OP_16, OP_CHECKMULTISIG, OP_DROP]
+        verify_input(self.tx, 0, CScript([OP_0, OP_IF] + multisig * 12 + [OP_ENDIF, OP_1]))
+
+    def test_verify_inputs(self):
+        results = verify_inputs(self.tx, self.prev_script_pubkeys)
+        self.assertIsNone(results[0])
+        self.assertIsNotNone(results[1])
+        self.assertIn('disabled', results[2])
+        self.assertEqual(results, verify_inputs(self.tx, self.prev_script_pubkeys, processes=2))
+
+        # A pool can be reused across calls.
+        pool = multiprocessing.Pool(2)
+        try:
+            for _ in range(2):
+                self.assertEqual(results, verify_inputs(self.tx, self.prev_script_pubkeys, processes=2, pool=pool))
+            other_tx = Transaction(self.tx.vin[:1], self.tx.vout)
+            self.assertEqual([None], verify_inputs(other_tx, self.prev_script_pubkeys[:1], processes=2, pool=pool))
+        finally:
+            pool.terminate()
+
+class HeadlessTest(unittest.TestCase):
+    def test_headless_import(self):
+        """Core and its non-GUI services import without Qt."""
+        code = '; '.join([
+            'import sys',
+            'import hashmal_lib, hashmal_lib.core, hashmal_lib.core.verify, hashmal_lib.core.explorers, '
+            'hashmal_lib.core.inflight, hashmal_lib.core.prevouts, hashmal_lib.core.varstore',
+            'sys.exit(any(i.startswith("PyQt4") for i in sys.modules))',
+        ])
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        self.assertEqual(0, subprocess.call([sys.executable, '-c', code], cwd=root))